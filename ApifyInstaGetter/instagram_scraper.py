@@ -1,23 +1,33 @@
 import os
-from datetime import datetime, timedelta
-from dateutil import parser
+import sys
+import time
 from apify_client import ApifyClient
 from dotenv import load_dotenv
-import json
+
+# Add the root directory to the Python path to access the shared RateLimiter, Ranking and Discovery packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import throttle, APIFY
+from Ranking import TopK
+from Discovery.archive import get_default_archive
+from Discovery.records import VideoRecord
 
 load_dotenv()
 
-def get_top_instagram_videos(hashtag: str) -> list:
+def get_top_instagram_videos(hashtag: str, score='likes') -> list:
     """
     Retrieves the top 15 Instagram videos posted in the last two weeks for the given hashtag
     using the Apify Instagram Hashtag Scraper.
 
     Args:
         hashtag (str): The hashtag name without the '#' symbol (e.g., 'dance').
+        score (str or callable): Ranking score, a name from Ranking.SCORES ('likes', 'views',
+              'engagement_rate', 'recency_weighted_likes') or a function item -> float.
 
     Returns:
         list: A list of up to 15 Instagram video URLs, sorted by the number of likes
-              in descending order. If fewer than 15 videos are found, the list will
+              (or the chosen score) in descending order. If fewer than 15 videos are found, the list will
               contain all available videos.
               
     Note:
@@ -33,87 +43,57 @@ def get_top_instagram_videos(hashtag: str) -> list:
         }
         
         print(f"Starting scrape for hashtag: {hashtag} with resultsType: stories")
-        actor_call = client.actor('apify/instagram-hashtag-scraper').call(run_input=run_input)
+        with throttle(APIFY):
+            actor_call = client.actor('apify/instagram-hashtag-scraper').call(run_input=run_input)
         
         if not actor_call or 'defaultDatasetId' not in actor_call:
             print("Error: Failed to get valid response from Apify actor")
             return []
             
-        dataset_items = client.dataset(actor_call['defaultDatasetId']).list_items().items
+        with throttle(APIFY):
+            dataset_items = client.dataset(actor_call['defaultDatasetId']).list_items().items
 
-        # Save dataset for debugging
-        output_filename = f"instagram_{hashtag}_dataset.json"
-        try:
-            with open(output_filename, "w", encoding="utf-8") as f:
-                json.dump(dataset_items, f, ensure_ascii=False, indent=2)
-            print(f"Dataset written to {output_filename}")
-        except Exception as e:
-            print(f"Failed to write dataset to file: {e}")
+        # Append the raw items to the discovery archive
+        archive = get_default_archive()
+        if archive is not None:
+            try:
+                count = archive.append('instagram', hashtag, dataset_items)
+                print(f"Archived {count} items for #{hashtag}")
+            except Exception as e:
+                print(f"Failed to archive dataset: {e}")
+            finally:
+                archive.close()
 
         print(f"Found {len(dataset_items)} total items")
         
-        # Filter for recent videos (last 2 weeks)
-        from datetime import timezone
-        two_weeks_ago = datetime.now(timezone.utc) - timedelta(weeks=2)
-        videos = []
+        # Project each item to a compact record and keep the top 15 recent videos
+        two_weeks_ago = time.time() - 14 * 86400
+        top = TopK(15, score)
+        recent_count = 0
         
         for item in dataset_items:
-            # Check if item is a video type - look for both Video type and productType clips
-            is_video = (
-                item.get('type') == 'Video' or 
-                item.get('productType') == 'clips' or
-                'videoUrl' in item
-            )
-            
-            if is_video:
-                try:
-                    # Parse timestamp 
-                    timestamp_str = item.get('timestamp')
-                    if not timestamp_str:
-                        print(f"Skipping item with no timestamp: {item.get('id', 'unknown')}")
-                        continue
-                        
-                    timestamp = parser.parse(timestamp_str)
-                    if timestamp >= two_weeks_ago:
-                        # Get likes count - try multiple possible fields
-                        likes = (
-                            item.get('likesCount') or 
-                            item.get('likeCount') or 
-                            item.get('likes') or 
-                            0
-                        )
-                        
-                        video_info = {
-                            'url': item.get('url'),
-                            'videoUrl': item.get('videoUrl'),  # Direct video URL
-                            'likes': likes,
-                            'timestamp': timestamp,
-                            'type': item.get('type'),
-                            'productType': item.get('productType'),
-                            'owner': item.get('ownerUsername', 'unknown')
-                        }
-                        
-                        # Only add if we have a URL
-                        if video_info['url']:
-                            videos.append(video_info)
-                        else:
-                            print(f"Skipping item with no URL: {item.get('id', 'unknown')}")
-                            
-                except (KeyError, ValueError, TypeError) as e:
-                    print(f"Skipping invalid video entry: {e} - Item: {item.get('id', 'unknown')}")
-                    continue
+            record = VideoRecord.from_instagram(item, hashtag)
+            if record is None:
+                continue
+            if record.created_at is None:
+                print(f"Skipping item with no timestamp: {record.id}")
+                continue
+            if record.created_at >= two_weeks_ago:
+                recent_count += 1
+                top.push(record)
+        dataset_items = None
         
-        print(f"Found {len(videos)} videos from the last 2 weeks")
+        print(f"Found {recent_count} videos from the last 2 weeks")
         
-        # Sort by likes (descending) and take top 15
-        videos.sort(key=lambda x: x['likes'], reverse=True)
-        top_videos = [v['url'] for v in videos[:15]]
+        # The bounded heap already holds the top 15, best score first
+        ranked = top.scored_results()
+        top_videos = [record.url for _, record in ranked]
         
         print(f"Returning {len(top_videos)} top videos")
         
         # Print some debug info about the top videos
-        for i, video in enumerate(videos[:5], 1):
-            print(f"Top {i}: {video['likes']} likes - {video['owner']} - {video['type']}/{video['productType']}")
+        for i, (value, record) in enumerate(ranked[:5], 1):
+            print(f"Top {i}: {value:g} - {record.url} - {record.likes} likes, {record.plays} plays")
         
         return top_videos
         
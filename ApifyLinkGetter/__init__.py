@@ -4,6 +4,6 @@ ApifyLinkGetter Package
 This package provides TikTok video scraping functionality.
 """
 
-from .tiktok_scraper import get_top_tiktok_videos
+from .tiktok_scraper import get_top_tiktok_videos, get_top_tiktok_videos_batch
 
-__all__ = ['get_top_tiktok_videos'] 
\ No newline at end of file
+__all__ = ['get_top_tiktok_videos', 'get_top_tiktok_videos_batch'] 
\ No newline at end of file
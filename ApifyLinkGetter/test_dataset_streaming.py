@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Offline test script for the streaming dataset reader in tiktok_scraper.py
+
+Runs get_top_tiktok_videos and get_top_tiktok_videos_batch against a local fake
+Apify client backed by the checked-in tiktok_*_dataset.json files, so no API
+token or network access is needed. Streamed items are archived to a temporary
+directory, never the real discovery archive.
+"""
+
+import glob
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from tiktok_scraper import (
+    _stream_dataset_items,
+    get_top_tiktok_videos,
+    get_top_tiktok_videos_batch,
+)
+from Discovery import archive
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def use_temporary_archive(monkeypatch, path):
+    """Points the default discovery archive at `path`, whatever DISCOVERY_ARCHIVE_DIR says."""
+    monkeypatch.delenv("DISCOVERY_ARCHIVE_DIR", raising=False)
+    monkeypatch.setattr(archive, "DEFAULT_ARCHIVE_DIR", str(path))
+
+
+@pytest.fixture(autouse=True)
+def temporary_archive(tmp_path, monkeypatch):
+    use_temporary_archive(monkeypatch, tmp_path / "discovery_archive")
+
+
+class FakeDataset:
+    """Serves items through list_items(offset, limit) like apify-client's DatasetClient."""
+
+    def __init__(self, items, empty_reads=0):
+        self.items = items
+        self.empty_reads = empty_reads
+        self.list_calls = 0
+
+    def list_items(self, offset=0, limit=None):
+        self.list_calls += 1
+        if self.empty_reads > 0:
+            self.empty_reads -= 1
+            return SimpleNamespace(items=[])
+        end = len(self.items) if limit is None else offset + limit
+        return SimpleNamespace(items=self.items[offset:end])
+
+
+class FakeActor:
+    def __init__(self, client):
+        self.client = client
+
+    def call(self, run_input=None):
+        self.client.runs.append(run_input)
+        return {"status": "SUCCEEDED", "defaultDatasetId": "fake-dataset"}
+
+
+class FakeApifyClient:
+    def __init__(self, items, empty_reads=0):
+        self.dataset_client = FakeDataset(items, empty_reads)
+        self.runs = []
+
+    def actor(self, actor_id):
+        return FakeActor(self)
+
+    def dataset(self, dataset_id):
+        return self.dataset_client
+
+
+def load_items():
+    items = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "tiktok_*_dataset.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            items.extend(json.load(f))
+    return items
+
+
+def expected_top(items, days_back, limit):
+    """Reference implementation: filter by date, fully sort by likes, slice."""
+    cutoff = datetime.now() - timedelta(days=days_back)
+    recent = [
+        item for item in items
+        if item.get('webVideoUrl') and item.get('createTimeISO')
+        and datetime.fromisoformat(item['createTimeISO'].rstrip('Z')) >= cutoff
+    ]
+    recent.sort(key=lambda item: item.get('diggCount') or 0, reverse=True)
+    return [item['webVideoUrl'] for item in recent[:limit]]
+
+
+def test_single_pass():
+    items = load_items()
+    client = FakeApifyClient(items)
+    urls = get_top_tiktok_videos("dance", days_back=3650, client=client)
+
+    pages = len(items) // 100 + 1
+    assert client.dataset_client.list_calls == pages, client.dataset_client.list_calls
+    assert urls == expected_top(items, 3650, 15)
+    assert os.path.isdir(os.path.join(archive.default_archive_dir(), "tiktok", "dance"))
+    print(f"✅ single pass: {len(urls)} videos from {client.dataset_client.list_calls} dataset read(s)")
+
+
+def test_date_window():
+    items = load_items()
+    newest = max(datetime.fromisoformat(item['createTimeISO'].rstrip('Z')) for item in items)
+    days_back = (datetime.now() - newest).days + 3
+    urls = get_top_tiktok_videos("dance", days_back=days_back, client=FakeApifyClient(items))
+    assert urls == expected_top(items, days_back, 15)
+    print(f"✅ date window: {len(urls)} videos within {days_back} days")
+
+
+def test_retry_only_when_empty():
+    items = load_items()
+    dataset = FakeDataset(items, empty_reads=2)
+    streamed = list(_stream_dataset_items(dataset, retry_delay=0))
+    assert len(streamed) == len(items)
+    assert dataset.list_calls == 3
+
+    dataset = FakeDataset([])
+    assert list(_stream_dataset_items(dataset, max_retries=3, retry_delay=0)) == []
+    assert dataset.list_calls == 3
+    print("✅ retries only while the dataset is empty")
+
+
+def test_batch_grouping():
+    items = load_items()
+    half = len(items) // 2
+    tagged = [dict(item, input="first") for item in items[:half]]
+    tagged += [dict(item, input="second") for item in items[half:]]
+    tagged.append({"input": "missing", "error": "This profile/hashtag does not exist."})
+
+    client = FakeApifyClient(tagged)
+    results = get_top_tiktok_videos_batch(
+        ["first", "second", "missing"], days_back=3650, limit={"first": 3}, client=client
+    )
+    assert len(client.runs) == 1
+    assert client.runs[0]["resultsLimit"] == 20
+    assert results["first"] == expected_top(items[:half], 3650, 3)
+    assert results["second"] == expected_top(items[half:], 3650, 15)
+    assert results["missing"] == []
+    print("✅ batch: one actor run, results ranked per query")
+
+
+def test_batch_results_per_query():
+    items = [dict(item, input="big") for item in load_items()]
+    client = FakeApifyClient(items)
+    results = get_top_tiktok_videos_batch(["small", "big"], days_back=3650, limit={"small": 5, "big": 60}, client=client)
+    # The actor is asked for enough videos to fill the largest limit
+    assert client.runs[0]["resultsLimit"] == 80
+    assert results["big"] == expected_top(items, 3650, 60)
+
+    client = FakeApifyClient(items[:1])
+    get_top_tiktok_videos_batch(["a"], limit=100, results_per_query=30, client=client)
+    assert client.runs[0]["resultsLimit"] == 30
+    print("✅ batch: results per query follow the largest limit unless given")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as monkeypatch:
+        use_temporary_archive(monkeypatch, os.path.join(tmp, "discovery_archive"))
+        test_single_pass()
+        test_date_window()
+        test_retry_only_when_empty()
+        test_batch_grouping()
+        test_batch_results_per_query()
+    print("\n🎉 All streaming dataset tests passed")
@@ -4,21 +4,140 @@ TikTok Video Scraper Service
 
 This module provides a service to retrieve the top 15 TikTok videos posted within 
 the last two weeks for a given search query, using the Apify TikTok Scraper.
+Several hashtags can be ranked from a single actor run with get_top_tiktok_videos_batch.
 """
 
 import os
+import sys
 import logging
 import time
-from datetime import datetime, timedelta
-from typing import List, Union
+from typing import Callable, Dict, Iterator, List, Optional, Union
 from apify_client import ApifyClient
 from dotenv import load_dotenv
 
+# Add the root directory to the Python path to access the shared RateLimiter, Ranking and Discovery packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import throttle, APIFY
+from Ranking import TopK
+from Discovery.archive import default_archive_writer
+from Discovery.records import VideoRecord
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Number of dataset items requested per page while streaming
+DATASET_PAGE_SIZE = 100
+
+# Videos collected per query for the default limit of 15; the date window drops some of them
+DEFAULT_RESULTS_PER_QUERY = 20
+
+
+def _get_client():
+    """Returns an ApifyClient for APIFY_API_TOKEN, or None if the token is not set."""
+    api_token = os.environ.get('APIFY_API_TOKEN')
+    if not api_token:
+        logging.error("APIFY_API_TOKEN environment variable is not set")
+        return None
+    return ApifyClient(api_token)
+
+
+def _run_tiktok_actor(client, search_queries: List[str], results_per_query: int = DEFAULT_RESULTS_PER_QUERY):
+    """
+    Runs the clockworks/tiktok-scraper actor once for all search queries and returns a client
+    for its default dataset. Each dataset item carries the search query that produced it in
+    its 'input' field.
+    """
+    # Configure scraper input
+    scraper_input = {
+        "searchQueries": search_queries,
+        "resultsLimit": results_per_query,
+        "resultsPerPage": results_per_query
+    }
+
+    # Run the clockworks/tiktok-scraper actor
+    print(f"Running TikTok scraper for search queries: {search_queries}")
+    with throttle(APIFY):
+        run = client.actor("clockworks/tiktok-scraper").call(run_input=scraper_input)
+
+    print(f"Run completed with status: {run.get('status')}")
+    print(f"Dataset ID: {run.get('defaultDatasetId')}")
+
+    return client.dataset(run["defaultDatasetId"])
+
+
+def _stream_dataset_items(dataset, page_size: int = DATASET_PAGE_SIZE, max_retries: int = 3,
+                          retry_delay: float = 1.0) -> Iterator[dict]:
+    """
+    Yields the items of an Apify dataset page by page in a single pass.
+
+    The actor call only returns once the run has finished, so the items are read right
+    away. Only a dataset that is still empty is re-read, with exponential backoff, to
+    cover the short delay before a finished run's items become visible.
+    """
+    delay = retry_delay
+    for attempt in range(max_retries):
+        offset = 0
+        while True:
+            with throttle(APIFY):
+                page = dataset.list_items(offset=offset, limit=page_size)
+            items = page.items
+            yield from items
+            offset += len(items)
+            if len(items) < page_size:
+                break
+
+        if offset > 0:
+            print(f"Streamed {offset} items from dataset")
+            return
+
+        if attempt < max_retries - 1:
+            print(f"Dataset is empty (attempt {attempt + 1}), retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            delay *= 2
+
+    print("No items retrieved from dataset")
+
 
-def get_top_tiktok_videos(search_queries: Union[str, List[str]], days_back: int = 14) -> List[str]:
+class _TopRecentVideos:
+    """
+    Keeps the `limit` best scoring videos posted within the last `days_back` days while
+    items are streamed in. Each raw item is projected to a compact VideoRecord on
+    arrival, so only the ranked records outlive the stream.
+    """
+
+    def __init__(self, days_back: int, limit: int = 15, score: Union[str, Callable] = 'likes'):
+        self.days_back = days_back
+        self.cutoff = time.time() - days_back * 86400
+        self.seen = 0
+        self.recent = 0
+        self._top = TopK(limit, score)
+
+    def add(self, item: dict, query: Optional[str] = None):
+        self.seen += 1
+        record = VideoRecord.from_tiktok(item, query)
+        if record is None:
+            return
+        if record.created_at is None:
+            logging.warning(f"Skipping video without a valid creation time: {record.url}")
+            return
+        if record.created_at < self.cutoff:
+            return
+        self.recent += 1
+        self._top.push(record)
+
+    def records(self) -> List[VideoRecord]:
+        """Returns the kept records, best score first."""
+        return self._top.results()
+
+    def urls(self) -> List[str]:
+        """Returns the kept URLs, best score first."""
+        return [record.url for record in self._top.results()]
+
+
+def get_top_tiktok_videos(search_queries: Union[str, List[str]], days_back: int = 14,
+                          client=None, score: Union[str, Callable] = 'likes') -> List[str]:
     """
     Retrieves the top 15 TikTok videos posted in the last specified days for the given search query or queries
     using the Apify TikTok Scraper.
@@ -26,171 +145,44 @@ def get_top_tiktok_videos(search_queries: Union[str, List[str]], days_back: int
     Args:
         search_queries (Union[str, List[str]]): The search query or a list of search queries.
         days_back (int): Number of days to look back (default: 14 for two weeks).
+        client: Optional ApifyClient (or a compatible fake for offline tests). Defaults to a
+            client for APIFY_API_TOKEN.
+        score (Union[str, Callable]): Ranking score, a name from Ranking.SCORES ('likes',
+            'views', 'engagement_rate', 'recency_weighted_likes') or a function item -> float.
 
     Returns:
         list: A list of up to 15 TikTok video URLs, sorted by the number of likes (hearts)
-              in descending order. If fewer than 15 videos are found, the list will contain
-              all available videos.
+              (or the chosen score) in descending order. If fewer than 15 videos are found,
+              the list will contain all available videos.
     """
     
     try:
-        # Initialize Apify client
-        api_token = os.environ.get('APIFY_API_TOKEN')
-        if not api_token:
-            logging.error("APIFY_API_TOKEN environment variable is not set")
+        client = client or _get_client()
+        if client is None:
             return []
-        
-        client = ApifyClient(api_token)
 
         if isinstance(search_queries, str):
             search_queries = [search_queries]
         
-        # Configure scraper input
-        scraper_input = {
-            "searchQueries": search_queries,
-            "resultsLimit": 20,
-             "resultsPerPage": 20
-        }
-        
-        # Run the clockworks/tiktok-scraper actor
-        print(f"Running TikTok scraper for search queries: {search_queries}")
-        run = client.actor("clockworks/tiktok-scraper").call(run_input=scraper_input)
+        dataset = _run_tiktok_actor(client, search_queries)
         
-        # Debug: Print run information
-        print(f"Run completed with status: {run.get('status')}")
-        print(f"Dataset ID: {run.get('defaultDatasetId')}")
+        print(f"Filtering for videos from the last {days_back} days")
+        ranker = _TopRecentVideos(days_back, limit=15, score=score)
+        with default_archive_writer() as archive:
+            for item in _stream_dataset_items(dataset):
+                if archive is not None and 'error' not in item:
+                    archive.write('tiktok', item.get('input') or search_queries[0], item)
+                ranker.add(item)
         
-        # Wait a moment for the dataset to be fully populated
-        print("Waiting for dataset to be ready...")
-        time.sleep(5)  # Increased wait time
-        
-        # Get the dataset from the run
-        dataset = client.dataset(run["defaultDatasetId"])
-
-        dataset_dict = dataset.list_items()
-        dataset_dict = dataset_dict.items
-        # Try multiple methods to get dataset items with retry logic
-        dataset_items = []
-        max_retries = 3
-        # INSERT_YOUR_CODE
-        # Write dataset items to a .json file for debugging/inspection
-        import json
-        #output_filename = f"tiktok_{search_queries[0]}_dataset.json"
-        #try:
-        #    with open(output_filename, "w", encoding="utf-8") as f:
-        #        json.dump(dataset_dict, f, ensure_ascii=False, indent=2)
-        #    print(f"Dataset written to {output_filename}")
-        #except Exception as e:
-        #    print(f"Failed to write dataset to file: {e}")
-        
-        for attempt in range(max_retries):
-            try:
-                # Method 1: iterate_items() converted to list
-                dataset_items = list(dataset.iterate_items())
-                print(f"Attempt {attempt + 1} - iterate_items(): Fetched {len(dataset_items)} items from dataset")
-                
-                # If we got a reasonable number of items, break
-                if len(dataset_items) > 5:  # Expect more than just a few items
-                    break
-                    
-                # If we got some items but not many, wait and try again
-                if len(dataset_items) > 0:
-                    print(f"Got {len(dataset_items)} items, but expected more. Waiting and retrying...")
-                    time.sleep(3)
-                    
-            except Exception as e:
-                print(f"Attempt {attempt + 1} failed: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    
-        # If still no items, try alternative methods
-        if len(dataset_items) == 0:
-            try:
-                # Try direct API call with pagination
-                print("Trying direct API call...")
-                all_items = []
-                offset = 0
-                limit = 100
-                
-                while True:
-                    response = dataset.get_items(offset=offset, limit=limit)
-                    if not response:
-                        break
-                    all_items.extend(response)
-                    if len(response) < limit:
-                        break
-                    offset += limit
-                    
-                dataset_items = all_items
-                print(f"Direct API call: Fetched {len(dataset_items)} items")
-                
-            except Exception as e:
-                print(f"Direct API call failed: {e}")
-                dataset_items = []
-        
-        # If we got items, check their structure
-        if dataset_items:
-            print(f"Total items retrieved: {len(dataset_items)}")
-            print("Sample item structure:", type(dataset_items[0]), list(dataset_items[0].keys()) if dataset_items[0] else "No keys")
-            print("FIRST FEW DATASET ITEMS: ", dataset_items[:1])
-        else:
-            print("No items retrieved from any method")
-
-
-        if not dataset_items:
+        if ranker.seen == 0:
             print(f"No videos found for search queries: {search_queries}")
             return []
         
-        # Calculate the cutoff date
-        cutoff_date = datetime.now() - timedelta(days=days_back)
-        print(f"Filtering for videos newer than: {cutoff_date} ({days_back} days back)")
-        
-        # Filter videos from the specified time period
-        recent_videos = []
-        for item in dataset_items:
-            try:
-                # Parse the createTimeISO (e.g., '2025-07-13T00:41:15.000Z')
-                create_time_iso = item.get('createTimeISO')
-                if create_time_iso:
-                    # Remove 'Z' and parse as UTC time
-                    if create_time_iso.endswith('Z'):
-                        create_time_iso = create_time_iso[:-1]
-                    
-                    # Parse the ISO format datetime
-                    video_date = datetime.fromisoformat(create_time_iso)
-                    
-                    print(f"Video date: {video_date}, Cutoff: {cutoff_date}, Within range: {video_date >= cutoff_date}")
-                    
-                    # Check if the video was posted within the specified time period
-                    if video_date >= cutoff_date:
-                        recent_videos.append(item)
-                        print(f"Added video with {item.get('diggCount', 0)} likes from {video_date}")
-                        
-            except (ValueError, TypeError) as e:
-                logging.warning(f"Error parsing createTimeISO for video: {e}")
-                continue
-        
-        if not recent_videos:
+        if ranker.recent == 0:
             print(f"No videos found within the last {days_back} days for search queries: {search_queries}")
             return []
         
-        # Sort by stats.hearts (likes) in descending order
-        def get_hearts(video):
-            # TikTok API returns likes as 'diggCount', not 'stats.hearts'
-            return video.get('diggCount', 0)
-        
-        sorted_videos = sorted(recent_videos, key=get_hearts, reverse=True)
-        
-        # Select the top 15 videos and extract their URLs
-        top_videos = sorted_videos[:15]
-        video_urls = []
-        
-        for video in top_videos:
-            # TikTok API returns URL as 'webVideoUrl', not 'url'
-            url = video.get('webVideoUrl')
-            if url:
-                video_urls.append(url)
-        
+        video_urls = ranker.urls()
         print(f"Found {len(video_urls)} videos for search queries: {search_queries}")
         return video_urls
         
@@ -198,6 +190,87 @@ def get_top_tiktok_videos(search_queries: Union[str, List[str]], days_back: int
         logging.error(f"Error in get_top_tiktok_videos: {e}")
         return []
 
+
+def _per_query(value: Union[int, Dict[str, int]], query: str, default: int) -> int:
+    if isinstance(value, dict):
+        return value.get(query, default)
+    return value
+
+
+def _results_per_query(limit: Union[int, Dict[str, int]], search_queries: List[str]) -> int:
+    """Collects a third more than the largest per-query limit, leaving room for videos outside the date window."""
+    largest = max(_per_query(limit, query, 15) for query in search_queries)
+    return max(DEFAULT_RESULTS_PER_QUERY, -(-largest * 4 // 3))
+
+
+def get_top_tiktok_videos_batch(search_queries: List[str],
+                                days_back: Union[int, Dict[str, int]] = 14,
+                                limit: Union[int, Dict[str, int]] = 15,
+                                results_per_query: Optional[int] = None,
+                                client=None,
+                                score: Union[str, Callable] = 'likes') -> Dict[str, List[str]]:
+    """
+    Retrieves the top TikTok videos for many search queries (e.g. hashtags) with a single
+    Apify actor run, ranking each query's videos separately.
+
+    Starting one run for the whole list amortizes actor startup and the dataset fetch,
+    instead of paying for both once per hashtag.
+
+    Args:
+        search_queries (List[str]): The search queries to run.
+        days_back (Union[int, Dict[str, int]]): Date window in days, either for all queries
+            or per query (queries missing from the dict use 14).
+        limit (Union[int, Dict[str, int]]): Number of URLs to return, for all queries or per
+            query (queries missing from the dict use 15).
+        results_per_query (Optional[int]): Number of videos the actor collects for each
+            query. Defaults to a third more than the largest limit in the batch (at least 20),
+            so a query with a large limit isn't capped by the others.
+        client: Optional ApifyClient (or a compatible fake for offline tests).
+        score (Union[str, Callable]): Ranking score, a name from Ranking.SCORES or a function.
+
+    Returns:
+        dict: Maps every search query to its list of video URLs, sorted by likes (or the
+              chosen score) in descending order. Queries without recent videos map to an empty list.
+    """
+    results = {query: [] for query in search_queries}
+    
+    try:
+        client = client or _get_client()
+        if client is None or not search_queries:
+            return results
+        
+        if results_per_query is None:
+            results_per_query = _results_per_query(limit, search_queries)
+        dataset = _run_tiktok_actor(client, search_queries, results_per_query)
+        
+        # Rank each query's items as they stream in
+        rankers = {
+            query: _TopRecentVideos(_per_query(days_back, query, 14), limit=_per_query(limit, query, 15), score=score)
+            for query in search_queries
+        }
+        with default_archive_writer() as archive:
+            for item in _stream_dataset_items(dataset):
+                query = item.get('input')
+                if query not in rankers and len(search_queries) == 1:
+                    query = search_queries[0]
+                if query not in rankers:
+                    logging.warning(f"Skipping dataset item for unknown search query: {query}")
+                    continue
+                if archive is not None and 'error' not in item:
+                    archive.write('tiktok', query, item)
+                rankers[query].add(item, query)
+        
+        for query, ranker in rankers.items():
+            results[query] = ranker.urls()
+            print(f"Found {len(results[query])} videos for search query: {query} "
+                  f"({ranker.recent} of {ranker.seen} within {ranker.days_back} days)")
+        
+        return results
+        
+    except Exception as e:
+        logging.error(f"Error in get_top_tiktok_videos_batch: {e}")
+        return results
+
 """
 if __name__ == "__main__":
     # Test the function with a sample search query
@@ -0,0 +1,43 @@
+"""
+Discovery Package
+
+This package provides the async, concurrent Apify discovery layer used by the ingestion pipeline
+and the compressed archive of discovered items.
+
+The re-exports below are imported on first use, so `Discovery.jsonio`, `Discovery.records`
+and `Discovery.archive` can be used without the async layer's dependencies (httpx).
+"""
+
+import importlib
+
+_EXPORTS = {
+    'ActorRunSpec': 'async_apify',
+    'ApifyRunError': 'async_apify',
+    'AsyncApifyClient': 'async_apify',
+    'RunResult': 'async_apify',
+    'discover_links': 'async_apify',
+    'discover_links_sync': 'async_apify',
+    'instagram_run': 'async_apify',
+    'run_actors': 'async_apify',
+    'tiktok_run': 'async_apify',
+    'DiscoveryArchive': 'archive',
+    'default_archive_writer': 'archive',
+    'get_default_archive': 'archive',
+    'replay_links': 'archive',
+    'VideoRecord': 'records',
+    'parse_item': 'records',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
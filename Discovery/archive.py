@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Discovery Archive
+
+A compressed, append-only archive of the raw items returned by the Apify discovery
+actors. Items are stored as newline-delimited JSON, zstd-compressed (gzip when the
+optional zstandard package is not installed), and partitioned as
+
+    <archive>/<platform>/<hashtag>/<YYYY-MM-DD>.ndjson.zst
+
+by the UTC date they were discovered. Every append writes a new compressed frame to
+the day's partition, so files are never rewritten. A SQLite index maps each item id
+to the partitions it appears in.
+
+The link getters append to the archive as they stream items, and replay_links()
+re-ranks archived items offline without new Apify runs.
+"""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Add the root directory to the Python path to access the shared Ranking and Discovery packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from Ranking import TopK
+from Discovery.records import VideoRecord, parse_item
+from Discovery import jsonio
+
+DEFAULT_ARCHIVE_DIR = os.path.join(root_dir, "discovery_archive")
+EXTENSION = ".ndjson.zst" if zstandard else ".ndjson.gz"
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_items (
+    platform TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    hashtag TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    discovered_at TEXT NOT NULL,
+    PRIMARY KEY (platform, item_id, partition)
+);
+CREATE INDEX IF NOT EXISTS idx_archived_hashtag ON archived_items (platform, hashtag, discovered_at);
+"""
+
+
+def _partition_name(value: str) -> str:
+    """
+    Makes a hashtag/search query safe to use as a directory name.
+
+    Plain hashtags keep their name. Queries that had to be rewritten (spaces,
+    punctuation, non-ASCII) get a short hash of the query appended, so "pizza near me"
+    and "pizza-near-me!" don't share a partition.
+    """
+    raw = value.lstrip('#').strip()
+    name = re.sub(r'[^A-Za-z0-9_-]+', '_', raw).strip('_')
+    if name == raw:
+        return name
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:8]
+    return f"{name}-{digest}" if name else digest
+
+
+def item_id(item: dict) -> Optional[str]:
+    """Returns an item's id (TikTok 'id', Instagram 'id'/'shortCode'), or its URL as a fallback."""
+    value = item.get('id') or item.get('shortCode') or item.get('webVideoUrl') or item.get('url')
+    return str(value) if value is not None else None
+
+
+def _open_read(path: str):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed; install the 'zstandard' package to read it")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return gzip.open(path, 'rt', encoding='utf-8')
+
+
+class _PartitionWriter:
+    """Appends one compressed frame (zstd) or member (gzip) to a partition file."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'ab')
+        if zstandard is not None:
+            self._stream = zstandard.ZstdCompressor(level=10).stream_writer(self._file, closefd=False)
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._file, mode='ab', compresslevel=6)
+
+    def write(self, line: bytes):
+        self._stream.write(line)
+
+    def close(self):
+        self._stream.close()
+        self._file.close()
+
+
+class ArchiveWriter:
+    """
+    Streams items into the archive. Use as a context manager; frames are finished and
+    the index is committed on exit.
+    """
+
+    def __init__(self, archive: 'DiscoveryArchive', discovered_at: Optional[datetime] = None):
+        self.archive = archive
+        self.discovered_at = discovered_at or datetime.now(timezone.utc)
+        self.count = 0
+        self._writers: Dict[str, _PartitionWriter] = {}
+        self._index_rows: List[tuple] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, platform: str, hashtag: str, item: dict):
+        partition = self.archive.partition_path(platform, hashtag, self.discovered_at)
+        writer = self._writers.get(partition)
+        if writer is None:
+            writer = self._writers[partition] = _PartitionWriter(os.path.join(self.archive.root, partition))
+        writer.write(jsonio.dumps(item) + b'\n')
+        self.count += 1
+
+        identifier = item_id(item)
+        if identifier is not None:
+            self._index_rows.append((_partition_name(platform), identifier, _partition_name(hashtag), partition,
+                                     self.discovered_at.isoformat()))
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+        self.archive._index(self._index_rows)
+        self._index_rows = []
+
+
+class DiscoveryArchive:
+    """
+    Partitioned, compressed NDJSON archive of discovered items with an id index.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        root = root or default_archive_dir() or DEFAULT_ARCHIVE_DIR
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        with self._lock:
+            self._conn.executescript(INDEX_SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def partition_path(self, platform: str, hashtag: str, discovered_at: datetime) -> str:
+        """Returns the partition file for an item, relative to the archive root."""
+        day = discovered_at.astimezone(timezone.utc).strftime('%Y-%m-%d')
+        return os.path.join(_partition_name(platform), _partition_name(hashtag), day + EXTENSION)
+
+    def _index(self, rows: List[tuple]):
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO archived_items (platform, item_id, hashtag, partition, discovered_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def writer(self, discovered_at: Optional[datetime] = None) -> ArchiveWriter:
+        """Returns a writer for streaming items in; see ArchiveWriter."""
+        return ArchiveWriter(self, discovered_at)
+
+    def append(self, platform: str, hashtag: str, items: Iterable[dict],
+               discovered_at: Optional[datetime] = None) -> int:
+        """Appends items discovered for one hashtag. Returns the number written."""
+        with self.writer(discovered_at) as writer:
+            for item in items:
+                writer.write(platform, hashtag, item)
+            return writer.count
+
+    def partitions(self, platform: Optional[str] = None, hashtag: Optional[str] = None,
+                   since: Optional[str] = None, until: Optional[str] = None) -> List[str]:
+        """
+        Lists partition files (relative paths), oldest first, optionally filtered by
+        platform, hashtag and an inclusive YYYY-MM-DD date range.
+        """
+        results = []
+        platforms = [_partition_name(platform)] if platform else sorted(
+            name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name)))
+        for platform_dir in platforms:
+            platform_path = os.path.join(self.root, platform_dir)
+            if not os.path.isdir(platform_path):
+                continue
+            hashtags = [_partition_name(hashtag)] if hashtag else sorted(os.listdir(platform_path))
+            for hashtag_dir in hashtags:
+                hashtag_path = os.path.join(platform_path, hashtag_dir)
+                if not os.path.isdir(hashtag_path):
+                    continue
+                for filename in sorted(os.listdir(hashtag_path)):
+                    if not filename.endswith(('.ndjson.zst', '.ndjson.gz')):
+                        continue
+                    day = filename.split('.', 1)[0]
+                    if (since and day < since) or (until and day > until):
+                        continue
+                    results.append(os.path.join(platform_dir, hashtag_dir, filename))
+        return sorted(results, key=lambda path: (os.path.basename(path), path))
+
+    def iter_records(self, platform: Optional[str] = None, hashtag: Optional[str] = None,
+                     since: Optional[str] = None, until: Optional[str] = None
+                     ) -> Iterator[Tuple[str, str, str, dict]]:
+        """Streams (platform, hashtag, date, item) tuples from the matching partitions, oldest first."""
+        for partition in self.partitions(platform, hashtag, since, until):
+            platform_dir, hashtag_dir, filename = partition.split(os.sep)
+            with _open_read(os.path.join(self.root, partition)) as f:
+                for line in f:
+                    if line.strip():
+                        yield platform_dir, hashtag_dir, filename.split('.', 1)[0], jsonio.loads(line)
+
+    def iter_items(self, platform: Optional[str] = None, hashtag: Optional[str] = None,
+                   since: Optional[str] = None, until: Optional[str] = None) -> Iterator[dict]:
+        for _, _, _, item in self.iter_records(platform, hashtag, since, until):
+            yield item
+
+    def get(self, platform: str, identifier: str) -> Optional[dict]:
+        """Returns the most recently archived copy of an item, looked up through the id index."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT partition FROM archived_items WHERE platform = ? AND item_id = ? "
+                "ORDER BY discovered_at DESC LIMIT 1",
+                (_partition_name(platform), identifier)
+            ).fetchone()
+        if row is None:
+            return None
+        found = None
+        with _open_read(os.path.join(self.root, row[0])) as f:
+            for line in f:
+                if identifier in line:
+                    item = jsonio.loads(line)
+                    if item_id(item) == identifier:
+                        found = item
+        return found
+
+    def hashtags(self, platform: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT hashtag FROM archived_items WHERE platform = ? ORDER BY hashtag",
+                (_partition_name(platform),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict:
+        """Returns item/partition counts and the archive's size on disk."""
+        partitions = self.partitions()
+        size = sum(os.path.getsize(os.path.join(self.root, p)) for p in partitions)
+        with self._lock:
+            items = self._conn.execute("SELECT COUNT(*) FROM archived_items").fetchone()[0]
+            ids = self._conn.execute("SELECT COUNT(DISTINCT platform || ':' || item_id) FROM archived_items").fetchone()[0]
+        return {
+            'partitions': len(partitions),
+            'indexed_items': items,
+            'unique_ids': ids,
+            'bytes': size,
+            'compression': 'zstd' if zstandard else 'gzip',
+        }
+
+
+def default_archive_dir() -> str:
+    """
+    Returns DISCOVERY_ARCHIVE_DIR (default: DEFAULT_ARCHIVE_DIR), or '' if archiving is
+    disabled. Read on every call, so changes after import take effect.
+    """
+    return os.getenv("DISCOVERY_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+
+
+def get_default_archive() -> Optional[DiscoveryArchive]:
+    """Returns the archive at DISCOVERY_ARCHIVE_DIR, or None if archiving is disabled (set to '')."""
+    root = default_archive_dir()
+    if not root:
+        return None
+    return DiscoveryArchive(root)
+
+
+@contextmanager
+def default_archive_writer():
+    """
+    Yields an ArchiveWriter on the default archive, or None if archiving is disabled.
+    The writer and the archive are closed on exit.
+    """
+    archive = get_default_archive()
+    if archive is None:
+        yield None
+        return
+    try:
+        with archive.writer() as writer:
+            yield writer
+    finally:
+        archive.close()
+
+
+def replay_links(archive: DiscoveryArchive, hashtags: List[str], platform: str = 'tiktok',
+                 days_back: int = 14, limit: int = 15, score: Union[str, Callable] = 'likes',
+                 as_of: Optional[datetime] = None) -> Dict[str, List[str]]:
+    """
+    Re-ranks archived items per hashtag without running any actor.
+
+    Args:
+        archive (DiscoveryArchive): The archive to read.
+        hashtags (List[str]): Hashtags/search queries to replay.
+        platform (str): 'tiktok' or 'instagram'.
+        days_back (int): Only keep videos posted within this many days of `as_of`.
+        limit (int): Number of URLs per hashtag.
+        score (Union[str, Callable]): Ranking score, a name from Ranking.SCORES or a function.
+        as_of (datetime): Reference time for the date window (default: now).
+
+    Returns:
+        dict: Maps each hashtag to its URLs, best score first. An item archived several
+              times is ranked once, using its most recent copy.
+    """
+    reference = as_of or datetime.now(timezone.utc)
+    if reference.tzinfo is None:
+        reference = reference.replace(tzinfo=timezone.utc)
+    cutoff = reference - timedelta(days=days_back)
+
+    results = {}
+    for hashtag in hashtags:
+        # Keep only the most recent compact record per video
+        latest: Dict[str, VideoRecord] = {}
+        for item in archive.iter_items(platform, hashtag):
+            record = parse_item(platform, item, hashtag)
+            if record is not None:
+                latest[record.id] = record
+
+        start, end = cutoff.timestamp(), reference.timestamp()
+        ranker = TopK(limit, score)
+        for record in latest.values():
+            if record.created_at is not None and start <= record.created_at <= end:
+                ranker.push(record)
+        results[hashtag] = [record.url for record in ranker.results()]
+    return results
+
+
+def import_dataset_file(archive: DiscoveryArchive, path: str) -> int:
+    """
+    Imports a legacy tiktok_*_dataset.json / instagram_*_dataset.json dump (or a JSONL
+    file of items), streaming it item by item and using the file's modification time
+    as the discovery date.
+    """
+    filename = os.path.basename(path)
+    platform = 'instagram' if filename.startswith('instagram_') else 'tiktok'
+    default_hashtag = filename[len(platform) + 1:-len('_dataset.json')] if filename.endswith('_dataset.json') else filename
+    discovered_at = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+
+    with archive.writer(discovered_at) as writer:
+        for item in jsonio.iter_items(path):
+            if 'error' in item:
+                continue
+            if platform == 'tiktok':
+                hashtag = item.get('input') or default_hashtag
+            else:
+                hashtag = (item.get('inputUrl') or '').rstrip('/').rsplit('/', 1)[-1] or default_hashtag
+            writer.write(platform, hashtag, item)
+        return writer.count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the discovery archive")
+    parser.add_argument('--archive', default=default_archive_dir() or DEFAULT_ARCHIVE_DIR,
+                        help='Archive directory (default: DISCOVERY_ARCHIVE_DIR or <repo>/discovery_archive)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Import tiktok_*/instagram_*_dataset.json files')
+    import_parser.add_argument('files', nargs='+')
+
+    subparsers.add_parser('stats', help='Show archive size and item counts')
+
+    replay_parser = subparsers.add_parser('replay', help='Re-rank archived items for hashtags')
+    replay_parser.add_argument('hashtags', nargs='+')
+    replay_parser.add_argument('--platform', default='tiktok', choices=['tiktok', 'instagram'])
+    replay_parser.add_argument('--days-back', type=int, default=14)
+    replay_parser.add_argument('--limit', type=int, default=15)
+    replay_parser.add_argument('--score', default='likes')
+    replay_parser.add_argument('--as-of', help='ISO date the date window ends at (default: now)')
+
+    args = parser.parse_args()
+    archive = DiscoveryArchive(args.archive)
+
+    if args.command == 'import':
+        for path in args.files:
+            count = import_dataset_file(archive, path)
+            print(f"📥 Imported {count} items from {path}")
+    elif args.command == 'stats':
+        stats = archive.stats()
+        print(f"📦 {stats['partitions']} partitions, {stats['indexed_items']} indexed items "
+              f"({stats['unique_ids']} unique), {stats['bytes'] / 1024:.1f} KB ({stats['compression']})")
+    elif args.command == 'replay':
+        as_of = datetime.fromisoformat(args.as_of) if args.as_of else None
+        links = replay_links(archive, args.hashtags, platform=args.platform, days_back=args.days_back,
+                             limit=args.limit, score=args.score, as_of=as_of)
+        print(json.dumps(links, indent=2))
+
+    archive.close()
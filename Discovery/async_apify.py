@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Async Apify Discovery
+
+An asyncio discovery layer over the Apify HTTP API. Instead of blocking a thread for
+each synchronous ApifyClient.actor(...).call(), several actor runs (TikTok and
+Instagram, several hashtag batches) are started at once, each is awaited with its own
+timeout, and dataset items are streamed while the runs are still going.
+
+Usage:
+    results = discover_links_sync(
+        tiktok_queries=["DowntownJerseyCityEats", "JournalSquareFood"],
+        instagram_hashtags=["jerseycityeats"],
+        days_back=30,
+    )
+    # {"tiktok": {"DowntownJerseyCityEats": [...], ...}, "instagram": {"jerseycityeats": [...]}}
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import httpx
+from dotenv import load_dotenv
+
+# Add the root directory to the Python path to access the shared RateLimiter and Ranking packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import async_throttle, APIFY
+from Ranking import TopK
+from Discovery.archive import default_archive_writer
+from Discovery.records import parse_item
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+APIFY_API_URL = os.getenv("APIFY_API_BASE_URL", "https://api.apify.com")
+TIKTOK_ACTOR = "clockworks/tiktok-scraper"
+INSTAGRAM_ACTOR = "apify/instagram-hashtag-scraper"
+
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+
+DEFAULT_RUN_TIMEOUT = float(os.getenv("APIFY_RUN_TIMEOUT", 600))
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_RESULTS_PER_QUERY = 20
+
+
+class ApifyRunError(Exception):
+    """Raised when an actor run ends in a status other than SUCCEEDED."""
+
+    def __init__(self, message: str, status: Optional[str] = None):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class ActorRunSpec:
+    """One actor run to start: a name for its results, the actor and its input."""
+    name: str
+    platform: str
+    actor_id: str
+    run_input: dict
+    queries: List[str]
+    timeout: float = DEFAULT_RUN_TIMEOUT
+
+
+@dataclass
+class RunResult:
+    """
+    Outcome of one actor run.
+
+    `status` is the run's terminal Apify status: SUCCEEDED, FAILED, ABORTED or
+    TIMED-OUT. A run still going after `spec.timeout` is aborted and reported as
+    ABORTED (TIMED-OUT if the abort request failed); FAILED also covers errors
+    talking to the API.
+    """
+    spec: ActorRunSpec
+    run_id: Optional[str] = None
+    status: Optional[str] = None
+    item_count: int = 0
+    error: Optional[str] = None
+    items: List[dict] = field(default_factory=list)
+
+
+class AsyncApifyClient:
+    """
+    Minimal async client for the Apify v2 HTTP API.
+
+    Every request goes through the shared 'apify' token bucket. Use it as an async
+    context manager so the underlying connection pool is closed.
+    """
+
+    def __init__(self, token: Optional[str] = None, base_url: str = APIFY_API_URL,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, page_size: int = DEFAULT_PAGE_SIZE):
+        self.token = token or os.getenv('APIFY_API_TOKEN')
+        self.base_url = base_url.rstrip('/')
+        self.poll_interval = poll_interval
+        self.page_size = page_size
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self):
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        self._http = httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=60.0)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._http.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs):
+        async with async_throttle(APIFY):
+            response = await self._http.request(method, path, **kwargs)
+            response.raise_for_status()
+        return response.json()
+
+    async def start_run(self, actor_id: str, run_input: dict) -> dict:
+        """Starts an actor run without waiting for it. Returns the run object."""
+        path = f"/v2/acts/{actor_id.replace('/', '~')}/runs"
+        return (await self._request("POST", path, json=run_input))["data"]
+
+    async def get_run(self, run_id: str) -> dict:
+        return (await self._request("GET", f"/v2/actor-runs/{run_id}"))["data"]
+
+    async def abort_run(self, run_id: str) -> dict:
+        return (await self._request("POST", f"/v2/actor-runs/{run_id}/abort"))["data"]
+
+    async def list_items(self, dataset_id: str, offset: int = 0, limit: Optional[int] = None) -> List[dict]:
+        params = {"offset": offset, "limit": limit or self.page_size, "clean": "true", "format": "json"}
+        return await self._request("GET", f"/v2/datasets/{dataset_id}/items", params=params)
+
+    async def stream_run_items(self, run: dict) -> AsyncIterator[dict]:
+        """
+        Yields a run's dataset items as they are written, until the run has finished
+        and its dataset has been read to the end.
+
+        Raises:
+            ApifyRunError: If the run finishes with a status other than SUCCEEDED.
+        """
+        run_id, dataset_id = run["id"], run["defaultDatasetId"]
+        offset = 0
+        status = run.get("status")
+        while True:
+            finished = status in TERMINAL_STATUSES
+            while True:
+                items = await self.list_items(dataset_id, offset)
+                for item in items:
+                    yield item
+                offset += len(items)
+                if len(items) < self.page_size:
+                    break
+            if finished:
+                break
+            await asyncio.sleep(self.poll_interval)
+            status = (await self.get_run(run_id)).get("status")
+
+        if status != "SUCCEEDED":
+            raise ApifyRunError(f"Run {run_id} finished with status {status}", status=status)
+
+
+def tiktok_run(search_queries: List[str], results_per_query: int = DEFAULT_RESULTS_PER_QUERY,
+               timeout: float = DEFAULT_RUN_TIMEOUT) -> ActorRunSpec:
+    """Builds a clockworks/tiktok-scraper run for a batch of search queries."""
+    return ActorRunSpec(
+        name=f"tiktok:{','.join(search_queries)}",
+        platform="tiktok",
+        actor_id=TIKTOK_ACTOR,
+        run_input={
+            "searchQueries": search_queries,
+            "resultsLimit": results_per_query,
+            "resultsPerPage": results_per_query,
+        },
+        queries=list(search_queries),
+        timeout=timeout,
+    )
+
+
+def instagram_run(hashtags: List[str], results_limit: int = 50,
+                  timeout: float = DEFAULT_RUN_TIMEOUT) -> ActorRunSpec:
+    """Builds an apify/instagram-hashtag-scraper run for a batch of hashtags."""
+    return ActorRunSpec(
+        name=f"instagram:{','.join(hashtags)}",
+        platform="instagram",
+        actor_id=INSTAGRAM_ACTOR,
+        run_input={
+            "hashtags": hashtags,
+            "resultsLimit": results_limit,
+            "resultsPerPage": results_limit,
+            "resultsType": "stories",
+        },
+        queries=list(hashtags),
+        timeout=timeout,
+    )
+
+
+def results_per_query_for(limit: int) -> int:
+    """Collects a third more than `limit` per query, leaving room for videos outside the date window."""
+    return max(DEFAULT_RESULTS_PER_QUERY, -(-limit * 4 // 3))
+
+
+def batched(values: List[str], batch_size: int) -> List[List[str]]:
+    batch_size = max(1, batch_size)
+    return [values[i:i + batch_size] for i in range(0, len(values), batch_size)]
+
+
+async def _run_one(client: AsyncApifyClient, spec: ActorRunSpec,
+                   on_item: Optional[Callable[[ActorRunSpec, dict], None]], keep_items: bool) -> RunResult:
+    result = RunResult(spec=spec)
+    try:
+        run = await client.start_run(spec.actor_id, spec.run_input)
+        result.run_id = run["id"]
+        logger.info(f"Started {spec.name} as run {result.run_id}")
+
+        async def consume():
+            async for item in client.stream_run_items(run):
+                result.item_count += 1
+                if keep_items:
+                    result.items.append(item)
+                if on_item is not None:
+                    on_item(spec, item)
+
+        await asyncio.wait_for(consume(), timeout=spec.timeout)
+        result.status = "SUCCEEDED"
+    except asyncio.TimeoutError:
+        # Our own timeout: the run is still going until we abort it
+        result.status = "TIMED-OUT"
+        result.error = f"Run did not finish within {spec.timeout:g}s"
+        logger.warning(f"{spec.name}: {result.error}, aborting")
+        if result.run_id:
+            try:
+                await client.abort_run(result.run_id)
+                result.status = "ABORTED"
+            except Exception as e:
+                logger.warning(f"Could not abort run {result.run_id}: {e}")
+    except ApifyRunError as e:
+        # The run itself ended as FAILED, ABORTED or TIMED-OUT on Apify's side
+        result.status = e.status or "FAILED"
+        result.error = str(e)
+        logger.error(f"{spec.name} failed: {e}")
+    except Exception as e:
+        result.status = "FAILED"
+        result.error = str(e)
+        logger.error(f"{spec.name} failed: {e}")
+    logger.info(f"{spec.name}: {result.status}, {result.item_count} items")
+    return result
+
+
+async def run_actors(client: AsyncApifyClient, specs: List[ActorRunSpec],
+                     on_item: Optional[Callable[[ActorRunSpec, dict], None]] = None,
+                     keep_items: bool = False) -> List[RunResult]:
+    """
+    Starts every run concurrently and waits for all of them.
+
+    Args:
+        client (AsyncApifyClient): An open client.
+        specs (List[ActorRunSpec]): Runs to start.
+        on_item (callable): Called with (spec, item) for every item as it is streamed.
+        keep_items (bool): Also collect the items on each RunResult.
+
+    Returns:
+        list: One RunResult per spec, in the same order. A run that fails or times out
+              does not affect the others.
+    """
+    return await asyncio.gather(*(_run_one(client, spec, on_item, keep_items) for spec in specs))
+
+
+def _item_query(spec: ActorRunSpec, item: dict) -> Optional[str]:
+    """Finds which of the run's queries produced an item."""
+    if spec.platform == "tiktok":
+        query = item.get('input')
+    else:
+        # Instagram items carry e.g. 'https://www.instagram.com/explore/tags/dance'
+        query = (item.get('inputUrl') or '').rstrip('/').rsplit('/', 1)[-1]
+        matches = [q for q in spec.queries if q.lstrip('#').lower() == query.lower()]
+        query = matches[0] if matches else None
+    if query not in spec.queries and len(spec.queries) == 1:
+        query = spec.queries[0]
+    return query if query in spec.queries else None
+
+
+async def discover_links(tiktok_queries: List[str] = (), instagram_hashtags: List[str] = (),
+                         days_back: int = 14, limit: int = 15, batch_size: int = 5,
+                         results_per_query: Optional[int] = None,
+                         score: Union[str, Callable] = 'likes', timeout: float = DEFAULT_RUN_TIMEOUT,
+                         client: Optional[AsyncApifyClient] = None,
+                         on_item: Optional[Callable[[ActorRunSpec, dict], None]] = None,
+                         archive: bool = True) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Discovers top video links for TikTok queries and Instagram hashtags with concurrent actor runs.
+
+    The queries are split into batches of `batch_size`, one actor run per batch and
+    platform, and every run is started at once. Items are date-filtered and ranked per
+    query while they stream in.
+
+    Args:
+        tiktok_queries (List[str]): TikTok search queries / hashtags.
+        instagram_hashtags (List[str]): Instagram hashtags without '#'.
+        days_back (int): Only keep videos posted within this many days.
+        limit (int): Number of URLs to return per query.
+        batch_size (int): Queries per actor run.
+        results_per_query (int): Videos each TikTok run collects per query (default: a third
+                                 more than `limit`, at least 20).
+        score (Union[str, Callable]): Ranking score, a name from Ranking.SCORES or a function.
+        timeout (float): Per-run timeout in seconds; late runs are aborted.
+        client (AsyncApifyClient): Optional open client (default: one for APIFY_API_TOKEN).
+        on_item (callable): Optional hook called with (spec, item) for every streamed item.
+        archive (bool): Append the streamed items to the discovery archive.
+
+    Returns:
+        dict: {'tiktok': {query: [urls]}, 'instagram': {hashtag: [urls]}}, each list sorted
+              by score in descending order. Queries from failed runs map to an empty list.
+    """
+    if results_per_query is None:
+        results_per_query = results_per_query_for(limit)
+    specs = [tiktok_run(batch, results_per_query, timeout=timeout) for batch in batched(list(tiktok_queries), batch_size)]
+    specs += [instagram_run(batch, timeout=timeout) for batch in batched(list(instagram_hashtags), batch_size)]
+
+    cutoff = time.time() - days_back * 86400
+    rankers: Dict[Tuple[str, str], TopK] = {
+        (spec.platform, query): TopK(limit, score) for spec in specs for query in spec.queries
+    }
+
+    async def run_all(writer):
+        def rank_item(spec: ActorRunSpec, item: dict):
+            if on_item is not None:
+                on_item(spec, item)
+            query = _item_query(spec, item)
+            if query is None:
+                return
+            if writer is not None and 'error' not in item:
+                writer.write(spec.platform, query, item)
+            # Only the compact record is kept past this point
+            record = parse_item(spec.platform, item, query)
+            if record is None or record.created_at is None or record.created_at < cutoff:
+                return
+            rankers[(spec.platform, query)].push(record)
+
+        if client is None:
+            async with AsyncApifyClient() as own_client:
+                await run_actors(own_client, specs, on_item=rank_item)
+        else:
+            await run_actors(client, specs, on_item=rank_item)
+
+    if archive:
+        with default_archive_writer() as writer:
+            await run_all(writer)
+    else:
+        await run_all(None)
+
+    results: Dict[str, Dict[str, List[str]]] = {"tiktok": {}, "instagram": {}}
+    for (platform, query), ranker in rankers.items():
+        results[platform][query] = [record.url for record in ranker.results()]
+    return results
+
+
+def discover_links_sync(*args, **kwargs) -> Dict[str, Dict[str, List[str]]]:
+    """Synchronous wrapper around discover_links for scripts that don't run an event loop."""
+    return asyncio.run(discover_links(*args, **kwargs))
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Discover top TikTok/Instagram links with concurrent Apify runs")
+    parser.add_argument('--tiktok', nargs='*', default=[], help='TikTok search queries / hashtags')
+    parser.add_argument('--instagram', nargs='*', default=[], help='Instagram hashtags')
+    parser.add_argument('--days-back', type=int, default=14)
+    parser.add_argument('--limit', type=int, default=15)
+    parser.add_argument('--batch-size', type=int, default=5, help='Queries per actor run (default: 5)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_RUN_TIMEOUT, help='Per-run timeout in seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    links = discover_links_sync(args.tiktok, args.instagram, days_back=args.days_back, limit=args.limit,
+                                batch_size=args.batch_size, timeout=args.timeout)
+    print(json.dumps(links, indent=2))
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+JSON Loading Benchmark
+
+Compares parse time and peak memory for the checked-in discovery dumps and the
+recommendations export:
+
+    stdlib      json.load of the whole document
+    orjson      jsonio.load (orjson if installed) of the whole document
+    streaming   jsonio.iter_items, consuming one record at a time
+
+Usage:
+    python benchmark_json.py
+    python benchmark_json.py --repeat 20 ../Processor/tiktok_jerseycitynj_dataset.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from Discovery import jsonio
+
+DEFAULT_FILES = (sorted(glob.glob(os.path.join(root_dir, 'Processor', 'tiktok_*_dataset.json')))
+                 + sorted(glob.glob(os.path.join(root_dir, 'ApifyLinkGetter', 'tiktok_*_dataset.json')))
+                 + sorted(glob.glob(os.path.join(root_dir, 'ApifyInstaGetter', 'instagram_*_dataset.json')))
+                 + [os.path.join(root_dir, 'jersey_city_recommendations.jsonl')])
+
+
+def stdlib_load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return sum(1 for line in f for _ in jsonio._iter_concatenated(line.strip()) if line.strip())
+        return len(json.load(f))
+
+
+def fast_load(path):
+    if path.endswith('.jsonl'):
+        return len(list(jsonio.iter_jsonl(path)))
+    return len(jsonio.load(path))
+
+
+def streaming(path):
+    return sum(1 for _ in jsonio.iter_items(path))
+
+
+def measure(fn, path, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        count = fn(path)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON parsing of the discovery datasets")
+    parser.add_argument('files', nargs='*', default=DEFAULT_FILES)
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per file (default: 10)')
+    args = parser.parse_args()
+
+    print(f"⚡ orjson {'available' if jsonio.HAS_ORJSON else 'not installed, using stdlib'}\n")
+    print(f"{'file':<42} {'KB':>6} | {'method':<9} | {'records':>7} | {'time':>8} | {'peak':>8}")
+    print("-" * 92)
+    for path in args.files:
+        size = os.path.getsize(path) / 1024
+        name = os.path.relpath(path, root_dir)
+        for label, fn in (('stdlib', stdlib_load), ('orjson', fast_load), ('streaming', streaming)):
+            count, elapsed, peak = measure(fn, path, args.repeat)
+            print(f"{name[:42]:<42} {size:>6.0f} | {label:<9} | {count:>7} | "
+                  f"{elapsed * 1000:>6.2f}ms | {peak / 1e6:>5.2f} MB")
+        print()
+
+
+if __name__ == "__main__":
+    main()
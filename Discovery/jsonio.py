@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Fast JSON Loading
+
+JSON helpers for the discovery datasets and recommendation exports. orjson is used
+when it is installed and the stdlib json module otherwise, and large files can be
+iterated item by item instead of being loaded whole:
+
+    iter_array(path)   streams the elements of a top-level JSON array (the
+                       tiktok_*_dataset.json / instagram_*_dataset.json dumps)
+    iter_jsonl(path)   streams newline-delimited JSON, including lines that hold
+                       several concatenated records
+    iter_items(path)   picks one of the two from the file extension
+
+Streaming keeps peak memory at one element plus a read buffer rather than the
+whole document.
+"""
+
+import io
+import json
+from typing import IO, Any, Iterator, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+# Characters read per chunk while streaming arrays
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parses a JSON document with orjson if available."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializes compact JSON (UTF-8, non-ASCII kept) to bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def load(path: str) -> Any:
+    """Loads a whole JSON file. Prefer iter_items() for large arrays."""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def _open_text(source: Union[str, IO]) -> IO:
+    if isinstance(source, str):
+        return open(source, 'r', encoding='utf-8')
+    if isinstance(source, io.TextIOBase):
+        return source
+    return io.TextIOWrapper(source, encoding='utf-8')
+
+
+def iter_array(source: Union[str, IO], chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yields the elements of a top-level JSON array one at a time.
+
+    The file is read in chunks and each element is decoded as soon as it is complete,
+    so only the current element and the unread part of the buffer are in memory.
+
+    Args:
+        source (str or file): Path or open file (text or binary).
+        chunk_size (int): Characters read per chunk.
+
+    Raises:
+        ValueError: If the document is not a JSON array.
+    """
+    f = _open_text(source)
+    try:
+        buffer = f.read(chunk_size)
+        pos = 0
+        eof = not buffer
+
+        def fill():
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+        def skip_whitespace():
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    return
+                fill()
+
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError("Expected a JSON array")
+        pos += 1
+
+        while True:
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise ValueError("Unterminated JSON array")
+            if buffer[pos] == ']':
+                return
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number cut by the end of the buffer ("1." of "1.5e3") decodes as a shorter
+            # value, so only accept a value once the ',' or ']' after it has been read
+            delimiter = end
+            while delimiter < len(buffer) and buffer[delimiter] in _WHITESPACE:
+                delimiter += 1
+            if (delimiter == len(buffer) or buffer[delimiter] not in ',]') and not eof:
+                fill()
+                continue
+            pos = end
+            yield value
+    finally:
+        if isinstance(source, str):
+            f.close()
+
+
+def _iter_concatenated(line: str) -> Iterator[Any]:
+    """Decodes several JSON values written on one line, separated by whitespace or literal '\\n'."""
+    pos = 0
+    while pos < len(line):
+        while pos < len(line) and (line[pos] in _WHITESPACE or line.startswith('\\n', pos)):
+            pos += 2 if line.startswith('\\n', pos) else 1
+        if pos >= len(line):
+            return
+        value, pos = _decoder.raw_decode(line, pos)
+        yield value
+
+
+def iter_jsonl(source: Union[str, IO]) -> Iterator[Any]:
+    """
+    Yields the records of a newline-delimited JSON file.
+
+    Lines that hold several records (e.g. an export joined with a literal '\\n') are
+    split into their records. Blank lines are skipped.
+    """
+    f = open(source, 'rb') if isinstance(source, str) else source
+    try:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError:
+                text = line.decode('utf-8') if isinstance(line, bytes) else line
+                yield from _iter_concatenated(text.strip())
+    finally:
+        if isinstance(source, str):
+            f.close()
+
+
+def iter_items(path: str) -> Iterator[Any]:
+    """Streams the records of a .json array or a .jsonl/.ndjson file."""
+    if path.endswith(('.jsonl', '.ndjson')):
+        return iter_jsonl(path)
+    return iter_array(path)
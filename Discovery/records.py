@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Discovered Video Records
+
+A compact, typed projection of the items returned by the Apify TikTok and Instagram
+actors. Raw TikTok items carry large nested authorMeta/musicMeta/videoMeta objects
+and signed avatar URLs that discovery never uses; a VideoRecord keeps only the
+fields needed to rank and hand off a video, in a __slots__ dataclass, so items can
+be projected as they stream in and the raw dicts dropped immediately.
+"""
+
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+
+def _int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _epoch(value) -> Optional[float]:
+    """Parses an epoch number or ISO-8601 string (with or without 'Z') into epoch seconds."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        text = value[:-1] + '+00:00' if value.endswith('Z') else value
+        parsed = datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+@dataclass
+class VideoRecord:
+    """One discovered video."""
+    __slots__ = ('platform', 'id', 'url', 'created_at', 'likes', 'plays', 'shares', 'comments',
+                 'author_id', 'hashtags', 'query')
+
+    platform: str
+    id: str
+    url: str
+    created_at: Optional[float]   # epoch seconds, UTC
+    likes: int
+    plays: int
+    shares: int
+    comments: int
+    author_id: Optional[str]
+    hashtags: Tuple[str, ...]
+    query: Optional[str]          # search query / hashtag that discovered the video
+
+    @property
+    def created(self) -> Optional[datetime]:
+        if self.created_at is None:
+            return None
+        return datetime.fromtimestamp(self.created_at, tz=timezone.utc)
+
+    @classmethod
+    def from_tiktok(cls, item: dict, query: Optional[str] = None) -> Optional['VideoRecord']:
+        """Projects a clockworks/tiktok-scraper item. Returns None for error items or items without a URL."""
+        url = item.get('webVideoUrl')
+        if not url or 'error' in item:
+            return None
+        author = item.get('authorMeta') or {}
+        created_at = _epoch(item.get('createTime'))
+        if created_at is None:
+            created_at = _epoch(item.get('createTimeISO'))
+        return cls(
+            platform='tiktok',
+            id=str(item.get('id') or url),
+            url=url,
+            created_at=created_at,
+            likes=_int(item.get('diggCount')),
+            plays=_int(item.get('playCount')),
+            shares=_int(item.get('shareCount')),
+            comments=_int(item.get('commentCount')),
+            author_id=str(author['id']) if author.get('id') else None,
+            hashtags=tuple(sys.intern(tag['name']) for tag in item.get('hashtags') or ()
+                           if isinstance(tag, dict) and tag.get('name')),
+            query=query or item.get('input'),
+        )
+
+    @classmethod
+    def from_instagram(cls, item: dict, query: Optional[str] = None) -> Optional['VideoRecord']:
+        """Projects an apify/instagram-hashtag-scraper item. Returns None for non-video items."""
+        url = item.get('url')
+        is_video = item.get('type') == 'Video' or item.get('productType') == 'clips' or 'videoUrl' in item
+        if not url or not is_video or 'error' in item:
+            return None
+        if query is None and item.get('inputUrl'):
+            query = item['inputUrl'].rstrip('/').rsplit('/', 1)[-1]
+        return cls(
+            platform='instagram',
+            id=str(item.get('id') or item.get('shortCode') or url),
+            url=url,
+            created_at=_epoch(item.get('timestamp')),
+            likes=_int(item.get('likesCount') or item.get('likeCount') or item.get('likes')),
+            plays=_int(item.get('videoPlayCount') or item.get('igPlayCount')),
+            shares=_int(item.get('reshareCount')),
+            comments=_int(item.get('commentsCount')),
+            author_id=str(item['ownerId']) if item.get('ownerId') else None,
+            hashtags=tuple(sys.intern(tag) for tag in item.get('hashtags') or () if isinstance(tag, str)),
+            query=query,
+        )
+
+
+def parse_item(platform: str, item: dict, query: Optional[str] = None) -> Optional[VideoRecord]:
+    """Projects a raw Apify item of the given platform ('tiktok' or 'instagram')."""
+    if platform == 'instagram':
+        return VideoRecord.from_instagram(item, query)
+    return VideoRecord.from_tiktok(item, query)
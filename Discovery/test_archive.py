@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the discovery archive
+
+Imports the checked-in tiktok_*/instagram_*_dataset.json dumps into a temporary
+archive and checks compression, partitioning, repeated appends, the id index and
+offline replay against ranking the original files directly.
+"""
+
+import glob
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Discovery.archive import DiscoveryArchive, import_dataset_file, item_id, replay_links
+from Ranking import top_k, item_timestamp
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATASETS = sorted(glob.glob(os.path.join(ROOT, 'ApifyLinkGetter', 'tiktok_*_dataset.json'))
+                  + glob.glob(os.path.join(ROOT, 'Processor', 'tiktok_*_dataset.json'))
+                  + glob.glob(os.path.join(ROOT, 'ApifyInstaGetter', 'instagram_*_dataset.json')))
+
+
+def test_import_and_compression():
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = DiscoveryArchive(tmp)
+        imported = sum(import_dataset_file(archive, path) for path in DATASETS)
+        stats = archive.stats()
+        original = sum(os.path.getsize(path) for path in DATASETS)
+
+        assert imported > 0 and stats['indexed_items'] > 0
+        assert stats['bytes'] < original / 4, (stats['bytes'], original)
+        assert all(len(p.split(os.sep)) == 3 for p in archive.partitions())
+        assert 'dance' in archive.hashtags('tiktok') and 'dance' in archive.hashtags('instagram')
+        archive.close()
+        print(f"✅ {imported} items in {stats['partitions']} partitions: "
+              f"{original / 1024:.0f} KB -> {stats['bytes'] / 1024:.0f} KB ({stats['compression']})")
+
+
+def test_append_and_index():
+    with open(os.path.join(ROOT, 'ApifyLinkGetter', 'tiktok_dance_dataset.json'), encoding='utf-8') as f:
+        items = json.load(f)
+    day = datetime(2025, 7, 16, tzinfo=timezone.utc)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = DiscoveryArchive(tmp)
+        archive.append('tiktok', 'dance', items[:20], discovered_at=day)
+        archive.append('tiktok', 'dance', items[20:], discovered_at=day)
+        archive.append('tiktok', 'dance', items[:5], discovered_at=day + timedelta(days=1))
+
+        assert len(archive.partitions('tiktok', 'dance')) == 2
+        assert len(list(archive.iter_items('tiktok', 'dance', since='2025-07-16', until='2025-07-16'))) == len(items)
+        assert archive.get('tiktok', item_id(items[30])) == items[30]
+        assert archive.get('tiktok', 'does-not-exist') is None
+        archive.close()
+        print("✅ appends add frames to the day's partition and the id index finds items")
+
+
+def test_partition_names():
+    day = datetime(2025, 7, 16, tzinfo=timezone.utc)
+    queries = ["pizza near me", "pizza_near_me", "pizza-near-me!", "#pizza near me", "café", "cafe", "日本"]
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = DiscoveryArchive(tmp)
+        for i, query in enumerate(queries):
+            archive.append('tiktok', query, [{'id': str(i)}], discovered_at=day)
+        names = [archive.partition_path('tiktok', query, day).split(os.sep)[1] for query in queries]
+        # Plain hashtags keep their name; a leading '#' doesn't make a different query
+        assert names[1] == "pizza_near_me" and names[5] == "cafe" and names[0] == names[3]
+        assert len(set(names)) == len(queries) - 1, names
+        assert all(name.isascii() and '/' not in name for name in names)
+        assert [item['id'] for item in archive.iter_items('tiktok', 'pizza near me')] == ['0', '3']
+        assert [item['id'] for item in archive.iter_items('tiktok', 'pizza-near-me!')] == ['2']
+        archive.close()
+    print("✅ queries that normalize to the same name get separate partitions")
+
+
+def test_replay_matches_direct_ranking():
+    path = os.path.join(ROOT, 'ApifyLinkGetter', 'tiktok_dance_dataset.json')
+    with open(path, encoding='utf-8') as f:
+        items = json.load(f)
+    as_of = datetime(2025, 7, 16, tzinfo=timezone.utc)
+    cutoff = as_of - timedelta(days=14)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = DiscoveryArchive(tmp)
+        archive.append('tiktok', 'dance', items)
+        # A second discovery of the same videos must not double count them
+        archive.append('tiktok', 'dance', items)
+        replayed = replay_links(archive, ['dance'], days_back=14, as_of=as_of)['dance']
+        archive.close()
+
+    expected = [item['webVideoUrl'] for item in top_k(
+        items, 15, predicate=lambda item: cutoff <= item_timestamp(item) <= as_of)]
+    assert replayed == expected, (replayed, expected)
+    print(f"✅ offline replay returns the same {len(replayed)} videos as ranking the raw dump")
+
+
+if __name__ == "__main__":
+    test_import_and_compression()
+    test_append_and_index()
+    test_partition_names()
+    test_replay_matches_direct_ranking()
+    print("\n🎉 All discovery archive tests passed")
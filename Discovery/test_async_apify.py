@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Test script for the async Apify discovery layer
+
+Starts a local mock of the Apify v2 HTTP API (actor runs, run status, abort and
+dataset items) and checks that runs are started concurrently, that items are
+streamed while a run is still RUNNING, that a run exceeding its timeout is
+aborted without affecting the others, and that runs report their real terminal status. No API token or network access is needed.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from RateLimiter import configure_limiter, APIFY
+from Discovery import AsyncApifyClient, discover_links, run_actors, tiktok_run, instagram_run
+from Discovery.async_apify import results_per_query_for
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# The mock server has no rate limit
+configure_limiter(APIFY, qps=1000, burst=1000)
+
+
+def load_fixture(pattern):
+    items = []
+    for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+        with open(path, 'r', encoding='utf-8') as f:
+            items.extend(json.load(f))
+    return items
+
+
+class MockApify:
+    """
+    In-memory Apify state. Each run writes its items in `chunks` steps, one step per
+    status poll, and finishes after the last step. Runs for actors listed in
+    `stuck_actors` never finish; actors in `final_statuses` end with that status
+    instead of SUCCEEDED.
+    """
+
+    def __init__(self, tiktok_items, instagram_items, chunks=3, stuck_actors=(), final_statuses=None):
+        self.tiktok_items = tiktok_items
+        self.instagram_items = instagram_items
+        self.chunks = chunks
+        self.stuck_actors = set(stuck_actors)
+        self.final_statuses = final_statuses or {}
+        self.runs = {}
+        self.start_times = []
+        self.aborted = []
+        self.inputs = []
+        self.items_read_while_running = 0
+        self.lock = threading.Lock()
+
+    def start(self, actor, run_input):
+        with self.lock:
+            run_id = f"run{len(self.runs)}"
+            self.inputs.append(run_input)
+            if 'searchQueries' in run_input:
+                queries = run_input['searchQueries']
+                items = [dict(item, input=q) for q in queries for item in self.tiktok_items[:run_input['resultsLimit']]]
+            else:
+                items = [dict(item, inputUrl=f"https://www.instagram.com/explore/tags/{tag}")
+                         for tag in run_input['hashtags'] for item in self.instagram_items]
+            self.runs[run_id] = {"actor": actor, "items": items, "step": 0, "status": "RUNNING"}
+            self.start_times.append(time.monotonic())
+            return self._run_data(run_id)
+
+    def _run_data(self, run_id):
+        run = self.runs[run_id]
+        return {"id": run_id, "status": run["status"], "defaultDatasetId": f"ds-{run_id}"}
+
+    def poll(self, run_id):
+        with self.lock:
+            run = self.runs[run_id]
+            if run["status"] == "RUNNING" and run["actor"] not in self.stuck_actors:
+                run["step"] += 1
+                if run["step"] >= self.chunks:
+                    run["status"] = self.final_statuses.get(run["actor"], "SUCCEEDED")
+            return self._run_data(run_id)
+
+    def abort(self, run_id):
+        with self.lock:
+            self.runs[run_id]["status"] = "ABORTED"
+            self.aborted.append(run_id)
+            return self._run_data(run_id)
+
+    def items(self, dataset_id, offset, limit):
+        with self.lock:
+            run = self.runs[dataset_id[len("ds-"):]]
+            items = run["items"]
+            if run["status"] == "RUNNING":
+                visible = items[:len(items) * run["step"] // self.chunks]
+            else:
+                visible = items
+            page = visible[offset:offset + limit]
+            if run["status"] == "RUNNING":
+                self.items_read_while_running += len(page)
+            return page
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200 if payload is not None else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            path = urlparse(self.path).path.split('/')
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if path[2] == "acts" and path[4] == "runs":
+                self._send({"data": state.start(path[3], body)})
+            elif path[2] == "actor-runs" and path[4] == "abort":
+                self._send({"data": state.abort(path[3])})
+            else:
+                self._send(None)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = url.path.split('/')
+            query = parse_qs(url.query)
+            if path[2] == "actor-runs":
+                self._send({"data": state.poll(path[3])})
+            elif path[2] == "datasets":
+                self._send(state.items(path[3], int(query["offset"][0]), int(query["limit"][0])))
+            else:
+                self._send(None)
+
+    return Handler
+
+
+def serve(state):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_concurrent_runs_stream_items():
+    state = MockApify(load_fixture("ApifyLinkGetter/tiktok_*_dataset.json"),
+                      load_fixture("ApifyInstaGetter/instagram_*_dataset.json"))
+    server, url = serve(state)
+
+    async def main():
+        async with AsyncApifyClient(token="test", base_url=url, poll_interval=0.2, page_size=10) as client:
+            start = time.perf_counter()
+            results = await discover_links(
+                tiktok_queries=["dance", "food", "coffee"], instagram_hashtags=["dance"],
+                days_back=3650, limit=5, batch_size=2, client=client, archive=False,
+            )
+            return results, time.perf_counter() - start
+
+    results, elapsed = asyncio.run(main())
+    server.shutdown()
+
+    assert len(state.runs) == 3, state.runs.keys()
+    assert max(state.start_times) - min(state.start_times) < 0.5, "runs were not started concurrently"
+    assert state.items_read_while_running > 0, "items were not streamed while runs were RUNNING"
+    assert set(results["tiktok"]) == {"dance", "food", "coffee"}
+    assert all(len(urls) == 5 for urls in results["tiktok"].values())
+    assert len(results["instagram"]["dance"]) == 5
+    assert [run_input.get("resultsLimit") for run_input in state.inputs if "searchQueries" in run_input] == [20, 20]
+    print(f"✅ 3 concurrent runs finished in {elapsed:.2f}s, "
+          f"{state.items_read_while_running} items streamed before their run finished")
+
+
+def test_results_per_query_follows_limit():
+    state = MockApify(load_fixture("ApifyLinkGetter/tiktok_*_dataset.json"), [])
+    server, url = serve(state)
+
+    async def main():
+        async with AsyncApifyClient(token="test", base_url=url, poll_interval=0.05) as client:
+            return await discover_links(tiktok_queries=["dance"], days_back=3650, limit=30, client=client,
+                                        archive=False)
+
+    asyncio.run(main())
+    server.shutdown()
+    # A third more than the limit, leaving room for videos outside the date window
+    assert [run_input["resultsLimit"] for run_input in state.inputs] == [40]
+    assert results_per_query_for(1) == 20 and results_per_query_for(15) == 20 and results_per_query_for(16) == 22
+    print("✅ TikTok runs collect a third more videos than the requested limit (at least 20)")
+
+
+def test_timeout_aborts_only_slow_run():
+    state = MockApify(load_fixture("ApifyLinkGetter/tiktok_*_dataset.json"),
+                      load_fixture("ApifyInstaGetter/instagram_*_dataset.json"),
+                      stuck_actors={"apify~instagram-hashtag-scraper"})
+    server, url = serve(state)
+
+    async def main():
+        async with AsyncApifyClient(token="test", base_url=url, poll_interval=0.1) as client:
+            specs = [tiktok_run(["dance"], timeout=5), instagram_run(["dance"], timeout=1)]
+            return await run_actors(client, specs)
+
+    tiktok_result, instagram_result = asyncio.run(main())
+    server.shutdown()
+
+    assert tiktok_result.status == "SUCCEEDED" and tiktok_result.item_count == 20
+    assert instagram_result.status == "ABORTED" and "within 1s" in instagram_result.error
+    assert state.aborted == [instagram_result.run_id]
+    print("✅ slow run timed out and was aborted, the other run completed")
+
+
+def test_terminal_statuses():
+    for final_status in ("ABORTED", "TIMED-OUT", "FAILED"):
+        state = MockApify(load_fixture("ApifyLinkGetter/tiktok_*_dataset.json"), [],
+                          final_statuses={"clockworks~tiktok-scraper": final_status})
+        server, url = serve(state)
+
+        async def main():
+            async with AsyncApifyClient(token="test", base_url=url, poll_interval=0.05) as client:
+                return await run_actors(client, [tiktok_run(["dance"])])
+
+        (result,) = asyncio.run(main())
+        server.shutdown()
+        assert result.status == final_status and final_status in result.error, (final_status, result)
+        assert state.aborted == []
+
+    # Errors talking to the API are FAILED
+    async def unreachable():
+        async with AsyncApifyClient(token="test", base_url="http://127.0.0.1:9") as client:
+            return await run_actors(client, [tiktok_run(["dance"])])
+
+    (result,) = asyncio.run(unreachable())
+    assert result.status == "FAILED" and result.run_id is None
+    print("✅ runs report their real terminal status (ABORTED, TIMED-OUT, FAILED)")
+
+
+if __name__ == "__main__":
+    test_concurrent_runs_stream_items()
+    test_results_per_query_follows_limit()
+    test_timeout_aborts_only_slow_run()
+    test_terminal_statuses()
+    print("\n🎉 All async discovery tests passed")
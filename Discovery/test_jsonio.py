@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script for the fast JSON loader
+
+Checks that the streaming readers return exactly what a full json.load returns for
+the checked-in dataset dumps and the recommendations export.
+"""
+
+import glob
+import io
+import json
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Discovery import jsonio
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def test_iter_array_matches_json_load():
+    paths = (glob.glob(os.path.join(ROOT, '*', 'tiktok_*_dataset.json'))
+             + glob.glob(os.path.join(ROOT, 'ApifyInstaGetter', 'instagram_*_dataset.json')))
+    assert paths
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+        # A small odd chunk size splits strings and numbers across reads
+        assert list(jsonio.iter_array(path, chunk_size=97)) == expected, path
+        assert jsonio.load(path) == expected, path
+    print(f"✅ Streamed {len(paths)} dataset files identically to json.load")
+
+
+def test_iter_array_edge_cases():
+    assert list(jsonio.iter_array(io.StringIO('[]'))) == []
+    assert list(jsonio.iter_array(io.StringIO(' [1, 22, 333 ,{"a": [4]}] '), chunk_size=1)) == [1, 22, 333, {"a": [4]}]
+    assert list(jsonio.iter_array(io.BytesIO('["é", 1.5e3]'.encode('utf-8')), chunk_size=2)) == ["é", 1500.0]
+    for bad in ('{"a": 1}', '[1, 2'):
+        try:
+            list(jsonio.iter_array(io.StringIO(bad)))
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{bad!r} should not parse")
+    print("✅ Empty arrays, split numbers and malformed input are handled")
+
+
+def test_iter_jsonl():
+    records = list(jsonio.iter_jsonl(os.path.join(ROOT, 'jersey_city_recommendations.jsonl')))
+    assert len(records) == 51 and all(isinstance(r, dict) for r in records)
+
+    data = b'{"a": 1}\n\n{"b": 2}\\n{"c": 3}\n'
+    assert list(jsonio.iter_jsonl(io.BytesIO(data))) == [{"a": 1}, {"b": 2}, {"c": 3}]
+    assert jsonio.loads(jsonio.dumps({"name": "café"})) == {"name": "café"}
+    print("✅ JSONL records, including concatenated lines, are streamed")
+
+
+def test_import_needs_no_async_layer():
+    # Scraper and the query pipeline load JSONL through jsonio without httpx installed
+    code = ("import sys; import Discovery.jsonio, Discovery.archive, Discovery.records; "
+            "assert 'httpx' not in sys.modules and 'Discovery.async_apify' not in sys.modules")
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+    print("✅ jsonio, records and archive import without the async Apify layer")
+
+
+if __name__ == "__main__":
+    test_iter_array_matches_json_load()
+    test_iter_array_edge_cases()
+    test_iter_jsonl()
+    test_import_needs_no_async_layer()
+    print("\n🎉 All JSON loader tests passed")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the compact discovered-video records
+
+Projects the checked-in TikTok and Instagram dataset dumps into VideoRecords and
+compares the memory held by tens of thousands of records against the raw dicts.
+"""
+
+import copy
+import glob
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Discovery.records import VideoRecord, parse_item
+from Ranking import top_k
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def load(pattern):
+    items = []
+    for path in sorted(glob.glob(os.path.join(ROOT, pattern))):
+        with open(path, 'r', encoding='utf-8') as f:
+            items.extend(json.load(f))
+    return items
+
+
+def test_tiktok_projection():
+    items = load('ApifyLinkGetter/tiktok_*_dataset.json')
+    item = items[0]
+    record = VideoRecord.from_tiktok(item)
+
+    assert record.id == item['id'] and record.url == item['webVideoUrl']
+    assert record.likes == item['diggCount'] and record.plays == item['playCount']
+    assert record.shares == item['shareCount'] and record.comments == item['commentCount']
+    assert record.author_id == item['authorMeta']['id']
+    assert record.created_at == item['createTime']
+    assert record.query == item['input']
+    assert '' not in record.hashtags
+    assert not hasattr(record, '__dict__')
+    assert VideoRecord.from_tiktok({"input": "#missing", "error": "This profile/hashtag does not exist."}) is None
+
+    ranked_items = [i['webVideoUrl'] for i in top_k(items, 15)]
+    ranked_records = [r.url for r in top_k((VideoRecord.from_tiktok(i) for i in items), 15)]
+    assert ranked_items == ranked_records
+    print("✅ TikTok items project to records and rank identically")
+
+
+def test_instagram_projection():
+    items = load('ApifyInstaGetter/instagram_*_dataset.json')
+    records = [parse_item('instagram', item) for item in items]
+    assert all(r is not None and r.query == 'dance' for r in records)
+    assert records[0].plays == items[0]['videoPlayCount']
+    assert records[0].author_id == items[0]['ownerId']
+    print(f"✅ {len(records)} Instagram items project to records")
+
+
+def test_memory():
+    items = load('ApifyLinkGetter/tiktok_*_dataset.json')
+    count = 20000
+
+    tracemalloc.start()
+    raw = [copy.deepcopy(items[i % len(items)]) for i in range(count)]
+    raw_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del raw
+
+    tracemalloc.start()
+    records = [VideoRecord.from_tiktok(items[i % len(items)]) for i in range(count)]
+    record_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+
+    assert record_bytes < raw_bytes / 10, (record_bytes, raw_bytes)
+    print(f"✅ {count} videos: raw dicts {raw_bytes / 1e6:.1f} MB, records {record_bytes / 1e6:.1f} MB "
+          f"({record_bytes / raw_bytes:.0%})")
+
+
+if __name__ == "__main__":
+    test_tiktok_projection()
+    test_instagram_projection()
+    test_memory()
+    print("\n🎉 All record tests passed")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Instagram detail fetching benchmark.
+
+Serves the fixtures/instagram_post.html post page from a local stub server, with
+per-request latency on documents and heavier latency on images, video and fonts,
+then fetches the same posts three ways in one Chromium:
+
+    sequential   the previous behaviour: a new tab per post, networkidle and a 2s sleep
+    pool         a tab pool of --concurrency tabs, without resource blocking
+    pool+block   the tab pool with images, media and fonts blocked (the scraper default)
+
+A final pass repeats the pooled fetch to show the per-post cache. Needs Playwright's
+Chromium (`playwright install chromium`).
+
+Usage:
+    python benchmark_instagram_details.py
+    python benchmark_instagram_details.py --posts 50 --concurrency 6 --headed
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from video_scraper import VideoScraper
+from RateLimiter import configure_limiter, INSTAGRAM
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'instagram_post.html')
+
+STATIC_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.mp4': 'video/mp4',
+    '.woff2': 'font/woff2',
+}
+
+
+def post_code(i: int) -> str:
+    return f"DLbench{i:04d}"
+
+
+def post_likes(i: int) -> int:
+    return (i * 7919) % 250000
+
+
+def post_time(i: int, now: datetime) -> datetime:
+    # Every fifth post is older than the two week window
+    return now - timedelta(days=30 if i % 5 == 4 else i % 13, hours=i % 24)
+
+
+def render_post_fixture(code: str, likes: int, posted: datetime) -> str:
+    """Fill the post page fixture for one post"""
+    with open(FIXTURE, 'r', encoding='utf-8') as f:
+        template = f.read()
+    return (template.replace('{code}', code)
+            .replace('{likes_text}', f"{likes:,}")
+            .replace('{likes}', str(likes))
+            .replace('{posted}', posted.isoformat()))
+
+
+class StubInstagramServer:
+    """Local HTTP server for /p/<code>/ post pages and their /static/ resources"""
+
+    def __init__(self, posts: int, document_latency: float = 0.15, static_latency: float = 0.4):
+        self.now = datetime.now(timezone.utc)
+        self.pages = {post_code(i): render_post_fixture(post_code(i), post_likes(i), post_time(i, self.now))
+                      for i in range(posts)}
+        self.requests = {'document': 0, 'static': 0}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith('/p/'):
+                    code = self.path.strip('/').split('/')[1]
+                    body = server.pages.get(code)
+                    if body is None:
+                        self.send_error(404)
+                        return
+                    server.requests['document'] += 1
+                    time.sleep(document_latency)
+                    self._send(body.encode('utf-8'), 'text/html; charset=utf-8')
+                elif self.path.startswith('/static/'):
+                    server.requests['static'] += 1
+                    time.sleep(static_latency)
+                    extension = os.path.splitext(self.path)[1]
+                    self._send(b'\0' * 64 * 1024, STATIC_TYPES.get(extension, 'application/octet-stream'))
+                else:
+                    self.send_error(404)
+
+            def _send(self, body, content_type):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def post_urls(self):
+        return [f"{self.base_url}/p/{code}/" for code in self.pages]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+async def fetch_sequential(scraper: VideoScraper, urls):
+    """The previous detail fetch: one fresh tab per post, networkidle, then a fixed 2s wait"""
+    context = scraper.page.context
+    videos = []
+    for url in urls:
+        tab = await context.new_page()
+        try:
+            await tab.goto(url, wait_until='networkidle', timeout=20000)
+            await asyncio.sleep(2)
+            await tab.content()
+            videos.append(url)
+        finally:
+            await tab.close()
+    return videos
+
+
+async def fetch_pooled(scraper: VideoScraper, urls, wanted):
+    async with scraper._detail_tabs(scraper.page.context) as tabs:
+        return await scraper._fetch_instagram_details(urls, tabs, wanted)
+
+
+async def run(args):
+    configure_limiter(INSTAGRAM, 1000, 1000)
+    rows = []
+
+    with StubInstagramServer(args.posts) as server:
+        urls = server.post_urls()
+
+        async def timed(label, fetch):
+            before = dict(server.requests)
+            start = time.perf_counter()
+            result = await fetch
+            elapsed = time.perf_counter() - start
+            rows.append((label, elapsed, len(result),
+                         server.requests['document'] - before['document'],
+                         server.requests['static'] - before['static']))
+            return result
+
+        async with VideoScraper(headless=not args.headed, storage_state_path=None, capture=False,
+                                detail_concurrency=args.concurrency) as scraper:
+            if not args.skip_sequential:
+                await timed('sequential', fetch_sequential(scraper, urls))
+
+            for label, block in (('pool', False), ('pool+block', True)):
+                scraper.block_resources = block
+                scraper._detail_cache.clear()
+                await timed(label, fetch_pooled(scraper, urls, wanted=len(urls)))
+
+            # Every post is cached now
+            await timed('cached', fetch_pooled(scraper, urls, wanted=len(urls)))
+
+            scraper._detail_cache.clear()
+            videos = await timed(f'early exit@{args.wanted}', fetch_pooled(scraper, urls, wanted=args.wanted))
+            in_window = sum(1 for video in videos if scraper._is_within_two_weeks(video.date))
+
+    print(f"📊 {args.posts} Instagram posts from a local stub server, {args.concurrency} tabs\n")
+    print(f"{'mode':<15} | {'time':>8} | {'posts':>5} | {'documents':>9} | {'static':>6}")
+    print("-" * 56)
+    for label, elapsed, count, documents, static in rows:
+        print(f"{label:<15} | {elapsed:>7.2f}s | {count:>5} | {documents:>9} | {static:>6}")
+    print(f"\n⏹️  Early exit kept {in_window} in-window posts out of {args.wanted} wanted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Instagram post detail fetching against a local stub server")
+    parser.add_argument('--posts', type=int, default=30, help='Number of post pages (default: 30)')
+    parser.add_argument('--concurrency', type=int, default=4, help='Detail tabs (default: 4)')
+    parser.add_argument('--wanted', type=int, default=10, help='In-window posts wanted for the early exit run (default: 10)')
+    parser.add_argument('--skip-sequential', action='store_true', help='Skip the slow sequential baseline')
+    parser.add_argument('--headed', action='store_true', help='Show the browser window')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Offline test for the VideoScraper browser context pool.
+
+Replaces Playwright with an in-process fake that counts browser launches and
+replaces the TikTok page scraping with a short sleep, then checks that
+scrape_many() shares one browser across all hashtags, keeps at most
+`pool_size` contexts busy, and persists/restores the storage state. The state
+is saved to a temporary file, never the real browser_state.json.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+import video_scraper
+from video_scraper import VideoScraper, VideoData, get_top_videos_many
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+
+class FakeContext:
+    def __init__(self, browser, storage_state, options=None):
+        self.browser = browser
+        self.storage_state_path = storage_state
+        self.options = options or {}
+        self.init_scripts = []
+        self.headers = {}
+
+    async def set_extra_http_headers(self, headers):
+        self.headers = headers
+
+    async def add_init_script(self, script):
+        self.init_scripts.append(script)
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def storage_state(self):
+        return {"cookies": [{"name": "sessionid", "value": "warm"}], "origins": []}
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.closed = False
+
+    async def new_context(self, storage_state=None, **kwargs):
+        # Yield like a real round trip to the browser, so concurrent creations interleave
+        await asyncio.sleep(0)
+        context = FakeContext(self, storage_state, kwargs)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launches = []
+
+    async def launch(self, headless, args):
+        browser = FakeBrowser()
+        self.launches.append((headless, browser))
+        return browser
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+
+class TimedScraper(VideoScraper):
+    """Scrapes a hashtag by sleeping, recording how many pages are busy at once"""
+
+    busy = 0
+    max_busy = 0
+    pages_used = set()
+
+    async def _scrape_tiktok_videos(self, hashtag, page=None):
+        TimedScraper.busy += 1
+        TimedScraper.max_busy = max(TimedScraper.max_busy, TimedScraper.busy)
+        TimedScraper.pages_used.add(id(page))
+        try:
+            await asyncio.sleep(0.05)
+            if hashtag == "broken":
+                raise RuntimeError("page crashed")
+            return [VideoData(url=f"https://www.tiktok.com/@u/video/{hashtag}{i}", likes=i, date=datetime.now())
+                    for i in range(20)]
+        finally:
+            TimedScraper.busy -= 1
+
+
+def test_pool_shares_one_browser(tmp_path, monkeypatch):
+    """50 hashtags on 5 contexts: one launch, bounded concurrency, one result per hashtag"""
+    fake = FakePlaywright()
+    monkeypatch.setattr(video_scraper, "async_playwright", lambda: fake)
+    state_path = str(tmp_path / "state.json")
+    hashtags = [f"tag{i}" for i in range(50)] + ["broken"]
+
+    async def run():
+        async with TimedScraper(pool_size=5, headless=True, storage_state_path=state_path) as scraper:
+            return await scraper.scrape_many(hashtags)
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    assert len(fake.chromium.launches) == 1
+    headless, browser = fake.chromium.launches[0]
+    assert headless and browser.closed and len(browser.contexts) == 5
+    assert all(context.init_scripts and context.headers for context in browser.contexts)
+    assert TimedScraper.max_busy == 5 and len(TimedScraper.pages_used) == 5
+    assert list(results) == hashtags
+    assert results["broken"] == {"instagram": [], "tiktok": []}
+    assert len(results["tag7"]["tiktok"]) == 15
+    assert results["tag7"]["tiktok"][0].endswith("tag719")
+    # 51 sleeps of 0.05s across 5 contexts take ~11 rounds, not 51
+    assert elapsed < 51 * 0.05
+    with open(state_path, encoding="utf-8") as f:
+        assert json.load(f)["cookies"][0]["value"] == "warm"
+    print(f"✅ {len(hashtags)} hashtags scraped with 1 browser launch and 5 contexts in {elapsed:.2f}s")
+
+
+def test_storage_state_restored(tmp_path, monkeypatch):
+    """A new pool restores the saved state into every context"""
+    state_path = str(tmp_path / "state.json")
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump({"cookies": [], "origins": []}, f)
+    fake = FakePlaywright()
+    monkeypatch.setattr(video_scraper, "async_playwright", lambda: fake)
+    monkeypatch.setattr(video_scraper, "VideoScraper", TimedScraper)
+    results = get_top_videos_many(["dance", "music"], pool_size=4, headless=True, storage_state_path=state_path)
+
+    _, browser = fake.chromium.launches[0]
+    # The pool never grows beyond the number of hashtags
+    assert len(browser.contexts) == 2
+    assert set(results) == {"dance", "music"} and len(results["music"]["tiktok"]) == 15
+    with open(state_path, encoding="utf-8") as f:
+        assert json.load(f)["cookies"][0]["value"] == "warm"
+
+    async def run():
+        async with TimedScraper(pool_size=2, storage_state_path=state_path):
+            pass
+    fake = FakePlaywright()
+    monkeypatch.setattr(video_scraper, "async_playwright", lambda: fake)
+    asyncio.run(run())
+    _, browser = fake.chromium.launches[0]
+    assert all(context.storage_state_path == state_path for context in browser.contexts)
+    print("✅ Saved cookies/storage state are restored into each pooled context")
+
+
+def test_single_har_recorder(tmp_path, monkeypatch):
+    """Only one pooled context records the HAR, so the archive isn't overwritten by the others"""
+    fake = FakePlaywright()
+    monkeypatch.setattr(video_scraper, "async_playwright", lambda: fake)
+    har_path = str(tmp_path / "capture.har")
+
+    async def run():
+        async with TimedScraper(pool_size=3, storage_state_path=None, record_har_path=har_path):
+            pass
+    asyncio.run(run())
+
+    _, browser = fake.chromium.launches[0]
+    recorders = [context for context in browser.contexts if "record_har_path" in context.options]
+    assert len(browser.contexts) == 3 and len(recorders) == 1
+    assert recorders[0].options["record_har_path"] == har_path
+    print("✅ One of 3 concurrently created contexts records the HAR")
+
+
+if __name__ == "__main__":
+    for test in (test_pool_shares_one_browser, test_storage_state_restored, test_single_har_recorder):
+        with tempfile.TemporaryDirectory() as tmp, pytest.MonkeyPatch.context() as monkeypatch:
+            test(Path(tmp), monkeypatch)
+    print("\n🎉 All browser pool tests passed")
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Offline test for the concurrent Instagram detail fetching.
+
+Uses fake tabs that serve the fixtures/instagram_post.html post page with a short
+delay, and checks the bounded concurrency, the resource blocking route, the per-post
+cache, the early exit once enough in-window posts are collected, and that detail tabs
+are closed when scraping fails.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from video_scraper import VideoScraper, BLOCKED_RESOURCE_TYPES, _block_heavy_resources
+from benchmark_instagram_details import post_code, post_likes, post_time, render_post_fixture
+
+NOW = datetime.now(timezone.utc)
+PAGES = {f"https://www.instagram.com/p/{post_code(i)}/": render_post_fixture(post_code(i), post_likes(i), post_time(i, NOW))
+         for i in range(20)}
+
+
+class FakeTab:
+    busy = 0
+    max_busy = 0
+    fetched = []
+
+    def __init__(self):
+        self.routes = []
+        self.url = None
+        self.closed = False
+
+    async def route(self, pattern, handler):
+        self.routes.append((pattern, handler))
+
+    async def goto(self, url, **kwargs):
+        FakeTab.busy += 1
+        FakeTab.max_busy = max(FakeTab.max_busy, FakeTab.busy)
+        FakeTab.fetched.append(url)
+        self.url = url
+        await asyncio.sleep(0.05)
+        FakeTab.busy -= 1
+
+    async def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    async def content(self):
+        return PAGES[self.url]
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self):
+        self.tabs = []
+
+    async def new_page(self):
+        tab = FakeTab()
+        self.tabs.append(tab)
+        return tab
+
+
+class FakeHashtagPage:
+    """An Instagram hashtag page listing a single post"""
+
+    def __init__(self):
+        self.context = FakeContext()
+
+    async def goto(self, url, **kwargs):
+        pass
+
+    async def wait_for_selector(self, selector, timeout=None):
+        pass
+
+    async def content(self):
+        return '<main><a href="/p/ABC123/">post</a></main>'
+
+    async def evaluate(self, script):
+        pass
+
+
+class FakeRoute:
+    def __init__(self, resource_type):
+        self.request = type('Request', (), {'resource_type': resource_type})()
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = 'abort'
+
+    async def continue_(self):
+        self.outcome = 'continue'
+
+
+class OfflineScraper(VideoScraper):
+    async def _throttle(self, provider):
+        pass
+
+    async def _delay(self, min_seconds=0, max_seconds=0):
+        pass
+
+
+def reset():
+    FakeTab.busy = FakeTab.max_busy = 0
+    FakeTab.fetched = []
+
+
+def test_bounded_concurrency_and_cache():
+    reset()
+    scraper = OfflineScraper(detail_concurrency=4)
+    urls = list(PAGES)
+
+    async def run():
+        async with scraper._detail_tabs(FakeContext()) as tabs:
+            assert len(tabs) == 4 and all(tab.routes == [('**/*', _block_heavy_resources)] for tab in tabs)
+            start = time.perf_counter()
+            first = await scraper._fetch_instagram_details(urls, tabs, wanted=len(urls))
+            elapsed = time.perf_counter() - start
+            # Revisiting the same posts after a scroll hits the cache
+            second = await scraper._fetch_instagram_details(urls[::-1] + urls[:3], tabs, wanted=len(urls))
+        assert all(tab.closed for tab in tabs)
+        return first, elapsed, second
+
+    first, elapsed, second = asyncio.run(run())
+    assert FakeTab.max_busy == 4
+    assert sorted(FakeTab.fetched) == sorted(urls), "each post is fetched once"
+    # 20 posts of 0.05s over 4 tabs take ~5 rounds, not 20
+    assert elapsed < 20 * 0.05 / 2, elapsed
+    assert [video.url for video in first] == urls
+    assert [video.url for video in second] == urls[::-1]
+
+    video = first[1]
+    assert video.likes == post_likes(1)
+    assert video.date.tzinfo is None
+    assert abs((video.date - post_time(1, NOW).astimezone().replace(tzinfo=None)).total_seconds()) < 1
+    print(f"✅ {len(urls)} posts over 4 tabs in {elapsed:.2f}s, revisits served from the cache")
+
+
+def test_early_exit():
+    reset()
+    scraper = OfflineScraper(detail_concurrency=3)
+
+    async def run():
+        async with scraper._detail_tabs(FakeContext()) as tabs:
+            return await scraper._fetch_instagram_details(list(PAGES), tabs, wanted=5)
+
+    videos = asyncio.run(run())
+    in_window = [video for video in videos if scraper._is_within_two_weeks(video.date)]
+    # Fetches stop once 5 in-window posts are in; only tabs already in flight finish
+    assert len(in_window) >= 5
+    assert len(FakeTab.fetched) <= 5 + 1 + 3, FakeTab.fetched
+    print(f"✅ Early exit after {len(FakeTab.fetched)} of {len(PAGES)} posts for 5 wanted")
+
+
+def test_tabs_closed_on_failure():
+    class FailingScraper(OfflineScraper):
+        async def _fetch_instagram_details(self, post_urls, tabs, wanted):
+            raise RuntimeError("post page layout changed")
+
+    scraper = FailingScraper(capture=False, detail_concurrency=3)
+    page = FakeHashtagPage()
+    videos = asyncio.run(scraper._scrape_instagram_videos("dance", page))
+    assert videos == []
+    assert len(page.context.tabs) == 3 and all(tab.closed for tab in page.context.tabs)
+    print("✅ Detail tabs are closed when Instagram scraping fails part way")
+
+
+def test_resource_blocking():
+    async def run():
+        outcomes = {}
+        for resource_type in ('document', 'script', 'xhr', 'image', 'media', 'font'):
+            route = FakeRoute(resource_type)
+            await _block_heavy_resources(route)
+            outcomes[resource_type] = route.outcome
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert {t for t, outcome in outcomes.items() if outcome == 'abort'} == BLOCKED_RESOURCE_TYPES
+    print("✅ Images, media and fonts are blocked on detail tabs")
+
+
+if __name__ == "__main__":
+    test_bounded_concurrency_and_cache()
+    test_early_exit()
+    test_tabs_closed_on_failure()
+    test_resource_blocking()
+    print("\n🎉 All detail fetching tests passed")
@@ -1,21 +1,94 @@
 import asyncio
+import base64
+import json
+import os
 import re
+import sys
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import logging
 from dataclasses import dataclass
 import random
 
-from playwright.async_api import async_playwright, Page, Browser
+from playwright.async_api import async_playwright, Page, Browser, BrowserContext
 from bs4 import BeautifulSoup
 from dateutil.parser import parse as date_parse
 from dateutil.relativedelta import relativedelta
 
+# Add the root directory to the Python path to access the shared RateLimiter and Ranking packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import get_limiter, TIKTOK, INSTAGRAM
+from Ranking import top_k
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of warm browser contexts kept by scrape_many() and get_top_videos_many()
+DEFAULT_POOL_SIZE = int(os.getenv('VIDEO_SCRAPER_POOL_SIZE', '3'))
+# Run Chromium without a window (set VIDEO_SCRAPER_HEADLESS=1 on servers)
+DEFAULT_HEADLESS = os.getenv('VIDEO_SCRAPER_HEADLESS', '').lower() in ('1', 'true', 'yes')
+# Read videos from the platforms' JSON API responses instead of re-parsing the page HTML
+DEFAULT_CAPTURE = os.getenv('VIDEO_SCRAPER_CAPTURE', '1').lower() not in ('0', 'false', 'no')
+# Instagram post pages fetched at once while collecting like counts and dates
+DEFAULT_DETAIL_CONCURRENCY = int(os.getenv('VIDEO_SCRAPER_DETAIL_CONCURRENCY', '4'))
+# Resource types aborted on detail tabs; likes and dates only need the document and scripts
+BLOCKED_RESOURCE_TYPES = {'image', 'media', 'font'}
+# Cookies and local storage are saved here on exit and restored into every context on start
+DEFAULT_STORAGE_STATE = os.getenv(
+    'VIDEO_SCRAPER_STORAGE_STATE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'browser_state.json')
+)
+
+BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--no-first-run',
+    '--no-default-browser-check',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-features=TranslateUI',
+    '--disable-ipc-flooding-protection',
+    '--start-maximized',
+]
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+EXTRA_HTTP_HEADERS = {
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Remove automation indicators
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+    
+    // Override the chrome object
+    delete window.chrome;
+    
+    // Override the plugins property
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => [1, 2, 3, 4, 5],
+    });
+    
+    // Override the languages property
+    Object.defineProperty(navigator, 'languages', {
+        get: () => ['en-US', 'en'],
+    });
+"""
+
 @dataclass
 class VideoData:
     """Data structure for video information"""
@@ -23,84 +96,309 @@ class VideoData:
     likes: int
     date: datetime
 
+# XHR/fetch endpoints whose JSON bodies carry search and hashtag results
+API_URL_PATTERNS = {
+    TIKTOK: re.compile(r'/api/(search/(item|general|video)/full|challenge/item_list|recommend/item_list)/'),
+    INSTAGRAM: re.compile(r'/api/v1/(tags/|feed/tag/|clips/)|/graphql/query'),
+}
+
+def _tiktok_video_from_api(item: dict) -> Optional[VideoData]:
+    """Build VideoData from a TikTok web API item ({'id', 'createTime', 'author', 'stats', ...})"""
+    author = item.get('author')
+    author_id = author.get('uniqueId') if isinstance(author, dict) else author
+    if not author_id:
+        return None
+    stats = item.get('stats') or item.get('statsV2') or {}
+    try:
+        likes = int(stats.get('diggCount') or 0)
+        date = datetime.fromtimestamp(int(item['createTime']))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    return VideoData(url=f"https://www.tiktok.com/@{author_id}/video/{item['id']}", likes=likes, date=date)
+
+def _instagram_video_from_api(media: dict) -> Optional[VideoData]:
+    """Build VideoData from an Instagram web API media ({'code', 'taken_at', 'like_count', ...}), videos only"""
+    if media.get('media_type') != 2 and media.get('product_type') != 'clips' and 'video_versions' not in media:
+        return None
+    try:
+        likes = int(media.get('like_count') or 0)
+        date = datetime.fromtimestamp(int(media['taken_at']))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    kind = 'reel' if media.get('product_type') == 'clips' else 'p'
+    return VideoData(url=f"https://www.instagram.com/{kind}/{media['code']}/", likes=likes, date=date)
+
+async def _block_heavy_resources(route):
+    """Route handler that aborts images, media and fonts"""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+class ResponseCapture:
+    """
+    Collects videos from a page's JSON API responses.
+
+    Register `on_response` with `page.on('response', ...)`; matching XHR/fetch
+    responses are decoded in the background and every video object found in the
+    body (at any depth, so search, hashtag and recommendation payloads all work)
+    is kept once per URL. `feed_har()` replays a saved HAR file through the same
+    parser, which is how the capture is tested offline.
+    """
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.pattern = API_URL_PATTERNS[platform]
+        self.responses = 0
+        self._videos: Dict[str, VideoData] = {}
+        self._pending = set()
+
+    def matches(self, url: str) -> bool:
+        return bool(self.pattern.search(url))
+
+    def on_response(self, response):
+        """Playwright 'response' event handler"""
+        if response.status == 200 and self.matches(response.url):
+            task = asyncio.ensure_future(self._read(response))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _read(self, response):
+        try:
+            payload = await response.json()
+        except Exception as e:
+            logger.debug(f"Skipping non-JSON API response {response.url}: {e}")
+            return
+        self.feed(payload)
+
+    async def drain(self):
+        """Wait for responses that are still being decoded"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    def feed(self, payload) -> int:
+        """Extract videos from one decoded response body. Returns the number of new videos."""
+        self.responses += 1
+        before = len(self._videos)
+        stack = [payload]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+                continue
+            if not isinstance(node, dict):
+                continue
+            video = self._parse(node)
+            if video:
+                self._videos.setdefault(video.url, video)
+            else:
+                stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+        return len(self._videos) - before
+
+    def _parse(self, node: dict) -> Optional[VideoData]:
+        if self.platform == TIKTOK and 'id' in node and 'createTime' in node and 'author' in node:
+            return _tiktok_video_from_api(node)
+        if self.platform == INSTAGRAM and 'code' in node and 'taken_at' in node:
+            return _instagram_video_from_api(node)
+        return None
+
+    def feed_har(self, har_path: str) -> int:
+        """Replay the matching JSON responses of a HAR file. Returns the number of new videos."""
+        with open(har_path, 'r', encoding='utf-8') as f:
+            har = json.load(f)
+        before = len(self._videos)
+        for entry in har.get('log', {}).get('entries', []):
+            response = entry.get('response', {})
+            content = response.get('content', {})
+            text = content.get('text')
+            if response.get('status') != 200 or not text or not self.matches(entry['request']['url']):
+                continue
+            if content.get('encoding') == 'base64':
+                text = base64.b64decode(text).decode('utf-8')
+            try:
+                self.feed(json.loads(text))
+            except ValueError:
+                continue
+        return len(self._videos) - before
+
+    def videos(self) -> List[VideoData]:
+        return list(self._videos.values())
+
+    def __len__(self) -> int:
+        return len(self._videos)
+
 class VideoScraper:
-    def __init__(self):
+    """
+    Playwright scraper that keeps one browser and a pool of warm contexts alive for its lifetime.
+
+    Each context has its own page and restores the saved cookies/storage state, so several
+    hashtags can be scraped concurrently with scrape_many() for the cost of a single browser
+    launch. `self.page` is the first context's page, for single-hashtag use.
+
+    In capture mode (the default) videos are read from the platforms' JSON API responses
+    and scrolling only triggers loading; the HTML parser is kept as a fallback.
+    `record_har_path` records the first context's traffic, e.g. to refresh test fixtures.
+
+    Instagram post details are fetched `detail_concurrency` at a time on a pool of tabs
+    that block images, media and fonts, and are cached per post URL.
+    """
+
+    def __init__(self, pool_size: int = 1, headless: bool = DEFAULT_HEADLESS,
+                 storage_state_path: Optional[str] = DEFAULT_STORAGE_STATE,
+                 capture: bool = DEFAULT_CAPTURE, record_har_path: Optional[str] = None,
+                 detail_concurrency: int = DEFAULT_DETAIL_CONCURRENCY, block_resources: bool = True):
+        self.pool_size = max(1, pool_size)
+        self.headless = headless
+        self.storage_state_path = storage_state_path
+        self.capture = capture
+        self.record_har_path = record_har_path
+        self.detail_concurrency = max(1, detail_concurrency)
+        self.block_resources = block_resources
+        # Post URL -> details, so posts seen again after scrolling are not refetched
+        self._detail_cache: Dict[str, VideoData] = {}
         self.browser: Optional[Browser] = None
         self.page: Optional[Page] = None
+        self.contexts: List[BrowserContext] = []
+        self._idle_pages: Optional[asyncio.Queue] = None
         
     async def __aenter__(self):
         self.playwright = await async_playwright().start()
         
-        # Launch browser in headed mode with stealth settings
+        # Launch one browser with stealth settings, shared by every context in the pool
         self.browser = await self.playwright.chromium.launch(
-            headless=False,  # Using headed browser as requested
-            args=[
-                '--no-sandbox',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--disable-gpu',
-                '--no-first-run',
-                '--no-default-browser-check',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-renderer-backgrounding',
-                '--disable-features=TranslateUI',
-                '--disable-ipc-flooding-protection',
-                '--start-maximized',
-            ]
-        )
-        
-        # Create new context with user agent
-        context = await self.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={'width': 1920, 'height': 1080}
+            headless=self.headless,
+            args=BROWSER_ARGS
         )
         
-        # Create new page
-        self.page = await context.new_page()
-        
-        # Set additional headers
-        await self.page.set_extra_http_headers({
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        })
-        
-        # Remove automation indicators
-        await self.page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined,
-            });
-            
-            // Override the chrome object
-            delete window.chrome;
-            
-            // Override the plugins property
-            Object.defineProperty(navigator, 'plugins', {
-                get: () => [1, 2, 3, 4, 5],
-            });
-            
-            // Override the languages property
-            Object.defineProperty(navigator, 'languages', {
-                get: () => ['en-US', 'en'],
-            });
-        """)
+        self._idle_pages = asyncio.Queue()
+        # The contexts are created concurrently, so the one recording the HAR is chosen up front
+        pages = await asyncio.gather(*(self._new_context_page(record_har=index == 0)
+                                       for index in range(self.pool_size)))
+        for page in pages:
+            self._idle_pages.put_nowait(page)
+        self.page = pages[0]
         
+        logger.info(f"Browser ready with {self.pool_size} context(s) (headless={self.headless})")
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.contexts:
+            await self.save_storage_state()
         if self.browser:
             await self.browser.close()
         if hasattr(self, 'playwright'):
             await self.playwright.stop()
+
+    async def _new_context_page(self, record_har: bool = False) -> Page:
+        """Create a context (restoring saved storage state if present) and its working page"""
+        storage_state = None
+        if self.storage_state_path and os.path.exists(self.storage_state_path):
+            storage_state = self.storage_state_path
+        
+        # Create new context with user agent
+        options = {}
+        if self.record_har_path and record_har:
+            options = {'record_har_path': self.record_har_path, 'record_har_content': 'embed'}
+        context = await self.browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={'width': 1920, 'height': 1080},
+            storage_state=storage_state,
+            **options
+        )
+        
+        # Headers and init script are set on the context so detail tabs inherit them
+        await context.set_extra_http_headers(EXTRA_HTTP_HEADERS)
+        await context.add_init_script(STEALTH_SCRIPT)
+        self.contexts.append(context)
+        
+        return await context.new_page()
+
+    async def save_storage_state(self):
+        """Persist cookies and local storage so the next run starts with a warm session"""
+        if not self.storage_state_path or not self.contexts:
+            return
+        try:
+            state = await self.contexts[0].storage_state()
+            with open(self.storage_state_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+        except Exception as e:
+            logger.warning(f"Could not save browser storage state to {self.storage_state_path}: {e}")
+
+    async def scrape_hashtag(self, hashtag: str, page: Optional[Page] = None) -> dict:
+        """
+        Scrape the top videos for one hashtag on the given page (default: the first pooled page).
+
+        Returns:
+            dict: {'instagram': [...], 'tiktok': [...]} with up to 15 URLs each
+        """
+        page = page or self.page
+        logger.info(f"Starting video scraping for hashtag: {hashtag}")
+        
+        # Instagram scraping commented out due to heavy anti-scraping protections
+        instagram_videos = []
+        # try:
+        #     logger.info("Scraping Instagram videos...")
+        #     instagram_videos = await self._scrape_instagram_videos(hashtag, page)
+        #     logger.info(f"Instagram scraping completed: {len(instagram_videos)} videos found")
+        # except Exception as e:
+        #     logger.error(f"Instagram scraping failed: {e}")
+        #     instagram_videos = []
+        
+        # Focus on TikTok scraping only
+        tiktok_videos = []
+        try:
+            logger.info("Scraping TikTok videos...")
+            tiktok_videos = await self._scrape_tiktok_videos(hashtag, page)
+            logger.info(f"TikTok scraping completed: {len(tiktok_videos)} videos found")
+        except Exception as e:
+            logger.error(f"TikTok scraping failed: {e}")
+            tiktok_videos = []
+        
+        # Keep the top 15 by likes with a bounded heap and extract their URLs
+        instagram_urls = [video.url for video in top_k(instagram_videos, 15)]  # Will be empty
+        tiktok_urls = [video.url for video in top_k(tiktok_videos, 15)]
+        
+        logger.info(f"Final results for #{hashtag}: {len(instagram_urls)} Instagram URLs, {len(tiktok_urls)} TikTok URLs")
+        
+        return {
+            "instagram": instagram_urls,
+            "tiktok": tiktok_urls
+        }
+
+    async def scrape_many(self, hashtags: List[str]) -> Dict[str, dict]:
+        """
+        Scrape several hashtags concurrently, one per pooled context.
+
+        Hashtags are handed to whichever context is free next, so at most `pool_size`
+        pages are busy at once. A failed hashtag returns empty lists instead of
+        cancelling the others.
+
+        Returns:
+            dict: hashtag -> {'instagram': [...], 'tiktok': [...]}, in input order
+        """
+        async def scrape(hashtag: str) -> dict:
+            page = await self._idle_pages.get()
+            try:
+                return await self.scrape_hashtag(hashtag, page)
+            except Exception as e:
+                logger.error(f"Scraping #{hashtag} failed: {e}")
+                return {"instagram": [], "tiktok": []}
+            finally:
+                self._idle_pages.put_nowait(page)
+        
+        unique = list(dict.fromkeys(hashtags))
+        results = await asyncio.gather(*(scrape(hashtag) for hashtag in unique))
+        return dict(zip(unique, results))
     
     async def _delay(self, min_seconds: float = 2.0, max_seconds: float = 5.0):
         """Add random delay between actions"""
         delay = random.uniform(min_seconds, max_seconds)
         await asyncio.sleep(delay)
 
+    async def _throttle(self, provider: str):
+        """Wait for the shared rate limiter before issuing a request to the platform"""
+        await get_limiter(provider).acquire_async()
+
     def _parse_relative_date(self, date_str: str) -> Optional[datetime]:
         """Parse relative date strings like '2 days ago', '1 week ago', etc."""
         try:
@@ -138,10 +436,69 @@ class VideoScraper:
         two_weeks_ago = datetime.now() - timedelta(weeks=2)
         return date >= two_weeks_ago
 
-    async def _scrape_instagram_videos(self, hashtag: str) -> List[VideoData]:
+    async def _capture_videos(self, platform: str, urls: List[str], page: Page,
+                              max_scrolls: int = 10) -> List[VideoData]:
+        """
+        Collect videos from the JSON API responses triggered while loading and scrolling a page.
+
+        The first URL whose load yields API results is scrolled until no new videos arrive
+        for 3 scrolls; the page HTML is never read.
+        """
+        capture = ResponseCapture(platform)
+        page.on('response', capture.on_response)
+        try:
+            for url in urls:
+                for attempt in range(3):
+                    try:
+                        await self._throttle(platform)
+                        await page.goto(url, wait_until='domcontentloaded', timeout=30000)
+                        break
+                    except Exception as e:
+                        logger.warning(f"{platform} navigation attempt {attempt + 1} failed: {e}")
+                        await self._delay(5, 8)
+                else:
+                    continue
+                
+                await self._delay(3, 6)
+                await capture.drain()
+                if capture:
+                    logger.info(f"Capturing {platform} API responses from {url}")
+                    break
+            
+            if not capture:
+                return []
+            
+            scroll_attempts = 0
+            no_new_content_count = 0
+            while scroll_attempts < max_scrolls and no_new_content_count < 3 and len(capture) < 50:
+                before = len(capture)
+                await page.evaluate("window.scrollBy(0, 1000)")
+                await self._delay(2, 4)  # Wait for the next page of results
+                await capture.drain()
+                no_new_content_count = no_new_content_count + 1 if len(capture) == before else 0
+                scroll_attempts += 1
+                logger.info(f"{platform} scroll {scroll_attempts}/{max_scrolls}, "
+                            f"{len(capture)} videos from {capture.responses} API responses")
+        finally:
+            page.remove_listener('response', capture.on_response)
+        
+        return [video for video in capture.videos() if self._is_within_two_weeks(video.date)]
+
+    async def _scrape_instagram_videos(self, hashtag: str, page: Optional[Page] = None) -> List[VideoData]:
         """Scrape Instagram videos for a given hashtag following the spec requirements"""
+        page = page or self.page
         videos = []
         
+        if self.capture:
+            try:
+                videos = await self._capture_videos(
+                    INSTAGRAM, [f"https://www.instagram.com/explore/tags/{hashtag}/"], page, max_scrolls=8)
+            except Exception as e:
+                logger.warning(f"Instagram response capture failed: {e}")
+            if videos:
+                return videos
+            logger.warning("No Instagram API responses captured, falling back to HTML parsing")
+        
         try:
             url = f"https://www.instagram.com/explore/tags/{hashtag}/"
             logger.info(f"Navigating to Instagram hashtag page: {url}")
@@ -150,7 +507,8 @@ class VideoScraper:
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    await self.page.goto(url, wait_until='networkidle', timeout=30000)
+                    await self._throttle(INSTAGRAM)
+                    await page.goto(url, wait_until='networkidle', timeout=30000)
                     await self._delay(2, 5)  # 2-5 second delay as per spec
                     break
                 except Exception as e:
@@ -170,7 +528,7 @@ class VideoScraper:
             
             for selector in selectors_to_try:
                 try:
-                    await self.page.wait_for_selector(selector, timeout=10000)
+                    await page.wait_for_selector(selector, timeout=10000)
                     content_loaded = True
                     logger.info(f"Instagram content loaded with selector: {selector}")
                     break
@@ -186,84 +544,139 @@ class VideoScraper:
             scroll_attempts = 0
             max_scrolls = 8  # Reasonable limit
             no_new_content_count = 0
+            async with self._detail_tabs(page.context) as detail_tabs:
             
-            while scroll_attempts < max_scrolls and no_new_content_count < 3:
-                # Get current page content
-                content = await self.page.content()
-                soup = BeautifulSoup(content, 'html.parser')
+                while scroll_attempts < max_scrolls and no_new_content_count < 3 and len(videos) < 50:
+                    # Get current page content
+                    content = await page.content()
+                    soup = BeautifulSoup(content, 'html.parser')
                 
-                # Find video/reel links
-                video_links = []
+                    # Find video/reel links
+                    video_links = []
                 
-                # Look for reel links first (these are definitely videos)
-                reel_links = soup.find_all('a', href=re.compile(r'/reel/'))
-                for link in reel_links:
-                    href = link.get('href')
-                    if href and href not in collected_urls:
-                        video_links.append(href)
-                        collected_urls.add(href)
+                    # Look for reel links first (these are definitely videos)
+                    reel_links = soup.find_all('a', href=re.compile(r'/reel/'))
+                    for link in reel_links:
+                        href = link.get('href')
+                        if href and href not in collected_urls:
+                            video_links.append(href)
+                            collected_urls.add(href)
                 
-                # Also look for regular post links that might be videos
-                post_links = soup.find_all('a', href=re.compile(r'/p/'))
-                for link in post_links:
-                    href = link.get('href')
-                    if href and href not in collected_urls:
-                        video_links.append(href)
-                        collected_urls.add(href)
+                    # Also look for regular post links that might be videos
+                    post_links = soup.find_all('a', href=re.compile(r'/p/'))
+                    for link in post_links:
+                        href = link.get('href')
+                        if href and href not in collected_urls:
+                            video_links.append(href)
+                            collected_urls.add(href)
                 
-                # Process found links
-                initial_video_count = len(videos)
+                    # Process found links
+                    initial_video_count = len(videos)
+                    post_urls = [href if href.startswith('http') else "https://www.instagram.com" + href
+                                 for href in video_links]
                 
-                for href in video_links:
-                    if len(videos) >= 50:  # Collect more than needed for better filtering
-                        break
-                    
-                    try:
-                        if not href.startswith('http'):
-                            post_url = "https://www.instagram.com" + href
-                        else:
-                            post_url = href
-                        
-                        # Get detailed information (like count and date)
-                        video_data = await self._get_instagram_video_details(post_url)
-                        if video_data and self._is_within_two_weeks(video_data.date):
+                    # Get detailed information (like count and date), stopping once enough are in the window
+                    wanted = 50 - len(videos)  # Collect more than needed for better filtering
+                    for video_data in await self._fetch_instagram_details(post_urls, detail_tabs, wanted):
+                        if len(videos) < 50 and self._is_within_two_weeks(video_data.date):
                             videos.append(video_data)
-                            logger.info(f"Found Instagram video: {post_url} (likes: {video_data.likes})")
-                        
-                        # Small delay between processing videos
-                        await self._delay(1, 2)
-                        
-                    except Exception as e:
-                        logger.warning(f"Error processing Instagram link {href}: {e}")
-                        continue
+                            logger.info(f"Found Instagram video: {video_data.url} (likes: {video_data.likes})")
                 
-                # Check if we found new content
-                if len(videos) == initial_video_count:
-                    no_new_content_count += 1
-                else:
-                    no_new_content_count = 0
+                    # Check if we found new content
+                    if len(videos) == initial_video_count:
+                        no_new_content_count += 1
+                    else:
+                        no_new_content_count = 0
                 
-                # Scroll to load more content
-                await self.page.evaluate("window.scrollBy(0, 1000)")
-                await self._delay(2, 4)  # Wait for content to load
-                scroll_attempts += 1
+                    # Scroll to load more content
+                    await page.evaluate("window.scrollBy(0, 1000)")
+                    await self._delay(2, 4)  # Wait for content to load
+                    scroll_attempts += 1
                 
-                logger.info(f"Instagram scroll {scroll_attempts}/{max_scrolls}, found {len(videos)} videos")
+                    logger.info(f"Instagram scroll {scroll_attempts}/{max_scrolls}, found {len(videos)} videos")
+            
         
         except Exception as e:
             logger.error(f"Error scraping Instagram: {e}")
         
         return videos
 
-    async def _get_instagram_video_details(self, post_url: str) -> Optional[VideoData]:
-        """Get detailed information for an Instagram video post"""
+    @asynccontextmanager
+    async def _detail_tabs(self, context: BrowserContext) -> AsyncIterator[List[Page]]:
+        """
+        Open the tab pool used for post details, with heavy resources blocked.
+        Every opened tab is closed on exit, even if scraping fails part way.
+        """
+        tabs = []
+        try:
+            for _ in range(self.detail_concurrency):
+                tab = await context.new_page()
+                tabs.append(tab)
+                if self.block_resources:
+                    await tab.route('**/*', _block_heavy_resources)
+            yield tabs
+        finally:
+            for tab in tabs:
+                try:
+                    await tab.close()
+                except Exception as e:
+                    logger.debug(f"Could not close detail tab: {e}")
+
+    async def _fetch_instagram_details(self, post_urls: List[str], tabs: List[Page],
+                                       wanted: int) -> List[VideoData]:
+        """
+        Fetch details for several posts concurrently, one post per tab at a time.
+
+        Cached posts are not refetched, and no new fetches start once `wanted` posts
+        within the two week window have been collected.
+
+        Returns:
+            list: VideoData for the fetched posts, in the order of `post_urls`
+        """
+        results: Dict[str, VideoData] = {}
+        pending = []
+        for url in dict.fromkeys(post_urls):
+            if url in self._detail_cache:
+                results[url] = self._detail_cache[url]
+            else:
+                pending.append(url)
+        in_window = sum(1 for video in results.values() if self._is_within_two_weeks(video.date))
+        remaining = iter(pending)
+        
+        async def worker(tab: Page):
+            nonlocal in_window
+            # Workers share one iterator, so each post is fetched once
+            for url in remaining:
+                if in_window >= wanted:
+                    return
+                video_data = await self._get_instagram_video_details(url, page=tab)
+                if video_data:
+                    results[url] = video_data
+                    if self._is_within_two_weeks(video_data.date):
+                        in_window += 1
+        
+        if pending and in_window < wanted:
+            await asyncio.gather(*(worker(tab) for tab in tabs[:len(pending)]))
+        return [results[url] for url in dict.fromkeys(post_urls) if url in results]
+
+    async def _get_instagram_video_details(self, post_url: str, context: Optional[BrowserContext] = None,
+                                           page: Optional[Page] = None) -> Optional[VideoData]:
+        """Get detailed information for an Instagram video post, on `page` or a new tab"""
+        if post_url in self._detail_cache:
+            return self._detail_cache[post_url]
+        
         try:
             # Open post in new tab to avoid losing main page
-            new_page = await self.page.context.new_page()
+            new_page = page or await (context or self.page.context).new_page()
             
             try:
-                await new_page.goto(post_url, wait_until='networkidle', timeout=20000)
-                await asyncio.sleep(2)  # Give page time to load
+                await self._throttle(INSTAGRAM)
+                await new_page.goto(post_url, wait_until='domcontentloaded', timeout=20000)
+                try:
+                    # The post time is rendered with the like count
+                    await new_page.wait_for_selector('time', timeout=5000)
+                except Exception:
+                    pass
                 
                 # Get page content
                 content = await new_page.content()
@@ -316,33 +729,49 @@ class VideoScraper:
                         except:
                             continue
                 
-                return VideoData(url=post_url, likes=likes, date=date)
+                # Compare with the naive local times used elsewhere
+                if date.tzinfo:
+                    date = date.astimezone().replace(tzinfo=None)
+                
+                video_data = VideoData(url=post_url, likes=likes, date=date)
+                self._detail_cache[post_url] = video_data
+                return video_data
                 
             finally:
-                await new_page.close()
+                if page is None:
+                    await new_page.close()
                 
         except Exception as e:
             logger.warning(f"Error getting Instagram video details for {post_url}: {e}")
             return VideoData(url=post_url, likes=0, date=datetime.now())
 
-    async def _scrape_tiktok_videos(self, hashtag: str) -> List[VideoData]:
+    async def _scrape_tiktok_videos(self, hashtag: str, page: Optional[Page] = None) -> List[VideoData]:
         """Scrape TikTok videos for a given hashtag following the spec requirements"""
+        page = page or self.page
         videos = []
         
+        # Generate timestamp for the search URL
+        timestamp = int(time.time() * 1000)
+        
+        # Try different URL formats that work with TikTok's current system
+        urls_to_try = [
+            f"https://www.tiktok.com/search/video?lang=en&q={hashtag}&t={timestamp}",
+            f"https://www.tiktok.com/search/video?lang=en&q=%23{hashtag}&t={timestamp}",
+            f"https://www.tiktok.com/search?q=%23{hashtag}&t=video",
+            f"https://www.tiktok.com/tag/{hashtag}",
+            f"https://www.tiktok.com/discover/{hashtag}"
+        ]
+        
+        if self.capture:
+            try:
+                videos = await self._capture_videos(TIKTOK, urls_to_try, page)
+            except Exception as e:
+                logger.warning(f"TikTok response capture failed: {e}")
+            if videos:
+                return videos
+            logger.warning("No TikTok API responses captured, falling back to HTML parsing")
+        
         try:
-            # Generate timestamp for the search URL
-            import time
-            timestamp = int(time.time() * 1000)
-            
-            # Try different URL formats that work with TikTok's current system
-            urls_to_try = [
-                f"https://www.tiktok.com/search/video?lang=en&q={hashtag}&t={timestamp}",
-                f"https://www.tiktok.com/search/video?lang=en&q=%23{hashtag}&t={timestamp}",
-                f"https://www.tiktok.com/search?q=%23{hashtag}&t=video",
-                f"https://www.tiktok.com/tag/{hashtag}",
-                f"https://www.tiktok.com/discover/{hashtag}"
-            ]
-            
             successful_url = None
             
             for url in urls_to_try:
@@ -354,12 +783,13 @@ class VideoScraper:
                 
                 for attempt in range(max_retries):
                     try:
-                        await self.page.goto(url, wait_until='networkidle', timeout=30000)
+                        await self._throttle(TIKTOK)
+                        await page.goto(url, wait_until='networkidle', timeout=30000)
                         await self._delay(3, 6)  # Longer delay for TikTok
                         
                         # Check if we're on the right page (not redirected to For You)
-                        current_url = self.page.url
-                        page_title = await self.page.title()
+                        current_url = page.url
+                        page_title = await page.title()
                         
                         logger.info(f"Current URL: {current_url}")
                         logger.info(f"Page title: {page_title}")
@@ -374,7 +804,7 @@ class VideoScraper:
                                 'discover' in current_url.lower()):
                                 
                                 # Check if page content contains hashtag-related elements
-                                page_content = await self.page.content()
+                                page_content = await page.content()
                                 if (f'{hashtag}' in page_content or 
                                     f'#{hashtag}' in page_content or
                                     f'tag/{hashtag}' in page_content or
@@ -396,8 +826,6 @@ class VideoScraper:
                 
                 if navigation_successful:
                     break
-                    
-                await self._delay(3, 5)  # Wait before trying next URL
             
             if not successful_url:
                 logger.error("Failed to navigate to any TikTok hashtag page - all URLs redirected to For You")
@@ -422,7 +850,7 @@ class VideoScraper:
             
             for selector in content_selectors:
                 try:
-                    await self.page.wait_for_selector(selector, timeout=10000)
+                    await page.wait_for_selector(selector, timeout=10000)
                     content_found = True
                     working_selector = selector
                     logger.info(f"TikTok content found with selector: {selector}")
@@ -433,7 +861,7 @@ class VideoScraper:
             if not content_found:
                 logger.warning("No content selectors found on TikTok page, trying fallback approach")
                 # Fallback: look for video links in page source
-                content = await self.page.content()
+                content = await page.content()
                 soup = BeautifulSoup(content, 'html.parser')
                 
                 # Multiple fallback approaches
@@ -475,7 +903,7 @@ class VideoScraper:
             
             while scroll_attempts < max_scrolls and no_new_content_count < 3:
                 # Get current page content
-                content = await self.page.content()
+                content = await page.content()
                 soup = BeautifulSoup(content, 'html.parser')
                 
                 # Find video elements
@@ -579,7 +1007,7 @@ class VideoScraper:
                     no_new_content_count = 0
                 
                 # Scroll to load more content (infinite scroll)
-                await self.page.evaluate("window.scrollBy(0, 1000)")
+                await page.evaluate("window.scrollBy(0, 1000)")
                 await self._delay(3, 5)  # Wait for new content to load
                 scroll_attempts += 1
                 
@@ -590,49 +1018,24 @@ class VideoScraper:
         
         return videos
 
-async def get_top_videos_async(hashtag: str) -> dict:
+async def get_top_videos_async(hashtag: str, headless: bool = DEFAULT_HEADLESS) -> dict:
     """
     Async version of get_top_videos function - Currently TikTok only due to Instagram's anti-scraping protections
     """
-    logger.info(f"Starting video scraping for hashtag: {hashtag}")
-    
-    async with VideoScraper() as scraper:
-        # Instagram scraping commented out due to heavy anti-scraping protections
-        instagram_videos = []
-        # try:
-        #     logger.info("Scraping Instagram videos...")
-        #     instagram_videos = await scraper._scrape_instagram_videos(hashtag)
-        #     logger.info(f"Instagram scraping completed: {len(instagram_videos)} videos found")
-        # except Exception as e:
-        #     logger.error(f"Instagram scraping failed: {e}")
-        #     instagram_videos = []
-        
-        # Focus on TikTok scraping only
-        tiktok_videos = []
-        try:
-            logger.info("Scraping TikTok videos...")
-            tiktok_videos = await scraper._scrape_tiktok_videos(hashtag)
-            logger.info(f"TikTok scraping completed: {len(tiktok_videos)} videos found")
-        except Exception as e:
-            logger.error(f"TikTok scraping failed: {e}")
-            tiktok_videos = []
-        
-        # Sort by likes and get top 15
-        instagram_videos.sort(key=lambda x: x.likes, reverse=True)
-        tiktok_videos.sort(key=lambda x: x.likes, reverse=True)
-        
-        # Extract URLs and limit to 15
-        instagram_urls = [video.url for video in instagram_videos[:15]]  # Will be empty
-        tiktok_urls = [video.url for video in tiktok_videos[:15]]
-        
-        logger.info(f"Final results: {len(instagram_urls)} Instagram URLs, {len(tiktok_urls)} TikTok URLs")
-        
-        return {
-            "instagram": instagram_urls,
-            "tiktok": tiktok_urls
-        }
+    async with VideoScraper(headless=headless) as scraper:
+        return await scraper.scrape_hashtag(hashtag)
+
+async def get_top_videos_many_async(hashtags: List[str], pool_size: int = DEFAULT_POOL_SIZE,
+                                    headless: bool = DEFAULT_HEADLESS,
+                                    storage_state_path: Optional[str] = DEFAULT_STORAGE_STATE) -> Dict[str, dict]:
+    """
+    Async version of get_top_videos_many: one browser, `pool_size` warm contexts
+    """
+    async with VideoScraper(pool_size=min(pool_size, max(1, len(hashtags))), headless=headless,
+                            storage_state_path=storage_state_path) as scraper:
+        return await scraper.scrape_many(hashtags)
 
-def get_top_videos(hashtag: str) -> dict:
+def get_top_videos(hashtag: str, headless: bool = DEFAULT_HEADLESS) -> dict:
     """
     Retrieves the top 15 TikTok videos posted in the last two weeks for the given hashtag.
     
@@ -641,6 +1044,7 @@ def get_top_videos(hashtag: str) -> dict:
 
     Args:
         hashtag (str): The hashtag name without the '#' symbol (e.g., 'dance').
+        headless (bool): Run Chromium without a window (default: VIDEO_SCRAPER_HEADLESS).
 
     Returns:
         dict: A dictionary with keys 'instagram' and 'tiktok', where:
@@ -652,14 +1056,41 @@ def get_top_videos(hashtag: str) -> dict:
         - Currently focuses on TikTok only due to Instagram's robust anti-scraping measures
         - This function uses web scraping with stealth techniques to avoid detection
         - Instagram functionality can be re-enabled by uncommenting the relevant code
+        - Use get_top_videos_many() for several hashtags; it reuses one browser for all of them
     """
     try:
         # Run the async function
-        return asyncio.run(get_top_videos_async(hashtag))
+        return asyncio.run(get_top_videos_async(hashtag, headless))
     except Exception as e:
         logger.error(f"Error in get_top_videos: {e}")
         return {"instagram": [], "tiktok": []}
 
+def get_top_videos_many(hashtags: List[str], pool_size: int = DEFAULT_POOL_SIZE,
+                        headless: bool = DEFAULT_HEADLESS,
+                        storage_state_path: Optional[str] = DEFAULT_STORAGE_STATE) -> Dict[str, dict]:
+    """
+    Retrieves the top TikTok videos for several hashtags with a single browser launch.
+
+    The hashtags are spread across `pool_size` browser contexts that share one Chromium
+    process and the saved cookies/storage state, and are scraped concurrently. Calling
+    get_top_videos() in a loop would launch and tear down a browser per hashtag.
+
+    Args:
+        hashtags (list): Hashtag names without the '#' symbol.
+        pool_size (int): Number of concurrent browser contexts (default: VIDEO_SCRAPER_POOL_SIZE or 3).
+        headless (bool): Run Chromium without a window (default: VIDEO_SCRAPER_HEADLESS).
+        storage_state_path (str): Cookies/storage state file to restore and save
+                                  (default: VIDEO_SCRAPER_STORAGE_STATE; None to skip).
+
+    Returns:
+        dict: hashtag -> {'instagram': [...], 'tiktok': [...]} in the get_top_videos() format.
+    """
+    try:
+        return asyncio.run(get_top_videos_many_async(hashtags, pool_size, headless, storage_state_path))
+    except Exception as e:
+        logger.error(f"Error in get_top_videos_many: {e}")
+        return {hashtag: {"instagram": [], "tiktok": []} for hashtag in hashtags}
+
 # Example usage and testing
 if __name__ == "__main__":
     import argparse
@@ -675,14 +1106,28 @@ Examples:
   python video_scraper.py music
   python video_scraper.py travel
   python video_scraper.py "funny cats"
+  python video_scraper.py dance music travel --pool-size 3 --headless
         """
     )
     
     parser.add_argument(
-        'hashtag',
-        help='Hashtag to search for (without the # symbol, e.g., "dance")',
-        nargs='?',  # Make it optional
-        default=None
+        'hashtags',
+        help='Hashtag(s) to search for (without the # symbol, e.g., "dance")',
+        nargs='*'
+    )
+    
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f'Browser contexts used concurrently for several hashtags (default: {DEFAULT_POOL_SIZE})'
+    )
+    
+    parser.add_argument(
+        '--headless',
+        action='store_true',
+        default=DEFAULT_HEADLESS,
+        help='Run the browser without a window'
     )
     
     parser.add_argument(
@@ -694,22 +1139,32 @@ Examples:
     args = parser.parse_args()
     
     # Check if hashtag was provided
-    if not args.hashtag:
+    if not args.hashtags:
         print("Error: Please provide a hashtag to search for")
         print("\nUsage: python video_scraper.py <hashtag>")
         print("Example: python video_scraper.py dance")
         sys.exit(1)
     
-    # Use the provided hashtag
-    test_hashtag = args.hashtag
-    print(f"Testing video scraper with hashtag: {test_hashtag}")
-    print("Note: Instagram scraping is currently disabled due to anti-scraping protections")
-    
     # Set logging level based on verbose flag
     if args.verbose:
         logging.getLogger().setLevel(logging.DEBUG)
     
-    result = get_top_videos(test_hashtag)
+    # Several hashtags share one browser and a pool of contexts
+    if len(args.hashtags) > 1:
+        print(f"Scraping {len(args.hashtags)} hashtags with {args.pool_size} browser contexts")
+        results = get_top_videos_many(args.hashtags, pool_size=args.pool_size, headless=args.headless)
+        for hashtag, result in results.items():
+            print(f"#{hashtag}: {len(result['tiktok'])} TikTok videos")
+            for i, url in enumerate(result['tiktok'][:3]):
+                print(f"  {i+1}. {url}")
+        sys.exit(0)
+    
+    # Use the provided hashtag
+    test_hashtag = args.hashtags[0]
+    print(f"Testing video scraper with hashtag: {test_hashtag}")
+    print("Note: Instagram scraping is currently disabled due to anti-scraping protections")
+    
+    result = get_top_videos(test_hashtag, headless=args.headless)
     
     print(f"\nResults:")
     print(f"Instagram videos found: {len(result['instagram'])} (disabled)")
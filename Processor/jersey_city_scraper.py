@@ -15,11 +15,12 @@ from dotenv import load_dotenv
 import google.generativeai as genai
 from google.generativeai import types
 
-# Add the root directory to the Python path to access ApifyLinkGetter
+# Add the root directory to the Python path to access Discovery
 root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, root_dir)
 
-from ApifyLinkGetter import get_top_tiktok_videos
+from Discovery import discover_links_sync, DiscoveryArchive, replay_links
+from RateLimiter import throttle, GEMINI_EMBED, ANALYZE_API
 
 
 def get_db_connection():
@@ -59,12 +60,13 @@ def get_embedding(text):
     """Generates an embedding for the given text using the Gemini API."""
     genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
     try:
-        result = genai.embed_content(
-            model="gemini-embedding-001",
-            content=text,
-            task_type="retrieval_document", #3072
-            output_dimensionality=1536
-        )
+        with throttle(GEMINI_EMBED):
+            result = genai.embed_content(
+                model="gemini-embedding-001",
+                content=text,
+                task_type="retrieval_document", #3072
+                output_dimensionality=1536
+            )
         return result['embedding']
     except Exception as e:
         print(f"Failed to generate embedding: {e}")
@@ -78,8 +80,9 @@ def analyze_video_via_api(url, prompt):
     api_url = "http://localhost:5000/analyze"
     payload = {"url": url, "prompt": prompt}
     try:
-        response = requests.post(api_url, json=payload)
-        response.raise_for_status()  # Raise an exception for bad status codes
+        with throttle(ANALYZE_API):
+            response = requests.post(api_url, json=payload)
+            response.raise_for_status()  # Raise an exception for bad status codes
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"API request failed for {url}: {e}")
@@ -164,9 +167,13 @@ def insert_recommendation(conn, data, scraped_hashtag, embedding):
             conn.rollback()
 
 
-def main():
+def main(offline=False):
     """
     Main function to run the scraper and analyzer.
+
+    Args:
+        offline (bool): Re-rank previously discovered videos from the discovery archive
+                        instead of running new Apify actors.
     """
     load_dotenv()
 
@@ -204,11 +211,25 @@ def main():
     "TheHeightsRestaurants",
     "TheHeightsCoffee"]
     #hashtags =["Downtown Jersey Ciy food"]
+    # Instagram hashtags discovered alongside TikTok (empty: TikTok only)
+    instagram_hashtags = []
     print("Starting Jersey City TikTok scraper...")
 
-    for hashtag in hashtags:
+    if offline:
+        # Replay from the discovery archive, no Apify runs
+        archive = DiscoveryArchive()
+        links = {
+            "tiktok": replay_links(archive, hashtags, platform="tiktok", days_back=90),
+            "instagram": replay_links(archive, instagram_hashtags, platform="instagram", days_back=90),
+        }
+        archive.close()
+    else:
+        # Actor runs for every batch of hashtags and every platform run concurrently
+        links = discover_links_sync(tiktok_queries=hashtags, instagram_hashtags=instagram_hashtags, days_back=90)
+    discovered = [(hashtag, urls) for videos_by_hashtag in links.values() for hashtag, urls in videos_by_hashtag.items()]
+
+    for hashtag, video_urls in discovered:
         print(f"Scraping for hashtag: #{hashtag}")
-        video_urls = get_top_tiktok_videos(hashtag, days_back=90)
 
         for url in video_urls:
             print(f"Processing video: {url}")
@@ -295,4 +316,11 @@ return the JSON object only, no other text or comments and do not use the ```jso
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape, analyze and store Jersey City recommendations")
+    parser.add_argument('--offline', action='store_true',
+                        help='Replay discovered videos from the discovery archive instead of running Apify actors')
+    args = parser.parse_args()
+
+    main(offline=args.offline)
\ No newline at end of file
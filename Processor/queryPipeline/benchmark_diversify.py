@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Diversification benchmark.
+
+Times mmr_select, and diversify (collapsing, the embedding matrix and MMR), over a
+synthetic pool of candidates with random unit-length embeddings, and reports the
+median of several runs.
+
+Usage:
+    python benchmark_diversify.py
+    python benchmark_diversify.py --pool-size 1000 --top-k 16 --repeat 50
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from diversify import diversify, embedding_matrix, mmr_select
+
+
+def make_pool(pool_size, dimensions, seed=0):
+    """Candidate rows at distinct venues with random similarities, and their embeddings by source URL."""
+    rng = np.random.default_rng(seed)
+    candidates = [(f"Place {i}", f"{i} Grove St", "Downtown", "", "", f"url{i}", float(rng.random()))
+                  for i in range(pool_size)]
+    embeddings = {}
+    for i in range(pool_size):
+        vector = rng.standard_normal(dimensions).astype(np.float32)
+        embeddings[f"url{i}"] = vector / np.linalg.norm(vector)
+    return candidates, embeddings
+
+
+def median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time MMR diversification over a synthetic candidate pool")
+    parser.add_argument('--pool-size', type=int, default=300)
+    parser.add_argument('--dimensions', type=int, default=1536)
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    candidates, embeddings = make_pool(args.pool_size, args.dimensions)
+    matrix = embedding_matrix(candidates, embeddings)
+    relevance = [candidate[6] for candidate in candidates]
+
+    mmr_ms = median_ms(lambda: mmr_select(matrix, relevance, args.top_k), args.repeat)
+    total_ms = median_ms(lambda: diversify(candidates, embeddings, top_k=args.top_k), args.repeat)
+    print(f"📊 {args.pool_size} candidates, {args.dimensions} dimensions, top {args.top_k}, "
+          f"median of {args.repeat} runs\n")
+    print(f"{'mmr_select':<36} {mmr_ms:>8.3f}ms")
+    print(f"{'diversify (collapse + matrix + MMR)':<36} {total_ms:>8.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Candidate filter benchmark.
+
+Runs the candidate filter modes over the fixed evaluation set in
+fixtures/rerank_eval.json: queries with a candidate pool (built from the checked-in
+recommendations export, with fixed similarities), the candidates that violate the
+query and the ones that answer it.
+
+    local   the local reranker only
+    auto    the local reranker, asking the LLM filter when it is uncertain (the default)
+    llm     the LLM filter only (the previous behaviour)
+
+For each mode it reports how many violations were dropped, valid candidates wrongly
+dropped, the reciprocal rank of the first relevant candidate, LLM calls and latency.
+The auto and llm modes need GOOGLE_API_KEY.
+
+Usage:
+    python benchmark_reranker.py
+    python benchmark_reranker.py --modes local auto
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, root_dir)
+
+from Discovery.jsonio import iter_jsonl
+from reranker import LocalReranker
+
+EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'rerank_eval.json')
+RECOMMENDATIONS = os.path.join(root_dir, 'jersey_city_recommendations.jsonl')
+
+
+def load_eval_cases(path=EVAL_SET, recommendations=RECOMMENDATIONS):
+    """
+    Returns the evaluation cases with their candidates as pipeline rows, and the tags
+    of every recommendation keyed by source URL.
+    """
+    records = {record['name']: record for record in iter_jsonl(recommendations)}
+    with open(path, 'r', encoding='utf-8') as f:
+        cases = json.load(f)
+    tags = {}
+    for case in cases:
+        rows = []
+        for name, similarity in case['candidates']:
+            record = records[name]
+            rows.append((record['name'], record['location'], record['neighborhood'], record['summary'],
+                         record['quote'], record['source_url'], similarity))
+            tags[record['source_url']] = record.get('tags') or []
+        case['rows'] = rows
+    return cases, tags
+
+
+def score_case(case, kept):
+    """Violations dropped, valid candidates dropped and reciprocal rank of the first relevant candidate."""
+    names = [row[0] for row in kept]
+    all_names = [row[0] for row in case['rows']]
+    violations = set(case['violations'])
+    caught = sum(1 for name in violations if name not in names)
+    false_drops = sum(1 for name in all_names if name not in violations and name not in names)
+    rank = next((i + 1 for i, name in enumerate(names) if name in case['relevant']), None)
+    return caught, false_drops, 1 / rank if rank else 0.0
+
+
+def run_mode(mode, cases, tags, reranker):
+    llm_filter = None
+    if mode != 'local':
+        import main
+        llm_filter = main.filter_candidates
+
+    totals = {'violations': 0, 'caught': 0, 'false_drops': 0, 'rr': [], 'llm_calls': 0, 'latency': []}
+    for case in cases:
+        start = time.perf_counter()
+        if mode == 'llm':
+            kept = llm_filter(case['query'], case['rows'])
+            totals['llm_calls'] += 1
+        else:
+            result = reranker.rerank(case['query'], case['rows'], tags)
+            kept = result.candidates
+            if mode == 'auto' and result.uncertain:
+                kept = llm_filter(case['query'], kept)
+                totals['llm_calls'] += 1
+        totals['latency'].append(time.perf_counter() - start)
+
+        caught, false_drops, rr = score_case(case, kept)
+        totals['violations'] += len(case['violations'])
+        totals['caught'] += caught
+        totals['false_drops'] += false_drops
+        totals['rr'].append(rr)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the local reranker and the LLM candidate filter")
+    parser.add_argument('--modes', nargs='+', choices=['local', 'auto', 'llm'], default=['local', 'auto', 'llm'])
+    parser.add_argument('--cross-encoder', default=None, help='Cross-encoder model for the local reranker')
+    args = parser.parse_args()
+
+    modes = args.modes
+    if not os.getenv('GOOGLE_API_KEY') and modes != ['local']:
+        print("⚠️  GOOGLE_API_KEY is not set; running the local mode only\n")
+        modes = ['local']
+
+    cases, tags = load_eval_cases()
+    reranker = LocalReranker(cross_encoder_model=args.cross_encoder) if args.cross_encoder is not None else LocalReranker()
+
+    print(f"📊 {len(cases)} queries, {sum(len(case['violations']) for case in cases)} violating candidates\n")
+    print(f"{'mode':<6} | {'violations dropped':>18} | {'false drops':>11} | {'MRR':>5} | {'LLM calls':>9} | {'mean':>8} | {'max':>8}")
+    print("-" * 82)
+    for mode in modes:
+        totals = run_mode(mode, cases, tags, reranker)
+        print(f"{mode:<6} | {totals['caught']:>9}/{totals['violations']:<8} | {totals['false_drops']:>11} | "
+              f"{statistics.mean(totals['rr']):>5.2f} | {totals['llm_calls']:>9} | "
+              f"{statistics.mean(totals['latency']) * 1000:>6.1f}ms | {max(totals['latency']) * 1000:>6.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Synthesis mode benchmark.
+
+Answers the queries of the fixed evaluation set (fixtures/rerank_eval.json) through the
+whole pipeline in both synthesis modes and reports LLM stages, time to first token and
+total latency per mode:
+
+    separate   expansion, LLM filter and synthesis calls (the three-call path)
+    combined   expansion, local filtering and one filter-and-synthesize call
+
+Needs GOOGLE_API_KEY and the recommendations database.
+
+Usage:
+    python benchmark_synthesis.py
+    python benchmark_synthesis.py --expand never "cheap pizza" "coffee but not a restaurant"
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+import main
+from benchmark_reranker import EVAL_SET
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Compare separate and combined filter/synthesis calls")
+    parser.add_argument('queries', nargs='*', help='Queries to answer (default: the evaluation set)')
+    parser.add_argument('--expand', choices=['auto', 'always', 'never'], default='always')
+    args = parser.parse_args()
+
+    queries = args.queries
+    if not queries:
+        with open(EVAL_SET, 'r', encoding='utf-8') as f:
+            queries = [case['query'] for case in json.load(f)]
+
+    conn = main.get_db_connection()
+    if not conn:
+        sys.exit("Could not connect to the database. Exiting.")
+
+    rows = []
+    try:
+        for synthesis, filter_mode in (('separate', 'llm'), ('combined', 'local')):
+            stages, ttfts, totals = [], [], []
+            for query in queries:
+                calls_before = main.llm_calls
+                start = time.perf_counter()
+                _, chunks = main.answer_query(conn, query, synthesis=synthesis, stream=True,
+                                              expand=args.expand, filter_mode=filter_mode)
+                answer = main.TimedStream(chunks, start)
+                for _ in answer:
+                    pass
+                stages.append(main.llm_calls - calls_before)
+                ttfts.append(answer.ttft or answer.total)
+                totals.append(answer.total)
+            rows.append((synthesis, statistics.mean(stages), statistics.mean(ttfts), statistics.mean(totals), max(totals)))
+    finally:
+        conn.close()
+
+    print(f"\n📊 {len(queries)} queries, expansion: {args.expand}\n")
+    print(f"{'mode':<9} | {'LLM stages':>10} | {'first token':>11} | {'mean total':>10} | {'max total':>9}")
+    print("-" * 62)
+    for synthesis, stage_count, ttft, total, worst in rows:
+        print(f"{synthesis:<9} | {stage_count:>10.1f} | {ttft:>10.2f}s | {total:>9.2f}s | {worst:>8.2f}s")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 """
 Conversational Chat Interface for the Advanced Recommendation Pipeline.
+
+The conversation is kept in a token-budgeted ChatHistory (see chat_history.py): recent
+turns verbatim and older ones as a running summary, so prompts stay the same size over
+a long session. Follow-up messages ("what about somewhere cheaper there?") are rewritten
+into standalone queries before retrieval.
 """
 
 import os
 import sys
+import time
+import logging
 from dotenv import load_dotenv
 import google.generativeai as genai
 
 # Import functions from the main pipeline script
 from main import (
     get_db_connection,
-    expand_query,
-    get_embedding,
-    find_similar_recommendations,
-    filter_candidates,
+    retrieve_candidates,
+    format_sources,
+    stream_generate,
+    TimedStream,
+    expansion_cache,
+    generate,
 )
+from chat_history import ChatHistory, CHAT_SUMMARY_TOKENS, estimate_tokens, is_follow_up
 
 # Load environment variables from .env file
 load_dotenv()
@@ -26,10 +36,67 @@ if not gemini_api_key:
     sys.exit("GOOGLE_API_KEY not found in environment variables.")
 genai.configure(api_key=gemini_api_key)
 
-def synthesize_chat_answer(query, history, candidates):
+def summarize_history(summary, turns):
+    """Folds older chat turns into the running summary of the conversation."""
+    model = genai.GenerativeModel('gemini-2.5-flash')
+    new_turns = "".join(turn.format() for turn in turns)
+    prompt = f"""
+    You are maintaining a summary of a conversation between a user and a local guide AI.
+
+    Summary so far:
+    {summary or "(none)"}
+
+    Turns to add to it:
+    {new_turns}
+
+    Write the updated summary in under {CHAT_SUMMARY_TOKENS * 3 // 4} words. Keep what later questions may
+    refer to: places recommended by name, neighborhoods, and the user's preferences and constraints
+    (budget, diet, what they want to avoid). Return only the summary.
+    """
+    response = generate(model, prompt)
+    return response.text.strip()
+
+
+def rewrite_query(query, history):
+    """
+    Rewrites a follow-up message into a standalone search query using the conversation,
+    e.g. "anything cheaper there?" -> "cheap restaurants in Journal Square". Messages
+    that don't refer back to the conversation are returned unchanged without a model call.
+    """
+    if not len(history) or not is_follow_up(query):
+        return query
+    try:
+        model = genai.GenerativeModel('gemini-2.5-flash')
+        prompt = f"""
+        Rewrite the user's latest message as a standalone search query for a database of local
+        recommendations, resolving references like "there", "it" or "something else" from the conversation.
+        If it is already standalone, return it unchanged. Return only the query, on one line.
+
+        Conversation:
+        {history.format(recent=2)}
+
+        Latest message: "{query}"
+        """
+        response = generate(model, prompt)
+        rewritten = response.text.strip().strip('"').splitlines()[0].strip()
+        return rewritten or query
+    except Exception as e:
+        logging.error(f"Failed to rewrite the query: {e}")
+        return query
+
+
+def synthesize_chat_answer(query, history, candidates, stream=False, resolved_query=None):
     """
     Synthesizes a conversational answer, considering chat history.
+
+    Args:
+        history (ChatHistory): The conversation so far.
+        resolved_query (str): The standalone query used for retrieval, if the message was rewritten.
+
+    With stream=True, returns a generator that yields the answer text in chunks as the
+    model produces them.
     """
+    fallback = "I found some recommendations, but I had trouble summarizing them."
     try:
         model = genai.GenerativeModel('gemini-2.5-flash')
 
@@ -50,11 +117,8 @@ def synthesize_chat_answer(query, history, candidates):
         candidate_text = "\n".join(candidate_details) if candidate_details else "No specific recommendations found."
 
 
-        # Format the history for the prompt
-        formatted_history = ""
-        for entry in history:
-            formatted_history += f"User: {entry['user']}\nAI: {entry['ai']}\n"
-
+        formatted_history = history.format()
+        resolved = f'\n        (Searched for: "{resolved_query}")' if resolved_query and resolved_query != query else ""
 
         prompt = f"""
         You are a helpful local guide. You are having a conversation with a user.
@@ -62,7 +126,7 @@ def synthesize_chat_answer(query, history, candidates):
         Here is the history of your conversation so far:
         {formatted_history}
 
-        Here is the user's latest query: "{query}"
+        Here is the user's latest query: "{query}"{resolved}
 
         I have found a few potential recommendations that might be relevant to the user's latest query. Here are the details:
 
@@ -75,11 +139,14 @@ def synthesize_chat_answer(query, history, candidates):
         - If no recommendations were found, provide a helpful response based on the conversation history and the query.
         """
 
-        response = model.generate_content(prompt)
+        logging.info(f"Chat prompt ~{estimate_tokens(prompt)} tokens (history ~{estimate_tokens(formatted_history)}).")
+        if stream:
+            return stream_generate(model, prompt, fallback)
+        response = generate(model, prompt)
         return response.text
     except Exception as e:
         print(f"Failed to synthesize answer: {e}")
-        return "I found some recommendations, but I had trouble summarizing them."
+        return iter([fallback]) if stream else fallback
 
 
 def chat():
@@ -92,50 +159,49 @@ def chat():
     if not conn:
         sys.exit("Could not connect to the database. Exiting.")
 
-    chat_history = []
+    chat_history = ChatHistory(summarize=summarize_history)
 
     while True:
         user_query = input("\nYou: ")
         if user_query.lower() in ["exit", "quit"]:
             print("Goodbye!")
+            chat_history.close()
+            if expansion_cache:
+                stats = expansion_cache.stats()
+                print(f"(expansion cache: {stats['hit_rate']:.0%} hit rate, {stats['saved_seconds']:.1f}s saved)")
             break
 
-        # Run the pipeline
-        expanded_queries = expand_query(user_query)
+        # Run the pipeline (expansion, retrieval, deduplication and filtering)
+        start = time.perf_counter()
         print("...thinking...")
+        search_query = rewrite_query(user_query, chat_history)
+        if search_query != user_query:
+            print(f"(searching for: {search_query})")
+        filtered_candidates = retrieve_candidates(conn, search_query)
 
-        all_candidates = []
-        for q in expanded_queries:
-            embedding = get_embedding(q)
-            if embedding:
-                candidates = find_similar_recommendations(conn, embedding, top_k=3)
-                if candidates:
-                    all_candidates.extend(candidates)
-
-        # Remove duplicates
-        unique_candidates = []
-        seen_urls = set()
-        for candidate in all_candidates:
-            if candidate[5] not in seen_urls: # Use source_url to identify duplicates
-                unique_candidates.append(candidate)
-                seen_urls.add(candidate[5])
-
-        # Filter candidates
-        filtered_candidates = filter_candidates(user_query, unique_candidates)
-
-        # Get the synthesized answer
-        ai_response = synthesize_chat_answer(user_query, chat_history, filtered_candidates)
-
-        print(f"\nAI: {ai_response}")
-
+        # The sources are known before synthesis, so show them first
         if filtered_candidates:
             print("\n--- Sources ---")
-            for candidate in filtered_candidates:
-                print(f"- {candidate[0]}: {candidate[5]}")
+            for source in format_sources(filtered_candidates):
+                print(f"- {source['name']}: {source['source_url']}")
             print("---------------")
 
-        # Update history
-        chat_history.append({"user": user_query, "ai": ai_response})
+        # Stream the synthesized answer as it is generated
+        answer = TimedStream(synthesize_chat_answer(user_query, chat_history, filtered_candidates, stream=True,
+                                                    resolved_query=search_query), start)
+        print("\nAI: ", end="", flush=True)
+        chunks = []
+        for chunk in answer:
+            chunks.append(chunk)
+            print(chunk, end="", flush=True)
+        print()
+        ai_response = "".join(chunks)
+        if answer.ttft is not None:
+            print(f"(first token {answer.ttft:.2f}s, total {answer.total:.2f}s)")
+
+        # Update history; older turns are summarized in the background once it is over budget
+        turn = chat_history.add(user_query, ai_response, resolved=search_query)
+        print(f"(turn ~{turn.tokens} tokens, history ~{chat_history.tokens} tokens)")
 
     conn.close()
 
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Chat History Compaction
+
+The chat used to send every earlier turn in every synthesis prompt, so prompts (and
+their latency and cost) grew with the length of the session. ChatHistory keeps the
+history inside a token budget:
+
+    rolling window   the most recent turns are kept verbatim
+    summary          once the verbatim turns exceed CHAT_HISTORY_TOKENS, the oldest
+                     ones are folded into a running summary until they fit in half the
+                     budget, so summarization runs every few turns rather than every turn
+    estimates        every turn records an estimate of its tokens, so the size of the
+                     history in a prompt is known without a count_tokens call
+
+Summaries are written by a `summarize(summary, turns)` callable (a model call in
+chat.py) on a background thread, while the user types the next message. Without one,
+or when it fails, the oldest turns are shortened to their first sentences instead.
+
+is_follow_up() flags queries that only make sense with the conversation ("what about
+something cheaper there?"), so the chat only spends a model call rewriting those into
+standalone queries before retrieval.
+"""
+
+import logging
+import math
+import os
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+# Estimated tokens of history (summary + verbatim turns) sent with each prompt
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 1200))
+# Turns always kept verbatim, however long they are
+CHAT_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", 2))
+# Target length of the running summary
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 250))
+
+# English text averages about four characters per token for Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+# Words that point back at something said earlier
+REFERENCE_WORDS = {
+    "it", "its", "there", "that", "those", "these", "they", "them", "their", "he", "she",
+    "one", "ones", "same", "else", "another", "instead", "more", "other", "others",
+    "cheaper", "closer", "nearby", "similar",
+}
+# Openings of follow-up questions ("what about brunch?", "and for dinner?")
+FOLLOW_UP_OPENINGS = re.compile(r"^(?:what|how) about\b|^(?:and|also|or|but)\b|^any (?:other|more)\b")
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimated Gemini tokens in a text (about four characters per token)."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def is_follow_up(query: str) -> bool:
+    """True when a query refers back to the conversation and can't be searched on its own."""
+    normalized = " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+    if FOLLOW_UP_OPENINGS.search(normalized):
+        return True
+    return bool(REFERENCE_WORDS & set(normalized.split()))
+
+
+@dataclass
+class Turn:
+    user: str
+    ai: str
+    # Query used for retrieval, when the user's message was rewritten
+    resolved: Optional[str] = None
+    tokens: int = 0
+
+    def __post_init__(self):
+        if not self.tokens:
+            self.tokens = estimate_tokens(self.format())
+
+    def format(self) -> str:
+        return f"User: {self.user}\nAI: {self.ai}\n"
+
+
+def shorten_turns(summary: str, turns: List[Turn], max_tokens: int = CHAT_SUMMARY_TOKENS) -> str:
+    """
+    Summary without a model: the previous summary plus each turn's message and the first
+    sentence of its answer, keeping the most recent text within max_tokens.
+    """
+    lines = [summary] if summary else []
+    for turn in turns:
+        first_sentence = _SENTENCE_END.split(turn.ai.strip(), maxsplit=1)[0]
+        lines.append(f"User asked: {turn.user} AI: {first_sentence}")
+    text = "\n".join(lines)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= max_chars else "..." + text[-max_chars:]
+
+
+class ChatHistory:
+    """Token-budgeted conversation history: a running summary plus the recent turns verbatim."""
+
+    def __init__(self, summarize: Optional[Callable[[str, List[Turn]], str]] = None,
+                 max_tokens: int = CHAT_HISTORY_TOKENS, recent_turns: int = CHAT_RECENT_TURNS,
+                 background: bool = True):
+        self.summarize = summarize
+        self.max_tokens = max_tokens
+        self.recent_turns = recent_turns
+        self.summary = ""
+        self.turns: List[Turn] = []
+        # Turns folded into the summary so far
+        self.summarized_turns = 0
+        self.summarizations = 0
+        self._executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending: Optional[Future] = None
+
+    def __len__(self):
+        return self.summarized_turns + len(self.turns)
+
+    @property
+    def tokens(self) -> int:
+        """Estimated tokens of the summary and the verbatim turns."""
+        return estimate_tokens(self.summary) + sum(turn.tokens for turn in self.turns)
+
+    def wait(self):
+        """Waits for a summarization running in the background."""
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    def add(self, user: str, ai: str, resolved: Optional[str] = None) -> Turn:
+        """Records a turn and, when the history is over budget, starts compacting it."""
+        self.wait()
+        turn = Turn(user, ai, resolved)
+        self.turns.append(turn)
+        if sum(recorded.tokens for recorded in self.turns) > self.max_tokens:
+            if self._executor:
+                self._pending = self._executor.submit(self.compact)
+            else:
+                self.compact()
+        return turn
+
+    def compact(self):
+        """Folds the oldest turns into the summary until the verbatim turns fit in half the budget."""
+        folded = []
+        remaining = sum(turn.tokens for turn in self.turns)
+        while len(self.turns) - len(folded) > self.recent_turns and remaining > self.max_tokens // 2:
+            turn = self.turns[len(folded)]
+            folded.append(turn)
+            remaining -= turn.tokens
+        if not folded:
+            return
+
+        summary = None
+        if self.summarize:
+            try:
+                summary = self.summarize(self.summary, folded)
+            except Exception as e:
+                logging.error(f"Failed to summarize the chat history: {e}")
+        if not summary:
+            summary = shorten_turns(self.summary, folded)
+        elif estimate_tokens(summary) > 2 * CHAT_SUMMARY_TOKENS:
+            # A summary that ignored its length limit would grow every prompt again
+            summary = shorten_turns(summary, [])
+        self.summary = summary.strip()
+        self.turns = self.turns[len(folded):]
+        self.summarized_turns += len(folded)
+        self.summarizations += 1
+        logging.info(f"Summarized {len(folded)} older turns; history is now ~{self.tokens} tokens.")
+
+    def format(self, recent: Optional[int] = None) -> str:
+        """
+        The history as prompt text: the summary of older turns, then the verbatim turns
+        (only the last `recent` of them, if given).
+        """
+        self.wait()
+        turns = self.turns if recent is None else self.turns[-recent:] if recent else []
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}\n")
+        parts.extend(turn.format() for turn in turns)
+        return "\n".join(parts)
+
+    def close(self):
+        self.wait()
+        if self._executor:
+            self._executor.shutdown()
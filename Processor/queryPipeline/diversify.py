@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Candidate Diversification
+
+Candidates are deduplicated by source URL, but several videos about the same venue
+from different creators still have different URLs and can fill every slot of the
+answer. Two steps keep the pool varied before it is filtered and synthesized:
+
+    collapse   candidates for the same entity (same normalized name, and the same
+               normalized location or no usable location) keep only their most
+               similar row
+    MMR        maximal marginal relevance picks the top-k greedily, each time taking
+               the candidate with the best
+
+                   MMR_LAMBDA * similarity to the query
+                   - (1 - MMR_LAMBDA) * max similarity to the candidates already picked
+
+Candidate embeddings are loaded from the recommendations table in one query. MMR
+keeps a running max-similarity vector, so each pick is one matrix-vector product
+over the pool and a pool of a few hundred takes well under a millisecond.
+"""
+
+import logging
+import os
+import re
+import string
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import psycopg2
+
+from query_router import GENERIC_NAME_WORDS
+
+# Weight of relevance against novelty; 1.0 ranks by similarity alone
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.7))
+# Candidates kept after diversification; 0 keeps all of them (collapsing duplicates only)
+DIVERSITY_TOP_K = int(os.getenv("DIVERSITY_TOP_K", 8))
+
+# Spellings of address words that differ between creators
+LOCATION_ABBREVIATIONS = {
+    "street": "st", "avenue": "ave", "av": "ave", "boulevard": "blvd", "road": "rd",
+    "place": "pl", "drive": "dr", "square": "sq", "north": "n", "south": "s", "east": "e", "west": "w",
+}
+# Values that say nothing about where a place is ("N/A", "Jersey City, NJ", "Various")
+VAGUE_LOCATION_WORDS = GENERIC_NAME_WORDS | {"a", "unknown", "not", "specified", "mentioned", "usa", "us"}
+
+# str.translate is several times faster than a regex for the few hundred names per query
+_PUNCTUATION = str.maketrans(string.punctuation + "’‘“”", " " * (len(string.punctuation) + 4))
+_PARENTHESES = re.compile(r"\(.*?\)")
+
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    """
+    Lowercased name without punctuation, "and" or a leading "the", so "The Bread & Salt"
+    and "Bread and Salt" match; empty for generic names.
+    """
+    words = [word for word in (name or "").lower().translate(_PUNCTUATION).split() if word != "and"]
+    if words[:1] == ["the"]:
+        words = words[1:]
+    if not words or set(words) <= VAGUE_LOCATION_WORDS:
+        return ""
+    return " ".join(words)
+
+
+@lru_cache(maxsize=4096)
+def normalize_location(location: str) -> str:
+    """
+    Location with abbreviated address words and without city or state words, so
+    "275 Grove Street, Jersey City, NJ" and "275 Grove St" match. Empty when it doesn't
+    pin down a place ("N/A", "Jersey City").
+    """
+    # Drop the parenthesised context models add ("Downtown (implied by caption)")
+    words = _PARENTHESES.sub(" ", location or "").lower().translate(_PUNCTUATION).split()
+    return " ".join(LOCATION_ABBREVIATIONS.get(word, word) for word in words if word not in VAGUE_LOCATION_WORDS)
+
+
+def collapse_duplicates(candidates: list) -> Tuple[list, list]:
+    """
+    Keeps the most similar candidate per entity.
+
+    Candidates with the same normalized name are the same entity when their normalized
+    locations are equal or either has no usable location. Candidates without a usable
+    name are always kept.
+
+    Returns:
+        tuple: (kept candidates in their original order, collapsed candidates)
+    """
+    # name -> locations of the candidates kept for it
+    kept_locations: Dict[str, List[str]] = {}
+    keep = set()
+    collapsed = []
+    order = sorted(range(len(candidates)), key=lambda i: candidates[i][6] or 0, reverse=True)
+    for i in order:
+        name = normalize_name(candidates[i][0])
+        location = normalize_location(candidates[i][1])
+        locations = kept_locations.setdefault(name, []) if name else None
+        if locations is not None and any(not location or not other or location == other for other in locations):
+            collapsed.append(candidates[i])
+            continue
+        if locations is not None:
+            locations.append(location)
+        keep.add(i)
+    return [candidate for i, candidate in enumerate(candidates) if i in keep], collapsed
+
+
+def parse_vector(value) -> np.ndarray:
+    """A pgvector value as a float32 array (psycopg2 returns it as "[0.1,0.2,...]" text)."""
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), dtype=np.float32, sep=",")
+    return np.asarray(value, dtype=np.float32)
+
+
+def fetch_candidate_embeddings(conn, source_urls: List[str]) -> Dict[str, np.ndarray]:
+    """Loads the unit-length embeddings of the given recommendations in one query, keyed by source URL."""
+    if conn is None or not source_urls:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT source_url, embedding
+                FROM recommendations
+                WHERE source_url = ANY(%s) AND embedding IS NOT NULL;
+                """,
+                (list(source_urls),)
+            )
+            embeddings = {}
+            for url, embedding in cur.fetchall():
+                vector = parse_vector(embedding)
+                norm = np.linalg.norm(vector)
+                embeddings[url] = vector / norm if norm else vector
+            return embeddings
+    except psycopg2.Error as e:
+        logging.error(f"Could not load candidate embeddings: {e}")
+        conn.rollback()
+        return {}
+
+
+def embedding_matrix(candidates: Sequence, embeddings: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Candidate embeddings (unit length, from fetch_candidate_embeddings) as an (n, d)
+    float32 matrix. Candidates without an embedding get a zero row, so they count as
+    unlike every other candidate.
+    """
+    dimensions = next((len(vector) for vector in embeddings.values()), 0)
+    zero = np.zeros(dimensions, dtype=np.float32)
+    rows = []
+    for candidate in candidates:
+        vector = embeddings.get(candidate[5])
+        rows.append(vector if vector is not None and len(vector) == dimensions else zero)
+    return np.stack(rows) if rows else np.zeros((0, dimensions), dtype=np.float32)
+
+
+def mmr_select(matrix: np.ndarray, relevance: Sequence[float], k: int, lambda_: float = MMR_LAMBDA) -> List[int]:
+    """
+    Greedy maximal marginal relevance over unit-length row vectors.
+
+    Returns:
+        list: Indices of the k selected rows, in the order they were picked.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    k = min(k, n)
+    selected: List[int] = []
+    if k <= 0:
+        return selected
+    # Highest similarity of each candidate to any selected one
+    max_similarity = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        scores = lambda_ * relevance - (1 - lambda_) * max_similarity
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        if matrix.shape[1]:
+            np.maximum(max_similarity, matrix @ matrix[pick], out=max_similarity)
+    return selected
+
+
+def diversify(candidates: list, embeddings: Dict[str, np.ndarray], top_k: int = DIVERSITY_TOP_K,
+              lambda_: float = MMR_LAMBDA) -> Tuple[list, list]:
+    """
+    Collapses same-entity duplicates and picks a diverse top_k by MMR.
+
+    Args:
+        embeddings (dict): Embeddings per source URL, from fetch_candidate_embeddings().
+        top_k (int): Candidates to keep; 0 keeps every candidate left after collapsing.
+
+    Returns:
+        tuple: (diverse candidates in MMR order, collapsed duplicates)
+    """
+    kept, collapsed = collapse_duplicates(candidates)
+    if not kept:
+        return kept, collapsed
+    matrix = embedding_matrix(kept, embeddings)
+    selected = mmr_select(matrix, [candidate[6] or 0 for candidate in kept], top_k or len(kept), lambda_)
+    return [kept[i] for i in selected], collapsed
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Query expansion cache
+
+A persistent SQLite cache of expand_query results, so repeated and near-identical
+queries skip the expansion LLM call. Lookups first try an exact match on the
+normalized query text ("Cheap pizza!" == "cheap pizza"), then a nearest-neighbour
+search over the cached query embeddings, accepting the closest entry when its cosine
+similarity is above a threshold ("cheap pizza" ~ "cheap pizza slice").
+
+Entries expire after a TTL and the cache is bounded in size, evicting the least
+recently used entries first. Hit/miss counters and the expansion latency saved by
+hits are kept in-process.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.getenv("EXPANSION_CACHE_DB", "expansion_cache.db")
+DEFAULT_TTL_SECONDS = int(os.getenv("EXPANSION_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.getenv("EXPANSION_CACHE_MAX_ENTRIES", 5000))
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("EXPANSION_CACHE_SIMILARITY", 0.92))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_expansions (
+    query_key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    expansions TEXT NOT NULL,
+    embedding BLOB,
+    latency REAL NOT NULL,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_expansions_last_accessed ON query_expansions (last_accessed);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases a query and drops punctuation and repeated whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class ExpansionCache:
+    """
+    TTL + LRU bounded cache of query expansions with an embedding nearest-neighbour fallback.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        # Unit-normalized embeddings of the live entries, rebuilt after writes
+        self._index_keys: List[str] = []
+        self._index: Optional[np.ndarray] = None
+        self._index_stale = True
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _hit(self, query_key: str, now: float) -> Optional[List[str]]:
+        row = self._conn.execute(
+            "SELECT expansions, latency FROM query_expansions WHERE query_key = ? AND created_at >= ?",
+            (query_key, now - self.ttl_seconds)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE query_expansions SET last_accessed = ? WHERE query_key = ?", (now, query_key))
+        self._conn.commit()
+        self.saved_seconds += row[1]
+        return json.loads(row[0])
+
+    def _load_index(self, now: float):
+        rows = self._conn.execute(
+            "SELECT query_key, embedding FROM query_expansions WHERE embedding IS NOT NULL AND created_at >= ?",
+            (now - self.ttl_seconds,)
+        ).fetchall()
+        self._index_keys = [row[0] for row in rows]
+        if rows:
+            matrix = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self._index = matrix / np.where(norms == 0, 1, norms)
+        else:
+            self._index = None
+        self._index_stale = False
+
+    def _nearest(self, embedding: Sequence[float], now: float) -> Tuple[Optional[str], float]:
+        if self._index_stale:
+            self._load_index(now)
+        if self._index is None:
+            return None, 0.0
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape[0] != self._index.shape[1]:
+            return None, 0.0
+        similarities = self._index @ (vector / (np.linalg.norm(vector) or 1))
+        best = int(np.argmax(similarities))
+        return self._index_keys[best], float(similarities[best])
+
+    def lookup(self, query: str,
+               embed: Optional[Callable[[str], Optional[List[float]]]] = None
+               ) -> Tuple[Optional[List[str]], Optional[List[float]]]:
+        """
+        Returns (expansions, embedding) for a query.
+
+        expansions is None on a miss. The query is only embedded (with `embed`) when the
+        exact lookup misses; the embedding is returned so put() can store it without a
+        second embedding call.
+        """
+        query_key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            expansions = self._hit(query_key, now)
+            if expansions is not None:
+                self.exact_hits += 1
+                return expansions, None
+
+        embedding = embed(query) if embed else None
+        if embedding is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        with self._lock:
+            nearest_key, similarity = self._nearest(embedding, now)
+            if nearest_key is not None and similarity >= self.similarity_threshold:
+                expansions = self._hit(nearest_key, now)
+                if expansions is not None:
+                    self.semantic_hits += 1
+                    return expansions, embedding
+            self.misses += 1
+            return None, embedding
+
+    def put(self, query: str, expansions: List[str], latency: float,
+            embedding: Optional[Sequence[float]] = None):
+        """Stores an expansion, then evicts expired entries and trims the cache to `max_entries`."""
+        now = time.time()
+        blob = np.asarray(embedding, dtype=np.float32).tobytes() if embedding is not None else None
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO query_expansions
+                    (query_key, query, expansions, embedding, latency, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (normalize_query(query), query, json.dumps(expansions), blob, latency, now, now)
+            )
+            expired = self._conn.execute(
+                "DELETE FROM query_expansions WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute("SELECT COUNT(*) FROM query_expansions").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM query_expansions WHERE query_key IN (
+                        SELECT query_key FROM query_expansions ORDER BY last_accessed LIMIT ?
+                    )
+                    """,
+                    (overflow,)
+                )
+            self.evictions += expired + max(0, overflow)
+            self._conn.commit()
+            self._index_stale = True
+
+    def stats(self) -> Dict:
+        """Returns hit/miss counters and saved latency for this process, and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM query_expansions").fetchone()[0]
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
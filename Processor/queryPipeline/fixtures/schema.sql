@@ -0,0 +1,42 @@
+-- Recommendations schema, as written by Processor/jersey_city_scraper.py.
+-- Used to load the checked-in recommendations export into a local Postgres for tests.
+CREATE EXTENSION IF NOT EXISTS vector;
+
+CREATE TABLE IF NOT EXISTS recommendations (
+    id SERIAL PRIMARY KEY,
+    name TEXT,
+    location TEXT,
+    neighborhood TEXT,
+    summary TEXT,
+    quote TEXT,
+    source_url TEXT NOT NULL UNIQUE,
+    embedding vector(1536),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS hashtags (
+    id SERIAL PRIMARY KEY,
+    tag TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS recommendation_hashtags (
+    recommendation_id INTEGER NOT NULL REFERENCES recommendations (id) ON DELETE CASCADE,
+    hashtag_id INTEGER NOT NULL REFERENCES hashtags (id) ON DELETE CASCADE,
+    PRIMARY KEY (recommendation_id, hashtag_id)
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    id SERIAL PRIMARY KEY,
+    tag TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS recommendation_tags (
+    recommendation_id INTEGER NOT NULL REFERENCES recommendations (id) ON DELETE CASCADE,
+    tag_id INTEGER NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+    PRIMARY KEY (recommendation_id, tag_id)
+);
+
+CREATE TABLE IF NOT EXISTS neighborhoods (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
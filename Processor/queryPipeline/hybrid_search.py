@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Hybrid Search
+
+Lexical + vector retrieval for the recommendations table. Vector search alone can rank
+an exact name ("Razza", "53 Hancock Ave") below places that are only loosely similar,
+so the hybrid backend also runs a Postgres full-text search over name, location,
+summary and quote, and fuses the two rankings with reciprocal rank fusion (RRF):
+
+    score(r) = sum over rankings of 1 / (RRF_K + rank of r)
+
+Both searches and the fusion run in a single SQL statement. The full-text search uses
+a stored tsvector column with a GIN index, created by:
+
+    python hybrid_search.py --create-index
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+
+import psycopg2
+
+# Candidates taken from each ranking before fusion
+HYBRID_POOL_SIZE = int(os.getenv("HYBRID_POOL_SIZE", 50))
+# RRF constant; larger values flatten the difference between top ranks
+RRF_K = int(os.getenv("RRF_K", 60))
+
+SEARCH_INDEX_SQL = """
+ALTER TABLE recommendations ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(location, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'C') ||
+        setweight(to_tsvector('english', coalesce(quote, '')), 'D')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS idx_recommendations_search ON recommendations USING GIN (search_vector);
+"""
+
+HYBRID_SQL = """
+WITH vector_ranked AS (
+    SELECT r.id, row_number() OVER (ORDER BY r.embedding <=> %(embedding)s::vector) AS rank
+    FROM recommendations r
+    WHERE r.embedding IS NOT NULL{filter_sql}
+    ORDER BY r.embedding <=> %(embedding)s::vector
+    LIMIT %(pool)s
+),
+lexical_ranked AS (
+    SELECT r.id, row_number() OVER (ORDER BY ts_rank_cd(r.search_vector, query) DESC) AS rank
+    FROM recommendations r, to_tsquery('english', %(tsquery)s) AS query
+    WHERE r.search_vector @@ query AND r.embedding IS NOT NULL{filter_sql}
+    ORDER BY ts_rank_cd(r.search_vector, query) DESC
+    LIMIT %(pool)s
+),
+fused AS (
+    SELECT id, sum(1.0 / (%(rrf_k)s + rank)) AS score
+    FROM (SELECT * FROM vector_ranked UNION ALL SELECT * FROM lexical_ranked) AS ranked
+    GROUP BY id
+)
+SELECT r.name, r.location, r.neighborhood, r.summary, r.quote, r.source_url,
+       1 - (r.embedding <=> %(embedding)s::vector) AS similarity
+FROM fused
+JOIN recommendations r USING (id)
+ORDER BY fused.score DESC, similarity DESC
+LIMIT %(top_k)s;
+"""
+
+
+def to_or_tsquery(text: str) -> str:
+    """
+    Builds a to_tsquery() string matching any word of the text ("cheap pizza" ->
+    "cheap | pizza"), so long natural-language queries still find exact names.
+    Stop words are dropped by Postgres.
+    """
+    return " | ".join(re.findall(r"[^\W_]+", text.lower()))
+
+
+def ensure_search_index(conn):
+    """Adds the search_vector column and its GIN index if they don't exist yet."""
+    with conn.cursor() as cur:
+        cur.execute(SEARCH_INDEX_SQL)
+    conn.commit()
+
+
+def hybrid_search(conn, query_text, query_embedding, top_k=3, pool_size=HYBRID_POOL_SIZE, rrf_k=RRF_K,
+                  filters=None):
+    """
+    Returns the top_k recommendations by reciprocal rank fusion of the vector ranking
+    and the full-text ranking, as (name, location, neighborhood, summary, quote,
+    source_url, similarity) rows like find_similar_recommendations. Structured
+    `filters` (a query_filters.SearchFilters) restrict both rankings.
+
+    Raises:
+        psycopg2.Error: On database errors, e.g. when the search index is missing.
+    """
+    embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
+    filter_sql, filter_params = filters.where_sql("r") if filters else ("", {})
+    with conn.cursor() as cur:
+        cur.execute(HYBRID_SQL.replace("{filter_sql}", filter_sql), {
+            "embedding": embedding_str,
+            "tsquery": to_or_tsquery(query_text),
+            "pool": pool_size,
+            "rrf_k": rrf_k,
+            "top_k": top_k,
+            **filter_params,
+        })
+        return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the full-text search index used by the hybrid backend")
+    parser.add_argument("--create-index", action="store_true", help="Add the search_vector column and its GIN index")
+    args = parser.parse_args()
+    if not args.create_index:
+        parser.print_help()
+        return
+
+    from main import get_db_connection
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("Could not connect to the database. Exiting.")
+    try:
+        ensure_search_index(conn)
+        logging.info("Full-text search index is ready.")
+    except psycopg2.Error as e:
+        sys.exit(f"Could not create the search index: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Local Test Database
+
+Loads the checked-in recommendations export (jersey_city_recommendations.jsonl) into
+a local Postgres with pgvector, so retrieval backends can be tested without the hosted
+database or the embedding API. Records are inserted with the scraper's own
+insert_recommendation into a separate schema, with deterministic hashed bag-of-words
+embeddings standing in for Gemini embeddings.
+
+Point TEST_DATABASE_URL at a database where the vector extension can be created:
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/planex_test python test_hybrid_search.py
+"""
+
+import contextlib
+import io
+import math
+import os
+import re
+import sys
+import zlib
+
+import psycopg2
+import pytest
+
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, root_dir)
+sys.path.insert(0, os.path.join(root_dir, 'Processor'))
+
+from Discovery.jsonio import iter_jsonl
+from hybrid_search import ensure_search_index
+
+RECOMMENDATIONS = os.path.join(root_dir, 'jersey_city_recommendations.jsonl')
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'schema.sql')
+TEST_SCHEMA = "planex_test"
+EMBEDDING_DIMENSIONS = 1536
+
+
+def hash_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    """A unit-length bag-of-words vector: each word adds 1 to the dimension its CRC32 hashes to."""
+    vector = [0.0] * dimensions
+    for word in re.findall(r"[^\W_]+", (text or "").lower()):
+        vector[zlib.crc32(word.encode("utf-8")) % dimensions] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def connect_test_db():
+    """Connects to TEST_DATABASE_URL, or returns None when it isn't set or reachable."""
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        return None
+    try:
+        return psycopg2.connect(url)
+    except psycopg2.OperationalError as e:
+        print(f"Could not connect to TEST_DATABASE_URL: {e}")
+        return None
+
+
+def require_test_db():
+    """connect_test_db() for tests: skips the calling test when no database is available."""
+    conn = connect_test_db()
+    if conn is None:
+        pytest.skip("TEST_DATABASE_URL not set or unreachable")
+    return conn
+
+
+def run_tests(*tests):
+    """Runs tests from a script's __main__ block, reporting pytest skips instead of stopping on them."""
+    for test in tests:
+        try:
+            test()
+        except pytest.skip.Exception as e:
+            print(f"⏭️  {test.__name__} skipped: {e.msg}")
+
+
+def load_recommendations(conn, path=RECOMMENDATIONS, hashtag_for=None):
+    """
+    Recreates the test schema, loads every recommendation from the export and builds the
+    full-text search index. The connection's search_path is left on the test schema.
+
+    Args:
+        hashtag_for (callable): record -> scraped hashtag (default: "JerseyCity").
+
+    Returns:
+        int: Number of records loaded.
+    """
+    # Imported here so the scraper's dependencies are only needed when loading
+    from jersey_city_scraper import insert_recommendation
+
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+        cur.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE;")
+        cur.execute(f"CREATE SCHEMA {TEST_SCHEMA};")
+        cur.execute(f"SET search_path TO {TEST_SCHEMA}, public;")
+        with open(SCHEMA_FILE, 'r', encoding='utf-8') as f:
+            cur.execute(f.read())
+    conn.commit()
+
+    count = 0
+    # insert_recommendation prints a line per record
+    with contextlib.redirect_stdout(io.StringIO()):
+        for record in iter_jsonl(path):
+            text = " ".join([record.get('name', ''), record.get('summary', ''), " ".join(record.get('tags') or [])])
+            hashtag = hashtag_for(record) if hashtag_for else "JerseyCity"
+            insert_recommendation(conn, record, hashtag, hash_embedding(text))
+            count += 1
+    ensure_search_index(conn)
+    return count
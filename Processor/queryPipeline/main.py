@@ -8,12 +8,31 @@ context-aware answers to their queries.
 
 import os
 import sys
+import json
+import time
+import threading
 import argparse
 import psycopg2
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
+from concurrent.futures import ThreadPoolExecutor, TimeoutError, as_completed
 import logging
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+# Add the root directory to the Python path to access the shared RateLimiter
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import throttle, GEMINI_EMBED, GEMINI_GENERATE
+from expansion_cache import ExpansionCache, DEFAULT_CACHE_PATH, normalize_query
+from query_router import ExpansionRouter
+from reranker import LocalReranker, fetch_candidate_tags
+from structured_answer import RESPONSE_SCHEMA, StructuredAnswerStream
+from hybrid_search import hybrid_search
+from query_filters import FilterParser
+from diversify import DIVERSITY_TOP_K, collapse_duplicates, diversify, fetch_candidate_embeddings
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -26,6 +45,37 @@ if not gemini_api_key:
     sys.exit("GOOGLE_API_KEY not found in environment variables.")
 genai.configure(api_key=gemini_api_key)
 
+# Expansions are cached across runs; set EXPANSION_CACHE_DB to an empty string to disable
+cache_db_path = os.getenv("EXPANSION_CACHE_DB", DEFAULT_CACHE_PATH)
+expansion_cache = ExpansionCache(cache_db_path) if cache_db_path else None
+
+# Seconds after retrieval starts beyond which unfinished expansions and their searches are dropped
+EXPANSION_DEADLINE = float(os.getenv("EXPANSION_DEADLINE", 5.0))
+# Worker threads for the expansion call and the concurrent vector searches
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", 8))
+# Database connections shared by the search workers of all concurrent queries
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", RETRIEVAL_WORKERS * 2))
+# How candidates are filtered: "auto" (local reranker, LLM filter when it is uncertain), "local" or "llm"
+FILTER_MODE = os.getenv("FILTER_MODE", "auto")
+# "separate" filter and synthesis calls, or one "combined" filter-and-synthesize call
+SYNTHESIS_MODE = os.getenv("SYNTHESIS_MODE", "separate")
+# "vector" similarity search, or "hybrid" full-text + vector search fused by reciprocal rank
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "vector")
+# Push neighborhood, tag, hashtag and recency constraints parsed from the query into the search
+PREFILTER = os.getenv("PREFILTER", "1") not in ("0", "false", "")
+
+# Model calls made by this process; the difference across a query is its number of LLM stages
+llm_calls = 0
+_llm_calls_lock = threading.Lock()
+
+def generate(model, prompt, **kwargs):
+    """Calls generate_content under the shared rate limiter and counts the call in llm_calls."""
+    global llm_calls
+    with _llm_calls_lock:
+        llm_calls += 1
+    with throttle(GEMINI_GENERATE):
+        return model.generate_content(prompt, **kwargs)
+
 def get_db_connection():
     """Establishes a connection to the PostgreSQL database."""
     pooler_url = os.getenv("DATABASE_POOLER_URL")
@@ -56,25 +106,51 @@ def get_db_connection():
         logging.error(f"Could not connect to database directly: {e}")
         return None
 
+def db_connect_args():
+    """Returns psycopg2.connect() arguments for the same database as get_db_connection()."""
+    pooler_url = os.getenv("DATABASE_POOLER_URL")
+    if pooler_url:
+        return {"dsn": pooler_url}
+    return {
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": os.getenv("DB_PORT", "5432"),
+    }
+
 def get_embedding(text, task_type="retrieval_query"):
     """Generates an embedding for the given text using the Gemini API."""
     try:
-        result = genai.embed_content(
-            model="gemini-embedding-001",
-            content=text,
-            task_type=task_type,
-            output_dimensionality=1536
-        )
+        with throttle(GEMINI_EMBED):
+            result = genai.embed_content(
+                model="gemini-embedding-001",
+                content=text,
+                task_type=task_type,
+                output_dimensionality=1536
+            )
         return result['embedding']
     except Exception as e:
         logging.error(f"Failed to generate embedding: {e}")
         return None
 
-def expand_query(query):
+def expand_query(query, use_cache=True):
     """
     Expands the user's query into a set of related queries using a generative model.
+
+    Results are served from the expansion cache when the same query (after normalization)
+    or a query with a near-identical embedding was expanded before.
     """
     logging.info(f"Expanding query: '{query}'")
+    cache = expansion_cache if use_cache else None
+    query_embedding = None
+    if cache:
+        cached, query_embedding = cache.lookup(query, embed=get_embedding)
+        if cached is not None:
+            logging.info(f"Expansion cache hit: {cached}")
+            return cached
+
+    start = time.perf_counter()
     try:
         model = genai.GenerativeModel('gemini-2.5-flash')
         prompt = f"""
@@ -87,9 +163,8 @@ def expand_query(query):
         Expanded Queries (JSON):
         """
         logging.info(f"Prompt for query expansion:\n{prompt}")
-        response = model.generate_content(prompt)
+        response = generate(model, prompt)
         logging.info(f"Raw response from model: {response.text}")
-        import json
 
         text_response = response.text.strip()
         if text_response.startswith("```json"):
@@ -101,38 +176,116 @@ def expand_query(query):
 
         expanded_queries = json.loads(text_response)
         logging.info(f"Expanded queries: {expanded_queries}")
+        if cache and isinstance(expanded_queries, list) and expanded_queries:
+            cache.put(query, expanded_queries, time.perf_counter() - start, query_embedding)
         return expanded_queries
     except Exception as e:
         logging.error(f"Failed to expand query: {e}")
         logging.warning("Falling back to original query.")
         return [query]
 
-def find_similar_recommendations(conn, query_embedding, top_k=3):
+def find_similar_recommendations(conn, query_embedding, top_k=3, query_text=None, backend=None, filters=None):
     """
     Finds the most similar recommendations using cosine similarity.
+
+    With backend="hybrid" (default: RETRIEVAL_BACKEND) and the query text, ranks by
+    reciprocal rank fusion of the vector and full-text searches instead, falling back to
+    the vector search if the hybrid query fails (e.g. the search index is missing).
+    Structured `filters` (a query_filters.SearchFilters) restrict both searches.
     """
+    if (backend or RETRIEVAL_BACKEND) == "hybrid" and query_text:
+        try:
+            return hybrid_search(conn, query_text, query_embedding, top_k=top_k, filters=filters)
+        except psycopg2.Error as e:
+            logging.error(f"Hybrid search failed ({e}); run hybrid_search.py --create-index. Using vector search.")
+            conn.rollback()
+
+    filter_sql, filter_params = filters.where_sql("r") if filters else ("", {})
     with conn.cursor() as cur:
         try:
             embedding_str = "[" + ",".join(map(str, query_embedding)) + "]"
             cur.execute(
-                """
-                SELECT name, location, neighborhood, summary, quote, source_url, 1 - (embedding <=> %s) AS similarity
-                FROM recommendations
-                WHERE embedding IS NOT NULL
+                f"""
+                SELECT r.name, r.location, r.neighborhood, r.summary, r.quote, r.source_url,
+                       1 - (r.embedding <=> %(embedding)s) AS similarity
+                FROM recommendations r
+                WHERE r.embedding IS NOT NULL{filter_sql}
                 ORDER BY similarity DESC
-                LIMIT %s;
+                LIMIT %(top_k)s;
                 """,
-                (embedding_str, top_k)
+                {"embedding": embedding_str, "top_k": top_k, **filter_params}
             )
             return cur.fetchall()
         except psycopg2.Error as e:
             logging.error(f"Database error: {e}")
+            conn.rollback()
             return None
 
-def synthesize_answer(query, candidates):
+class TimedStream:
+    """
+    Wraps a stream of answer chunks and records time to first token and total latency.
+
+    Both are measured from `start` (default: when the wrapper is created), so passing the
+    time the query was received reports the latency the user actually sees.
+    """
+
+    def __init__(self, chunks, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.ttft = None
+        self.total = None
+        self._chunks = chunks
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self.start
+            yield chunk
+        self.total = time.perf_counter() - self.start
+
+    def stats(self):
+        return {"ttft_seconds": self.ttft, "total_seconds": self.total}
+
+def chunk_text(chunk):
+    """Returns the text of a streamed response chunk ("" for chunks without text parts)."""
+    try:
+        return chunk.text
+    except ValueError:
+        # Chunks without text parts (e.g. safety metadata) raise on .text
+        return ""
+
+def stream_generate(model, prompt, fallback):
+    """
+    Yields the text chunks of a streaming generate_content call as they arrive.
+    If the call fails before anything was produced, yields `fallback` instead.
+    """
+    produced = False
+    try:
+        response = generate(model, prompt, stream=True)
+        for chunk in response:
+            text = chunk_text(chunk)
+            if text:
+                produced = True
+                yield text
+    except Exception as e:
+        logging.error(f"Failed to stream answer: {e}")
+        if not produced:
+            yield fallback
+
+def format_sources(candidates):
+    """Returns the source list shown alongside an answer; known before synthesis starts."""
+    return [
+        {"name": candidate[0], "neighborhood": candidate[2], "source_url": candidate[5]}
+        for candidate in candidates
+    ]
+
+def synthesize_answer(query, candidates, stream=False):
     """
     Synthesizes a conversational answer from a list of candidate recommendations.
+
+    With stream=True, returns a generator that yields the answer text in chunks as the
+    model produces them instead of the complete string.
     """
+    fallback = "I found some recommendations, but I had trouble summarizing them."
     try:
         model = genai.GenerativeModel('gemini-2.5-flash')
 
@@ -161,11 +314,13 @@ def synthesize_answer(query, candidates):
         - Do not include the source URLs in the answer. They will be listed separately.
         """
 
-        response = model.generate_content(prompt)
+        if stream:
+            return stream_generate(model, prompt, fallback)
+        response = generate(model, prompt)
         return response.text
     except Exception as e:
         logging.error(f"Failed to synthesize answer: {e}")
-        return "I found some recommendations, but I had trouble summarizing them."
+        return iter([fallback]) if stream else fallback
 
 def filter_candidates(query, candidates):
     """
@@ -202,10 +357,9 @@ def filter_candidates(query, candidates):
     """
 
     try:
-        response = model.generate_content(prompt)
+        response = generate(model, prompt)
         logging.info(f"Raw filter response from model: {response.text}")
         
-        import json
         # Find the JSON object in the response text
         text_response = response.text
         start_index = text_response.find('{')
@@ -230,33 +384,214 @@ def filter_candidates(query, candidates):
         logging.warning("Falling back to original (unfiltered) list of candidates.")
         return candidates
 
-def main():
-    """
-    Main function to run the advanced recommendation pipeline.
-    """
-    parser = argparse.ArgumentParser(description="Advanced Recommendation Pipeline")
-    parser.add_argument("query", type=str, help="The user's natural language query.")
-    args = parser.parse_args()
+# Loaded on first use, then shared for the life of the process. The service answers
+# requests on several threads, so each is built under a lock and only once.
+_shared_lock = threading.Lock()
+expansion_router = None
+
+def get_expansion_router(conn):
+    """Returns the shared expansion router, loading its vocabulary on first use."""
+    global expansion_router
+    if expansion_router is None:
+        with _shared_lock:
+            if expansion_router is None:
+                expansion_router = ExpansionRouter.from_db(conn)
+    return expansion_router
+
+filter_parser = None
+
+def get_filter_parser(conn):
+    """Returns the shared search filter parser, loading its vocabulary on first use."""
+    global filter_parser
+    if filter_parser is None:
+        with _shared_lock:
+            if filter_parser is None:
+                filter_parser = FilterParser.from_db(conn)
+    return filter_parser
+
+# Search workers never share the caller's connection: psycopg2 connections can't run
+# queries from several threads at once, and a search dropped at the deadline keeps
+# running after the caller has closed its connection. Each search borrows its own.
+db_pool = None
+_db_pool_slots = threading.BoundedSemaphore(DB_POOL_SIZE)
+
+def get_db_pool():
+    """Returns the shared connection pool for search workers, creating it on first use."""
+    global db_pool
+    if db_pool is None:
+        with _shared_lock:
+            if db_pool is None:
+                db_pool = ThreadedConnectionPool(0, DB_POOL_SIZE, **db_connect_args())
+    return db_pool
+
+@contextmanager
+def pooled_connection():
+    """Lends the calling thread a connection of its own, waiting while all DB_POOL_SIZE are in use."""
+    with _db_pool_slots:
+        pool = get_db_pool()
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn, close=bool(conn.closed))
 
-    logging.info(f"Received query: {args.query}")
+def pooled_search(query, top_k=3, backend=None, filters=None):
+    """Runs search_query on a pooled connection; used by the retrieval worker threads."""
+    try:
+        with pooled_connection() as conn:
+            return search_query(conn, query, top_k, backend, filters)
+    except psycopg2.Error as e:
+        logging.error(f"No database connection for the search '{query}': {e}")
+        return []
 
-    conn = get_db_connection()
-    if not conn:
-        sys.exit("Could not connect to the database. Exiting.")
+def search_query(conn, query, top_k=3, backend=None, filters=None):
+    """
+    Embeds one query and returns its nearest recommendations (an empty list on failure).
+
+    With structured filters, a search that finds fewer than top_k rows is repeated with
+    looser filters (see SearchFilters.relaxations), so a narrow filter never empties the
+    results.
+    """
+    embedding = get_embedding(query)
+    if not embedding:
+        return []
+    rows = []
+    for step in (filters.relaxations() if filters else [None]):
+        rows = find_similar_recommendations(conn, embedding, top_k=top_k, query_text=query,
+                                            backend=backend, filters=step) or []
+        if len(rows) >= top_k:
+            break
+        if step:
+            logging.info(f"Only {len(rows)} results with {step}; relaxing the filters.")
+    return rows
+
+def gather_expanded_results(query, expansion, executor, deadline_at, top_k=3, backend=None, filters=None):
+    """
+    Waits for the expansion call, searches every expanded query concurrently (each on a
+    pooled connection) and returns their rows in the order the searches finish. Anything
+    still running at `deadline_at` (a time.perf_counter() value), including the expansion
+    call itself, is dropped.
+    """
+    try:
+        expanded_queries = expansion.result(timeout=max(0, deadline_at - time.perf_counter()))
+    except TimeoutError:
+        logging.warning("Query expansion missed the deadline; using the original query only.")
+        return []
 
-    expanded_queries = expand_query(args.query)
     logging.info("Expanded queries:")
     for q in expanded_queries:
         logging.info(f"- {q}")
 
-    all_candidates = []
-    for query in expanded_queries:
-        embedding = get_embedding(query)
-        if embedding:
-            candidates = find_similar_recommendations(conn, embedding, top_k=3)
-            if candidates:
-                all_candidates.extend(candidates)
-    logging.info(f"Found {len(all_candidates)} total candidates from all queries.")
+    # The original query is already being searched
+    searches = {
+        executor.submit(pooled_search, expanded_query, top_k, backend, filters): expanded_query
+        for expanded_query in expanded_queries
+        if normalize_query(expanded_query) != normalize_query(query)
+    }
+    results = []
+    try:
+        for future in as_completed(searches, timeout=max(0, deadline_at - time.perf_counter())):
+            rows = future.result()
+            logging.info(f"Merged {len(rows)} candidates for '{searches[future]}'")
+            results.extend(rows)
+    except TimeoutError:
+        late = [searches[future] for future in searches if not future.done()]
+        logging.warning(f"Dropped {len(late)} expanded queries that missed the deadline: {late}")
+    return results
+
+local_reranker = None
+
+def get_local_reranker():
+    """Returns the shared local reranker, loading its model on first use."""
+    global local_reranker
+    if local_reranker is None:
+        with _shared_lock:
+            if local_reranker is None:
+                local_reranker = LocalReranker()
+    return local_reranker
+
+def select_candidates(conn, query, candidates, filter_mode=None):
+    """
+    Reranks candidates and drops those violating the query's negative constraints.
+
+    Modes:
+        auto    the local reranker, handing its output to the LLM filter only when it
+                can't judge a constraint itself
+        local   the local reranker only
+        llm     the LLM filter only
+    """
+    mode = filter_mode or FILTER_MODE
+    if mode == "llm" or not candidates:
+        return filter_candidates(query, candidates)
+
+    tags = fetch_candidate_tags(conn, [candidate[5] for candidate in candidates])
+    result = get_local_reranker().rerank(query, candidates, tags)
+    if result.dropped:
+        logging.info(f"Local filter dropped {[candidate[0] for candidate in result.dropped]}")
+    if mode == "auto" and result.uncertain:
+        logging.info(f"Local filter is uncertain ({'; '.join(result.uncertain)}); asking the model.")
+        return filter_candidates(query, result.candidates)
+    logging.info(f"Filtered locally from {len(candidates)} down to {len(result.candidates)} candidates.")
+    return result.candidates
+
+def retrieve_candidates(conn, query, top_k=3, expand="auto", deadline=None, filter_mode=None, backend=None,
+                        prefilter=None):
+    """
+    Runs the retrieval half of the pipeline for a query: expansion, one vector search per
+    expanded query, deduplication by source URL and by venue, MMR diversification (see
+    diversify.py) and filtering against the original query.
+
+    The original query is searched as soon as the query arrives. With expand="auto", the
+    expansion router skips the expansion call for queries that are already specific. When
+    a query is expanded, the expansion call runs alongside the original search and the
+    expanded queries are searched concurrently once it returns; expansions and searches
+    not finished `deadline` seconds after the start are dropped.
+
+    Neighborhood, tag, hashtag and recency constraints parsed from the original query are
+    applied inside every search, including the searches for the expanded queries.
+
+    `conn` is only used on the calling thread; the searches run on connections borrowed
+    from the shared pool (see pooled_search), so the caller may close `conn` as soon as
+    this returns, even while dropped searches are still finishing.
+
+    Args:
+        expand (str): "auto", "always" or "never".
+        deadline (float): Seconds to wait for expanded results (default: EXPANSION_DEADLINE).
+        filter_mode (str): "auto", "local" or "llm" (default: FILTER_MODE), see select_candidates().
+        backend (str): "vector" or "hybrid" (default: RETRIEVAL_BACKEND), see find_similar_recommendations().
+        prefilter (bool): Apply structured filters in the search (default: PREFILTER).
+
+    Returns:
+        list: The filtered candidate rows, ready for synthesis.
+    """
+    start = time.perf_counter()
+    deadline_at = start + (deadline if deadline is not None else EXPANSION_DEADLINE)
+
+    if expand == "auto":
+        needs_expansion, reason = get_expansion_router(conn).classify(query)
+        logging.info(f"Expansion {'needed' if needs_expansion else 'skipped'} ({reason})")
+    else:
+        needs_expansion = expand == "always"
+
+    filters = None
+    if PREFILTER if prefilter is None else prefilter:
+        filters = get_filter_parser(conn).parse(query)
+        if filters:
+            logging.info(f"Structured filters: {filters}")
+
+    executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS)
+    try:
+        original = executor.submit(pooled_search, query, top_k, backend, filters)
+        expanded_candidates = []
+        if needs_expansion:
+            expansion = executor.submit(expand_query, query)
+            expanded_candidates = gather_expanded_results(query, expansion, executor, deadline_at, top_k, backend,
+                                                          filters)
+        all_candidates = original.result() + expanded_candidates
+    finally:
+        # Don't wait for work that missed the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+    logging.info(f"Found {len(all_candidates)} total candidates from all queries in {time.perf_counter() - start:.2f}s.")
 
     unique_candidates = []
     seen_urls = set()
@@ -266,24 +601,197 @@ def main():
             seen_urls.add(candidate[5])
     logging.info(f"Found {len(unique_candidates)} unique candidates.")
 
-    # Filter candidates based on the original query
-    filtered_candidates = filter_candidates(args.query, unique_candidates)
+    # Videos about the same venue have different URLs; keep one per venue, then a diverse top-k
+    unique_candidates, collapsed = collapse_duplicates(unique_candidates)
+    if collapsed:
+        logging.info(f"Collapsed {len(collapsed)} same-venue duplicates: {[candidate[0] for candidate in collapsed]}")
+    if DIVERSITY_TOP_K and len(unique_candidates) > DIVERSITY_TOP_K:
+        embeddings = fetch_candidate_embeddings(conn, [candidate[5] for candidate in unique_candidates])
+        mmr_start = time.perf_counter()
+        unique_candidates, _ = diversify(unique_candidates, embeddings)
+        logging.info(f"Kept {len(unique_candidates)} diverse candidates by MMR in "
+                     f"{(time.perf_counter() - mmr_start) * 1000:.2f}ms.")
+
+    # Rerank and filter candidates based on the original query
+    return select_candidates(conn, query, unique_candidates, filter_mode)
+
+def filter_and_synthesize(query, candidates, stream=False):
+    """
+    Filters candidates against the query's constraints and writes the answer in a single
+    model call, using a structured response with the accepted candidate indices and the
+    answer text.
+
+    With stream=True, returns as soon as the accepted indices have arrived, with the answer
+    as a generator of chunks decoded while the model is still writing it. If the call fails
+    before the indices arrive, falls back to filter_candidates and synthesize_answer.
+
+    Returns:
+        tuple: (accepted candidates, answer text or generator of answer chunks)
+    """
+    candidate_details = []
+    for i, candidate in enumerate(candidates):
+        name, location, neighborhood, summary, quote, source_url, similarity = candidate
+        candidate_details.append(
+            f"Candidate {i}:\n"
+            f"  Name: {name}\n"
+            f"  Location: {location}\n"
+            f"  Neighborhood: {neighborhood}\n"
+            f"  Summary: {summary}\n"
+            f"  Quote: {quote}\n"
+        )
+
+    prompt = f"""
+    You are a helpful local guide. A user has asked the following question: "{query}"
+
+    Candidate Recommendations:
+    {" ".join(candidate_details)}
+
+    First, decide which candidates do NOT violate any explicit negative constraint in the user query.
+    For example, if the user says "I don't want to eat", any food-related recommendation is a violation.
+    Return their integer indices as "accepted_indices".
+
+    Then write "answer": a conversational and helpful text answer to the user's query, using only the accepted candidates.
+    - Explain why certain places are good recommendations, drawing from their summary or quote data.
+    - The generated text must explicitly reference the specific recommendations it discusses. For example: "For a classic, no-frills slice, you should check out Tony's Pizza, which is famous for its 'crispy crust and fresh ingredients'."
+    - Do not include the source URLs in the answer. They will be listed separately.
+    """
+    generation_config = {"response_mime_type": "application/json", "response_schema": RESPONSE_SCHEMA}
+
+    def accepted(indices):
+        return [candidates[i] for i in dict.fromkeys(indices) if 0 <= i < len(candidates)]
+
+    def fall_back():
+        logging.warning("Falling back to separate filter and synthesis calls.")
+        filtered = filter_candidates(query, candidates)
+        return filtered, synthesize_answer(query, filtered, stream=stream)
+
+    model = genai.GenerativeModel('gemini-2.5-flash')
+    parser = StructuredAnswerStream()
+    try:
+        if not stream:
+            response = generate(model, prompt, generation_config=generation_config)
+            parser.feed(response.text)
+            result = parser.finish()
+            return accepted(parser.indices), result.get("answer", "")
+
+        response = iter(generate(model, prompt, generation_config=generation_config, stream=True))
+        pending = []
+        for chunk in response:
+            pending.append(parser.feed(chunk_text(chunk)))
+            if parser.indices is not None:
+                break
+        if parser.indices is None:
+            # The stream ended without the indices ahead of the answer
+            parser.finish()
+    except Exception as e:
+        logging.error(f"Failed to filter and synthesize in one call: {e}")
+        return fall_back()
+
+    accepted_candidates = accepted(parser.indices)
+    logging.info(f"Filtered from {len(candidates)} down to {len(accepted_candidates)} candidates.")
+
+    def answer_chunks():
+        produced = False
+        for text in pending:
+            if text:
+                produced = True
+                yield text
+        try:
+            for chunk in response:
+                text = parser.feed(chunk_text(chunk))
+                if text:
+                    produced = True
+                    yield text
+        except Exception as e:
+            logging.error(f"Failed to stream answer: {e}")
+        if not produced:
+            yield "I found some recommendations, but I had trouble summarizing them."
+
+    return accepted_candidates, answer_chunks()
+
+def answer_query(conn, query, synthesis=None, stream=False, expand="auto", filter_mode=None, backend=None,
+                 prefilter=None):
+    """
+    Runs the whole pipeline for a query.
+
+    Modes:
+        separate   filtering (local, or the LLM filter per filter_mode) followed by a
+                   synthesis call: up to three sequential model calls with the expansion
+        combined   local filtering, then one filter-and-synthesize call
+
+    Returns:
+        tuple: (candidates, answer text or generator of answer chunks)
+    """
+    synthesis = synthesis or SYNTHESIS_MODE
+    if synthesis == "combined":
+        candidates = retrieve_candidates(conn, query, expand=expand, filter_mode="local", backend=backend,
+                                         prefilter=prefilter)
+        return filter_and_synthesize(query, candidates, stream=stream)
+    candidates = retrieve_candidates(conn, query, expand=expand, filter_mode=filter_mode, backend=backend,
+                                     prefilter=prefilter)
+    return candidates, synthesize_answer(query, candidates, stream=stream)
+
+def main():
+    """
+    Main function to run the advanced recommendation pipeline.
+    """
+    parser = argparse.ArgumentParser(description="Advanced Recommendation Pipeline")
+    parser.add_argument("query", type=str, help="The user's natural language query.")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="Wait for the complete answer instead of printing it as it is generated.")
+    parser.add_argument("--expand", choices=["auto", "always", "never"], default="auto",
+                        help="Expand the query with the model: only when needed (default), always, or never.")
+    parser.add_argument("--filter", choices=["auto", "local", "llm"], default=None,
+                        help="Filter candidates locally, with the model, or locally with the model as a fallback (default).")
+    parser.add_argument("--synthesis", choices=["separate", "combined"], default=None,
+                        help="Separate filter and synthesis calls (default), or one combined filter-and-synthesize call.")
+    parser.add_argument("--backend", choices=["vector", "hybrid"], default=None,
+                        help="Vector similarity search (default), or hybrid full-text + vector search.")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="Don't restrict the search by the neighborhoods, tags, hashtags and dates in the query.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    logging.info(f"Received query: {args.query}")
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("Could not connect to the database. Exiting.")
+
+    calls_before = llm_calls
+    filtered_candidates, answer = answer_query(conn, args.query, synthesis=args.synthesis, stream=not args.no_stream,
+                                               expand=args.expand, filter_mode=args.filter, backend=args.backend,
+                                               prefilter=False if args.no_prefilter else None)
 
     logging.info("\n--- Filtered Candidates ---")
     for candidate in filtered_candidates:
         logging.info(f"Name: {candidate[0]}, Similarity: {candidate[6]:.4f}")
     logging.info("-------------------------")
 
-    synthesized_answer = synthesize_answer(args.query, filtered_candidates)
-
-    logging.info("\n--- Synthesized Answer ---")
-    logging.info(synthesized_answer)
-    logging.info("--------------------------")
-
-    logging.info("\n--- Sources ---")
-    for candidate in filtered_candidates:
-        logging.info(f"- {candidate[0]}: {candidate[5]}")
-    logging.info("---------------")
+    if args.no_stream:
+        logging.info("\n--- Synthesized Answer ---")
+        logging.info(answer)
+        logging.info("--------------------------")
+
+        logging.info("\n--- Sources ---")
+        for candidate in filtered_candidates:
+            logging.info(f"- {candidate[0]}: {candidate[5]}")
+        logging.info("---------------")
+        logging.info(f"Total latency: {time.perf_counter() - start:.2f}s")
+    else:
+        # The sources are known before the answer text, so show them while it streams in
+        print("\n--- Sources ---")
+        for source in format_sources(filtered_candidates):
+            print(f"- {source['name']}: {source['source_url']}")
+        print("---------------\n")
+
+        answer = TimedStream(answer, start)
+        for chunk in answer:
+            print(chunk, end="", flush=True)
+        print()
+        if answer.ttft is not None:
+            logging.info(f"Time to first token: {answer.ttft:.2f}s, total latency: {answer.total:.2f}s")
+    logging.info(f"LLM stages ({args.synthesis or SYNTHESIS_MODE}): {llm_calls - calls_before}")
 
     conn.close()
 
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Structured Search Filters
+
+Parses the structured constraints in a query and turns them into SQL predicates that
+run inside the vector (or hybrid) search, so "brunch in Journal Square" only ranks
+recommendations from Journal Square instead of ranking everything and leaving the
+rest to the candidate filter:
+
+    neighborhood   a known neighborhood name ("in Journal Square", "the heights")
+    tag            a word or phrase from the tags table ("brunch", "ice cream")
+    hashtag        the hashtag a recommendation was scraped from ("#JerseyCityEats")
+    recency        "this week", "this month", "recent", "last 10 days", ...
+
+Neighborhoods and tags are read from the neighborhoods and tags tables. A filtered search
+that finds too few rows is retried with looser filters (see SearchFilters.relaxations),
+so a narrow tag never empties the candidate pool.
+
+The predicates use the recommendation_tags and recommendation_hashtags link tables and
+recommendations.created_at. Add that column and the supporting indexes with:
+
+    python query_filters.py --create-indexes
+"""
+
+import argparse
+import logging
+import re
+import sys
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import psycopg2
+
+from expansion_cache import normalize_query
+from query_router import GENERIC_NAME_WORDS, STOPWORDS
+
+# Jersey City neighborhoods recognized even before they appear in the neighborhoods table
+KNOWN_NEIGHBORHOODS = [
+    "Downtown", "Journal Square", "The Heights", "Jersey City Heights", "Paulus Hook", "Newport",
+    "Hamilton Park", "Harsimus Cove", "Van Vorst Park", "Bergen-Lafayette", "Greenville", "West Side",
+    "McGinley Square", "Exchange Place", "Grove Street", "Liberty State Park", "Lincoln Park",
+]
+
+# Longer neighborhood table values are descriptions rather than names
+MAX_NEIGHBORHOOD_WORDS = 3
+
+RECENT_DAYS = 30
+RECENCY_PATTERNS = [
+    (re.compile(r"\b(?:last|past) (\d+) days?\b"), None),
+    (re.compile(r"\btoday\b"), 1),
+    (re.compile(r"\b(?:this|last|past) week\b"), 7),
+    (re.compile(r"\b(?:this|last|past) month\b"), 30),
+    (re.compile(r"\b(?:recent|recently|lately|latest)\b"), RECENT_DAYS),
+]
+HASHTAG = re.compile(r"#(\w+)")
+
+FILTER_INDEX_SQL = """
+ALTER TABLE recommendations ADD COLUMN IF NOT EXISTS created_at TIMESTAMPTZ NOT NULL DEFAULT now();
+CREATE INDEX IF NOT EXISTS idx_recommendations_created_at ON recommendations (created_at);
+CREATE INDEX IF NOT EXISTS idx_recommendation_tags_tag ON recommendation_tags (tag_id, recommendation_id);
+CREATE INDEX IF NOT EXISTS idx_recommendation_hashtags_hashtag ON recommendation_hashtags (hashtag_id, recommendation_id);
+"""
+
+
+@dataclass
+class SearchFilters:
+    """Structured constraints on a search; empty filters match everything."""
+    neighborhoods: List[str] = field(default_factory=list)
+    tags: List[str] = field(default_factory=list)
+    hashtags: List[str] = field(default_factory=list)
+    since: Optional[datetime] = None
+
+    def __bool__(self):
+        return bool(self.neighborhoods or self.tags or self.hashtags or self.since)
+
+    def where_sql(self, alias: str = "r") -> Tuple[str, Dict]:
+        """
+        Returns (" AND ..." predicate SQL, named parameters) for a query over
+        recommendations aliased as `alias`. Both are empty for empty filters.
+        """
+        clauses, params = [], {}
+        if self.neighborhoods:
+            # Neighborhood values are free text ("Downtown, Jersey City", "Bergen-Lafayette"),
+            # so match the normalized name anywhere in the normalized value
+            clauses.append(
+                f"regexp_replace(lower({alias}.neighborhood), '[^a-z0-9]+', ' ', 'g') LIKE ANY(%(filter_neighborhoods)s)"
+            )
+            params["filter_neighborhoods"] = [f"%{name}%" for name in self.neighborhoods]
+        if self.tags:
+            clauses.append(
+                f"EXISTS (SELECT 1 FROM recommendation_tags rt JOIN tags t ON t.id = rt.tag_id "
+                f"WHERE rt.recommendation_id = {alias}.id AND lower(t.tag) = ANY(%(filter_tags)s))"
+            )
+            params["filter_tags"] = [tag.lower() for tag in self.tags]
+        if self.hashtags:
+            clauses.append(
+                f"EXISTS (SELECT 1 FROM recommendation_hashtags rh JOIN hashtags h ON h.id = rh.hashtag_id "
+                f"WHERE rh.recommendation_id = {alias}.id AND lower(h.tag) = ANY(%(filter_hashtags)s))"
+            )
+            params["filter_hashtags"] = [hashtag.lower() for hashtag in self.hashtags]
+        if self.since:
+            clauses.append(f"{alias}.created_at >= %(filter_since)s")
+            params["filter_since"] = self.since
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def relaxations(self) -> List["SearchFilters"]:
+        """These filters, then without tags, then without neighborhoods, ending with no filters."""
+        steps = [self, replace(self, tags=[]), replace(self, tags=[], neighborhoods=[]), SearchFilters()]
+        relaxed = []
+        for step in steps:
+            if step not in relaxed:
+                relaxed.append(step)
+        return relaxed
+
+
+class FilterParser:
+    """Finds neighborhood, tag, hashtag and recency constraints in a query."""
+
+    def __init__(self, neighborhoods: Iterable[str] = (), tags: Iterable[str] = ()):
+        # Normalized spelling ("the heights") -> the name matched by the predicate ("heights")
+        self.neighborhoods: Dict[str, str] = {}
+        for name in list(KNOWN_NEIGHBORHOODS) + list(neighborhoods):
+            # Table values can carry context ("Downtown, Jersey City", "Greenville/West Side",
+            # "Downtown Jersey City (Implied by general context)"); keep the short name parts
+            for part in re.split(r"[,/]", (name or "").split("(")[0]):
+                normalized = re.sub(r"^the ", "", normalize_query(part))
+                words = normalized.split()
+                if not 1 <= len(words) <= MAX_NEIGHBORHOOD_WORDS or any(len(word) < 2 or word in STOPWORDS for word in words):
+                    continue
+                if set(words) <= GENERIC_NAME_WORDS - {"downtown"}:
+                    continue
+                self.neighborhoods.setdefault(normalized, normalized)
+                self.neighborhoods.setdefault(f"the {normalized}", normalized)
+        self.tags: Set[str] = set()
+        for tag in tags:
+            normalized = normalize_query(tag or "")
+            if normalized and not set(normalized.split()) <= GENERIC_NAME_WORDS | STOPWORDS:
+                self.tags.add(normalized)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "FilterParser":
+        """Builds the vocabulary from recommendation dicts (neighborhood, tags), e.g. the JSONL export."""
+        neighborhoods, tags = [], []
+        for record in records:
+            neighborhoods.append(record.get("neighborhood"))
+            tags.extend(record.get("tags") or [])
+        return cls(neighborhoods, tags)
+
+    @classmethod
+    def from_db(cls, conn) -> "FilterParser":
+        """Loads neighborhood and tag names. Falls back to the known neighborhoods on a database error."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT name FROM neighborhoods;")
+                neighborhoods = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT tag FROM tags;")
+                tags = [row[0] for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            logging.error(f"Could not load the search filter vocabulary: {e}")
+            conn.rollback()
+            return cls()
+        return cls(neighborhoods, tags)
+
+    def _match_phrases(self, words: List[str], vocabulary, max_words: int = 4) -> List[Tuple[int, int, str]]:
+        """Longest-first, non-overlapping matches of vocabulary phrases as (start, end, phrase)."""
+        matches, taken = [], set()
+        for size in range(min(max_words, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                span = set(range(i, i + size))
+                phrase = " ".join(words[i:i + size])
+                if phrase in vocabulary and not span & taken:
+                    matches.append((i, i + size, phrase))
+                    taken |= span
+        return sorted(matches)
+
+    def parse(self, query: str, now: Optional[datetime] = None) -> SearchFilters:
+        filters = SearchFilters()
+        filters.hashtags = HASHTAG.findall(query)
+        text = HASHTAG.sub(" ", query).lower()
+
+        for pattern, days in RECENCY_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                days = days or int(match.group(1))
+                filters.since = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+                text = pattern.sub(" ", text)
+                break
+
+        words = normalize_query(text).split()
+        used = set()
+        for start, end, phrase in self._match_phrases(words, self.neighborhoods):
+            name = self.neighborhoods[phrase]
+            if name not in filters.neighborhoods:
+                filters.neighborhoods.append(name)
+            used.update(range(start, end))
+        remaining = [word if i not in used else "" for i, word in enumerate(words)]
+        for _, _, phrase in self._match_phrases(remaining, self.tags):
+            if phrase not in STOPWORDS:
+                filters.tags.append(phrase)
+        return filters
+
+
+def ensure_filter_indexes(conn):
+    """Adds recommendations.created_at and the indexes behind the filter predicates."""
+    with conn.cursor() as cur:
+        cur.execute(FILTER_INDEX_SQL)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the columns and indexes used by structured search filters")
+    parser.add_argument("--create-indexes", action="store_true", help="Add created_at and the filter indexes")
+    parser.add_argument("--parse", metavar="QUERY", help="Print the filters parsed from a query")
+    args = parser.parse_args()
+
+    if not args.create_indexes and not args.parse:
+        parser.print_help()
+        return
+
+    from main import get_db_connection
+    conn = get_db_connection()
+    if not conn:
+        sys.exit("Could not connect to the database. Exiting.")
+    try:
+        if args.create_indexes:
+            ensure_filter_indexes(conn)
+            logging.info("Search filter indexes are ready.")
+        if args.parse:
+            print(FilterParser.from_db(conn).parse(args.parse))
+    except psycopg2.Error as e:
+        sys.exit(f"Could not create the filter indexes: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Expansion Router
+
+A cheap local check that decides whether a query needs the LLM expansion step. Queries
+that name a known place ("Razza pizza", "maman brunch") or are a couple of words from
+the tag vocabulary ("coffee", "rooftop bar downtown") already make a good vector search
+on their own, so retrieval can start with the original query right away. Open-ended or
+long queries, and queries with negations, are still expanded.
+
+The vocabulary comes from the recommendation names, tags and neighborhoods, loaded once
+from the database (or from the recommendations JSONL export).
+"""
+
+import logging
+from typing import Iterable, Optional, Set, Tuple
+
+import psycopg2
+
+from expansion_cache import normalize_query
+
+# Content words beyond which a query is considered descriptive enough to benefit from expansion
+MAX_SIMPLE_WORDS = 3
+# Longest recommendation name, in words, matched against the query
+MAX_NAME_WORDS = 6
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "best", "by", "can", "find", "for", "from", "good",
+    "great", "i", "in", "is", "me", "my", "near", "of", "on", "or", "place", "places", "spot",
+    "spots", "the", "to", "where", "with",
+}
+
+# Words that ask for ideas rather than name a thing
+OPEN_ENDED_WORDS = {
+    "anything", "fun", "ideas", "plan", "recommend", "should", "something", "somewhere",
+    "suggest", "suggestions", "things", "what", "weekend",
+}
+
+NEGATION_WORDS = {"avoid", "don", "dont", "except", "no", "non", "not", "without"}
+
+# Names made of these words alone describe the city, not a place
+GENERIC_NAME_WORDS = {"jersey", "city", "jc", "new", "nj", "n", "various", "locations", "downtown"}
+
+
+def _content_words(normalized: str):
+    return [word for word in normalized.split() if word not in STOPWORDS]
+
+
+class ExpansionRouter:
+    """
+    Decides whether a query should be expanded, from its length and its overlap with the
+    recommendation names and tag vocabulary.
+    """
+
+    def __init__(self, names: Iterable[str] = (), tags: Iterable[str] = (), neighborhoods: Iterable[str] = ()):
+        self.names: Set[str] = set()
+        for name in names:
+            normalized = normalize_query(name or "")
+            words = normalized.split()
+            if words and len(words) <= MAX_NAME_WORDS and not set(words) <= GENERIC_NAME_WORDS | STOPWORDS:
+                self.names.add(normalized)
+        self.vocabulary: Set[str] = set()
+        for term in list(tags) + list(neighborhoods):
+            self.vocabulary.update(normalize_query(term or "").split())
+        self.vocabulary -= STOPWORDS
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "ExpansionRouter":
+        """Builds the vocabulary from recommendation dicts (name, tags, neighborhood), e.g. the JSONL export."""
+        names, tags, neighborhoods = [], [], []
+        for record in records:
+            names.append(record.get("name"))
+            tags.extend(record.get("tags") or [])
+            neighborhoods.append(record.get("neighborhood"))
+        return cls(names, tags, neighborhoods)
+
+    @classmethod
+    def from_db(cls, conn) -> "ExpansionRouter":
+        """Loads recommendation names, tags and neighborhoods. Falls back to length heuristics on a database error."""
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT name FROM recommendations;")
+                names = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT tag FROM tags;")
+                tags = [row[0] for row in cur.fetchall()]
+                cur.execute("SELECT name FROM neighborhoods;")
+                neighborhoods = [row[0] for row in cur.fetchall()]
+        except psycopg2.Error as e:
+            logging.error(f"Could not load the expansion router vocabulary: {e}")
+            conn.rollback()
+            return cls()
+        logging.info(f"Expansion router loaded {len(names)} names, {len(tags)} tags and {len(neighborhoods)} neighborhoods.")
+        return cls(names, tags, neighborhoods)
+
+    def _matched_name(self, words) -> Optional[str]:
+        for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                phrase = " ".join(words[i:i + size])
+                if phrase in self.names:
+                    return phrase
+        return None
+
+    def classify(self, query: str) -> Tuple[bool, str]:
+        """
+        Returns (needs_expansion, reason).
+
+        Reasons: "empty", "negation", "open-ended", "entity", "keywords", "long" or "unknown words".
+        """
+        words = normalize_query(query).split()
+        if not words:
+            return False, "empty"
+        if NEGATION_WORDS & set(words):
+            return True, "negation"
+        if OPEN_ENDED_WORDS & set(words):
+            return True, "open-ended"
+        name = self._matched_name(words)
+        if name:
+            return False, f"entity '{name}'"
+        content = _content_words(" ".join(words))
+        if len(content) > MAX_SIMPLE_WORDS:
+            return True, "long"
+        if content and all(word in self.vocabulary for word in content):
+            return False, "keywords"
+        return True, "unknown words"
+
+    def needs_expansion(self, query: str) -> bool:
+        return self.classify(query)[0]
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Local Reranker
+
+Reranks and filters retrieved candidates without a model call. Each candidate is
+scored by its vector similarity plus the share of the query's keywords found in its
+name, summary, quote and tags, and candidates matching a negated part of the query
+("I don't want to eat", "coffee but not a restaurant") are dropped:
+
+    - the words after a negation cue (no, not, without, avoid, don't want, ...) are
+      matched literally, and through a small lexicon of related words, so "eat" also
+      matches "restaurant" and "pizza"
+    - a negated phrase that is neither in the lexicon nor found in any candidate can't
+      be judged locally, so the result is marked uncertain and the pipeline asks the
+      LLM filter instead
+
+An optional cross-encoder (sentence-transformers, on CPU) can be mixed into the score
+by setting RERANKER_CROSS_ENCODER to a model name.
+"""
+
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import psycopg2
+
+from query_router import STOPWORDS
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:
+    CrossEncoder = None
+
+# Weight of the keyword overlap (0-1) added to the cosine similarity
+KEYWORD_WEIGHT = 0.1
+# Share of the final score taken by the cross-encoder when one is loaded
+CROSS_ENCODER_WEIGHT = 0.5
+CROSS_ENCODER_MODEL = os.getenv("RERANKER_CROSS_ENCODER", "")
+
+NEGATION_CUES = {"no", "not", "without", "avoid", "except", "nothing", "never", "non", "skip"}
+# Contractions normalize to two words ("don't" -> "don t")
+NEGATION_CONTRACTIONS = {"don", "doesn", "isn", "aren", "won", "can", "shouldn"}
+# Words between a cue and the negated thing ("don't want to eat", "not too touristy")
+NEGATION_FILLERS = {
+    "t", "want", "wanna", "like", "need", "to", "a", "an", "any", "the", "too", "really", "very",
+    "be", "that", "is", "are", "it", "s", "go", "do", "have", "feel", "looking", "for", "more",
+}
+# Words that end a negated phrase
+CLAUSE_BREAKS = {"but", "and", "or", "with", "just", "please", "only", "instead", "so", "i", "we"}
+MAX_NEGATED_WORDS = 3
+
+# Related words for the things queries most often rule out. A negated word from one of
+# these groups matches any candidate mentioning a word from the same group.
+LEXICON = {
+    "food": {
+        "food", "eat", "eating", "meal", "dinner", "lunch", "breakfast", "brunch", "restaurant",
+        "dining", "bakery", "pizza", "sandwich", "burger", "hotdog", "taco", "dessert",
+        "pastry", "pastries", "snack", "gastropub", "cuisine", "bbq", "barbecue", "eats",
+    },
+    "alcohol": {
+        "alcohol", "alcoholic", "drinking", "drunk", "booze", "bar", "beer", "wine", "cocktail",
+        "brewery", "byob", "pub", "liquor", "tavern",
+    },
+    "coffee": {"coffee", "cafe", "espresso", "latte", "cortado", "coffeeshop", "caffeine"},
+    "nightlife": {"nightlife", "club", "party", "clubbing", "dj"},
+    "luxury": {"luxury", "luxurious", "upscale", "elegant", "expensive", "pricey", "fancy"},
+    "crowds": {"crowd", "crowded", "busy", "packed", "festival", "fair"},
+    "music": {"music", "loud", "concert", "band", "dj"},
+    "outdoors": {"outdoor", "outdoors", "outside", "park", "beach", "waterfront", "walkway", "hike"},
+    "housing": {"apartment", "rental", "rent", "condo", "housing", "leasing", "studio"},
+    "fitness": {"fitness", "gym", "workout", "yoga", "pilates", "exercise", "training"},
+}
+_LEXICON_GROUPS: Dict[str, Set[str]] = {}
+for _group in LEXICON.values():
+    for _word in _group:
+        _LEXICON_GROUPS.setdefault(_word, set()).update(_group)
+
+
+def _stem(word: str) -> str:
+    """Strips a plural 's' so 'drinks' matches 'drink' and 'restaurants' matches 'restaurant'."""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _words(text: str) -> List[str]:
+    return re.sub(r"[^\w\s]", " ", (text or "").lower()).split()
+
+
+@dataclass
+class NegatedTerm:
+    phrase: str
+    # Stemmed words that count as a match: the phrase's own words plus their lexicon groups
+    related: Set[str] = field(default_factory=set)
+    in_lexicon: bool = False
+
+
+@dataclass
+class RerankResult:
+    candidates: list
+    dropped: list
+    # Why the local decision should be checked by the LLM filter (empty when confident)
+    uncertain: List[str]
+    scores: List[float]
+
+
+def parse_query(query: str) -> Tuple[List[str], List[NegatedTerm], bool]:
+    """
+    Splits a query into positive keywords and negated terms.
+
+    Returns:
+        tuple: (keywords, negated_terms, has_unparsed_negation). The last is True when a
+               negation cue was found but nothing after it could be read.
+    """
+    keywords: List[str] = []
+    negated: List[NegatedTerm] = []
+    unparsed = False
+    for clause in re.split(r"[,.;!?()]", query.lower()):
+        words = _words(clause)
+        i = 0
+        while i < len(words):
+            word = words[i]
+            is_cue = word in NEGATION_CUES or (word in NEGATION_CONTRACTIONS and i + 1 < len(words) and words[i + 1] == "t")
+            if not is_cue:
+                if word not in STOPWORDS:
+                    keywords.append(_stem(word))
+                i += 1
+                continue
+            i += 1
+            while i < len(words) and words[i] in NEGATION_FILLERS:
+                i += 1
+            phrase = []
+            while i < len(words) and len(phrase) < MAX_NEGATED_WORDS and words[i] not in CLAUSE_BREAKS:
+                if words[i] not in STOPWORDS:
+                    phrase.append(words[i])
+                i += 1
+            if not phrase:
+                unparsed = True
+                continue
+            term = NegatedTerm(" ".join(phrase))
+            for word in phrase:
+                term.related.add(_stem(word))
+                group = _LEXICON_GROUPS.get(word) or _LEXICON_GROUPS.get(_stem(word))
+                if group:
+                    term.in_lexicon = True
+                    term.related.update(_stem(related) for related in group)
+            negated.append(term)
+    return keywords, negated, unparsed
+
+
+def candidate_text(candidate: Sequence, tags: Iterable[str] = ()) -> str:
+    """The searchable text of a candidate row: name, summary, quote and tags."""
+    name, _, _, summary, quote, _, _ = candidate
+    return " ".join([name or "", summary or "", quote or "", " ".join(tags)]).lower()
+
+
+def fetch_candidate_tags(conn, source_urls: List[str]) -> Dict[str, List[str]]:
+    """Loads the tags of the given recommendations in one query, keyed by source URL."""
+    if conn is None or not source_urls:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT r.source_url, array_agg(t.tag)
+                FROM recommendations r
+                JOIN recommendation_tags rt ON rt.recommendation_id = r.id
+                JOIN tags t ON t.id = rt.tag_id
+                WHERE r.source_url = ANY(%s)
+                GROUP BY r.source_url;
+                """,
+                (list(source_urls),)
+            )
+            return {url: tags for url, tags in cur.fetchall()}
+    except psycopg2.Error as e:
+        logging.error(f"Could not load candidate tags: {e}")
+        conn.rollback()
+        return {}
+
+
+class LocalReranker:
+    """
+    Scores candidates by similarity and keyword overlap (and optionally a cross-encoder)
+    and drops those matching a negated part of the query.
+    """
+
+    def __init__(self, cross_encoder_model: Optional[str] = CROSS_ENCODER_MODEL,
+                 keyword_weight: float = KEYWORD_WEIGHT):
+        self.keyword_weight = keyword_weight
+        self.cross_encoder = None
+        if cross_encoder_model:
+            if CrossEncoder is None:
+                logging.warning("sentence-transformers is not installed; reranking without a cross-encoder.")
+            else:
+                self.cross_encoder = CrossEncoder(cross_encoder_model, device="cpu")
+
+    def _cross_encoder_scores(self, query: str, texts: List[str]) -> List[float]:
+        raw = self.cross_encoder.predict([(query, text) for text in texts])
+        return [1 / (1 + math.exp(-float(score))) for score in raw]
+
+    def rerank(self, query: str, candidates: list, tags: Optional[Dict[str, List[str]]] = None) -> RerankResult:
+        """
+        Reranks candidate rows for a query.
+
+        Args:
+            tags (dict): Tags per source URL, from fetch_candidate_tags().
+        """
+        tags = tags or {}
+        keywords, negated, unparsed = parse_query(query)
+        texts = [candidate_text(candidate, tags.get(candidate[5], ())) for candidate in candidates]
+        word_sets = [{_stem(word) for word in _words(text)} for text in texts]
+
+        uncertain = []
+        if unparsed:
+            uncertain.append("negation without a readable object")
+        violations = set()
+        for term in negated:
+            literal = [i for i, text in enumerate(texts) if re.search(rf"\b{re.escape(term.phrase)}", text)]
+            matched = [i for i, words in enumerate(word_sets) if term.related & words] if term.in_lexicon else literal
+            if not term.in_lexicon and not literal:
+                uncertain.append(f"can't judge '{term.phrase}' locally")
+            violations.update(matched)
+
+        scores = []
+        ce_scores = self._cross_encoder_scores(query, texts) if self.cross_encoder and texts else None
+        for i, candidate in enumerate(candidates):
+            overlap = sum(1 for word in keywords if word in word_sets[i]) / len(keywords) if keywords else 0.0
+            score = float(candidate[6] or 0) + self.keyword_weight * overlap
+            if ce_scores is not None:
+                score = CROSS_ENCODER_WEIGHT * ce_scores[i] + (1 - CROSS_ENCODER_WEIGHT) * score
+            scores.append(score)
+
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        kept = [i for i in order if i not in violations]
+        return RerankResult(
+            candidates=[candidates[i] for i in kept],
+            dropped=[candidates[i] for i in order if i in violations],
+            uncertain=uncertain,
+            scores=[scores[i] for i in kept],
+        )
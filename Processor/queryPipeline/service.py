@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Recommendation Service
+
+HTTP front end for the recommendation pipeline. GET or POST /recommend streams the
+answer as Server-Sent Events:
+
+    event: sources   the candidate list, sent as soon as retrieval finishes
+    event: token     {"text": ...} for each chunk of the synthesized answer
+    event: done      {"ttft_seconds": ..., "total_seconds": ...}
+    event: error     {"error": ...}, sent instead of the remaining events if the
+                     pipeline fails after the stream has started
+
+Pass stream=false (query parameter or JSON field) to get a single JSON response instead,
+and synthesis=combined to filter and write the answer in one model call.
+"""
+
+import os
+import json
+import time
+import logging
+from flask import Flask, Response, request, jsonify, stream_with_context
+
+from main import (
+    get_db_connection,
+    answer_query,
+    format_sources,
+    TimedStream,
+    expansion_cache,
+)
+
+app = Flask(__name__)
+
+def sse_event(event, data):
+    """Formats one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _request_params():
+    body = request.get_json(silent=True) or {}
+    query = body.get("query") or request.args.get("query", "")
+    stream = str(body.get("stream", request.args.get("stream", "true"))).lower() not in ("0", "false", "no")
+    synthesis = body.get("synthesis") or request.args.get("synthesis")
+    return query.strip(), stream, synthesis
+
+@app.route("/recommend", methods=['GET', 'POST'])
+def recommend():
+    query, stream, synthesis = _request_params()
+    if not query:
+        return jsonify({"error": "Missing 'query'"}), 400
+
+    start = time.perf_counter()
+    conn = get_db_connection()
+    if not conn:
+        return jsonify({"error": "Could not connect to the database"}), 503
+
+    if not stream:
+        try:
+            candidates, answer = answer_query(conn, query, synthesis=synthesis)
+        finally:
+            conn.close()
+        return jsonify({
+            "query": query,
+            "sources": format_sources(candidates),
+            "answer": answer,
+            "total_seconds": time.perf_counter() - start,
+        })
+
+    def events():
+        # The 200 status has already been sent, so failures are reported as an event
+        try:
+            try:
+                candidates, chunks = answer_query(conn, query, synthesis=synthesis, stream=True)
+            finally:
+                conn.close()
+            yield sse_event("sources", format_sources(candidates))
+
+            answer = TimedStream(chunks, start)
+            for chunk in answer:
+                yield sse_event("token", {"text": chunk})
+            logging.info(f"Answered '{query}': {answer.stats()}")
+            yield sse_event("done", answer.stats())
+        except Exception as e:
+            logging.exception(f"Failed to answer '{query}'")
+            yield sse_event("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        # Disable proxy buffering so each event reaches the client immediately
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route("/cache/stats", methods=['GET'])
+def cache_stats():
+    """Hit rate, saved latency and size of the query expansion cache"""
+    if not expansion_cache:
+        return jsonify({"error": "Expansion cache is disabled (EXPANSION_CACHE_DB is empty)"}), 404
+    return jsonify(expansion_cache.stats())
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5001))
+    app.run(host="0.0.0.0", port=port, threaded=True)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Structured Answer Parsing
+
+The combined filter-and-synthesize call returns one JSON object:
+
+    {"accepted_indices": [0, 2], "answer": "For pizza, head to ..."}
+
+Gemini writes structured output properties in alphabetical order, so the accepted
+indices always arrive before the answer. StructuredAnswerStream parses the object
+incrementally while it streams in: the indices are available as soon as their array
+is closed, and the answer string is decoded chunk by chunk so it can be shown while
+the model is still writing it.
+"""
+
+import json
+import re
+from typing import List, Optional
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "accepted_indices": {"type": "array", "items": {"type": "integer"}},
+        "answer": {"type": "string"},
+    },
+    "required": ["accepted_indices", "answer"],
+}
+
+_INDICES = re.compile(r'"accepted_indices"\s*:\s*(\[[^\]]*\])')
+_ANSWER_START = re.compile(r'"answer"\s*:\s*"')
+_HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}')
+
+
+class StructuredAnswerStream:
+    """
+    Incrementally parses a streamed {"accepted_indices": [...], "answer": "..."} object.
+
+    feed() takes each chunk of raw model text and returns the answer text decoded from
+    it (possibly empty). `indices` is set once the accepted indices have been read.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.indices: Optional[List[int]] = None
+        self.answer_complete = False
+        self._pos: Optional[int] = None
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        if self.indices is None:
+            match = _INDICES.search(self.buffer)
+            if match:
+                self.indices = [int(i) for i in json.loads(match.group(1))]
+        if self._pos is None:
+            match = _ANSWER_START.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+        return self._decode()
+
+    def _decode(self) -> str:
+        decoded = []
+        buffer, pos = self.buffer, self._pos
+        while pos < len(buffer) and not self.answer_complete:
+            char = buffer[pos]
+            if char == '"':
+                self.answer_complete = True
+                pos += 1
+            elif char == '\\':
+                # Wait for the whole escape: \n, \uXXXX, or a \uXXXX\uXXXX surrogate pair
+                if pos + 1 >= len(buffer):
+                    break
+                length = 6 if buffer[pos + 1] == 'u' else 2
+                if length == 6 and _HIGH_SURROGATE.match(buffer, pos):
+                    length = 12
+                if pos + length > len(buffer):
+                    break
+                decoded.append(json.loads(f'"{buffer[pos:pos + length]}"'))
+                pos += length
+            else:
+                end = pos
+                while end < len(buffer) and buffer[end] not in '"\\':
+                    end += 1
+                decoded.append(buffer[pos:end])
+                pos = end
+        self._pos = pos
+        return "".join(decoded)
+
+    def finish(self) -> dict:
+        """Parses the complete response, e.g. to recover the indices when they came after the answer."""
+        result = json.loads(self.buffer)
+        if self.indices is None:
+            self.indices = [int(i) for i in result.get("accepted_indices", [])]
+        return result
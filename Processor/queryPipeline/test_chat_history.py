@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script for chat history compaction
+
+Simulates long chat sessions against a fake model and checks that the history stays
+within its token budget, that older turns are summarized every few turns (in the
+background), that synthesis prompts stop growing, and that only follow-up messages
+are rewritten before retrieval.
+"""
+
+import os
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+import chat
+from chat_history import ChatHistory, Turn, estimate_tokens, is_follow_up, shorten_turns
+from RateLimiter import configure_limiter, GEMINI_GENERATE
+
+configure_limiter(GEMINI_GENERATE, 1000, 1000)
+
+TURNS = 30
+CANDIDATES = [
+    ("Razza", "275 Grove St", "Downtown", "Wood-fired pizza", "the best pie in the state", "https://tiktok.com/v/1", 0.91),
+]
+
+
+def answer(i):
+    return f"Try place number {i}, it has great food. " + "It is popular with locals and worth the wait. " * 8
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    prompts = []
+
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt, stream=False):
+        FakeModel.prompts.append(prompt)
+        if "standalone search query" in prompt:
+            return FakeResponse('"cheap pizza in Journal Square"\n')
+        if "maintaining a summary" in prompt:
+            return FakeResponse("The user is looking for food in Journal Square and likes pizza.")
+        return FakeResponse("Razza is a great pick.")
+
+
+def test_estimates_and_follow_ups():
+    assert estimate_tokens("") == 0 and estimate_tokens("abcd") == 1 and estimate_tokens("abcde") == 2
+    turn = Turn("pizza?", "Razza.")
+    assert turn.tokens == estimate_tokens(turn.format())
+    follow_ups = ["what about brunch?", "anything cheaper there?", "and for dinner", "is it open late?"]
+    standalone = ["cheap pizza in Journal Square", "best coffee downtown", "where can I get ramen?"]
+    assert all(is_follow_up(query) for query in follow_ups)
+    assert not any(is_follow_up(query) for query in standalone)
+    print("✅ Turns carry token estimates, and follow-up messages are recognized")
+
+
+def test_history_stays_within_budget():
+    calls = []
+
+    def summarize(summary, turns):
+        calls.append((summary, len(turns)))
+        return f"Summary of {len(calls)} batches."
+
+    history = ChatHistory(summarize=summarize, max_tokens=600, recent_turns=2, background=False)
+    sizes = []
+    for i in range(TURNS):
+        history.add(f"question {i}", answer(i))
+        sizes.append(history.tokens)
+    turn_tokens = Turn("question 0", answer(0)).tokens
+    assert max(sizes) <= 600 + turn_tokens, sizes
+    assert len(history) == TURNS and history.summarized_turns + len(history.turns) == TURNS
+    # Several turns are folded at a time, and each summary builds on the previous one
+    assert 0 < history.summarizations < TURNS // 2, history.summarizations
+    assert calls[1][0] == "Summary of 1 batches."
+    assert history.format().startswith("Summary of the earlier conversation:")
+    assert history.turns[-1].user == f"question {TURNS - 1}"
+    print(f"✅ {TURNS} turns stay under ~{max(sizes)} tokens with {history.summarizations} summarizations")
+
+
+def test_summary_fallback():
+    def failing(summary, turns):
+        raise RuntimeError("model unavailable")
+
+    history = ChatHistory(summarize=failing, max_tokens=300, recent_turns=1, background=False)
+    for i in range(5):
+        history.add(f"question {i}", answer(i))
+    assert "User asked: question 0 AI: Try place number 0, it has great food." in history.summary
+    assert estimate_tokens(shorten_turns("x" * 10000, [], max_tokens=50)) <= 51
+    print("✅ Without a working summarizer, older turns are shortened to their first sentences")
+
+
+def test_background_summarization():
+    def slow_summarize(summary, turns):
+        time.sleep(0.2)
+        return "slow summary"
+
+    history = ChatHistory(summarize=slow_summarize, max_tokens=300, recent_turns=1)
+    try:
+        for i in range(2):
+            history.add(f"question {i}", answer(i))
+        start = time.perf_counter()
+        history.add("question 2", answer(2))
+        assert time.perf_counter() - start < 0.1
+        assert history.format().startswith("Summary of the earlier conversation:\nslow summary")
+    finally:
+        history.close()
+    print("✅ Summarization runs in the background and the next prompt waits for it")
+
+
+def test_chat_prompts_stay_flat():
+    originals = chat.genai.GenerativeModel
+    chat.genai.GenerativeModel = FakeModel
+    FakeModel.prompts = []
+    history = ChatHistory(summarize=chat.summarize_history, max_tokens=600, background=False)
+    calls_before = main.llm_calls
+    try:
+        prompt_tokens = []
+        for i in range(TURNS):
+            before = len(FakeModel.prompts)
+            chat.synthesize_chat_answer(f"question {i}", history, CANDIDATES)
+            prompt_tokens.append(estimate_tokens(FakeModel.prompts[before]))
+            history.add(f"question {i}", answer(i))
+    finally:
+        chat.genai.GenerativeModel = originals
+    # Synthesis and summaries all go through the rate-limited, counted generate()
+    assert main.llm_calls - calls_before == len(FakeModel.prompts)
+    # Once the budget is reached, later prompts are no bigger than mid-session ones
+    assert max(prompt_tokens[TURNS // 2:]) <= max(prompt_tokens[:TURNS // 2]) + 50, prompt_tokens
+    assert prompt_tokens[-1] < 600 + 2 * estimate_tokens(answer(0)) + 400, prompt_tokens
+    print(f"✅ Synthesis prompts stay flat: ~{prompt_tokens[5]} tokens at turn 5, ~{prompt_tokens[-1]} at turn {TURNS}")
+
+
+def test_rewrite_query():
+    originals = chat.genai.GenerativeModel
+    chat.genai.GenerativeModel = FakeModel
+    history = ChatHistory(background=False)
+    try:
+        calls_before = main.llm_calls
+        # No history, or a standalone message: no model call
+        assert chat.rewrite_query("anything cheaper there?", history) == "anything cheaper there?"
+        history.add("pizza in Journal Square", "Try Razza.")
+        assert chat.rewrite_query("best coffee downtown", history) == "best coffee downtown"
+        assert main.llm_calls == calls_before
+        assert chat.rewrite_query("anything cheaper there?", history) == "cheap pizza in Journal Square"
+        assert main.llm_calls == calls_before + 1
+        assert "User: pizza in Journal Square" in FakeModel.prompts[-1]
+    finally:
+        chat.genai.GenerativeModel = originals
+    print("✅ Follow-ups are rewritten into standalone queries; other messages skip the model")
+
+
+if __name__ == "__main__":
+    test_estimates_and_follow_ups()
+    test_history_stays_within_budget()
+    test_summary_fallback()
+    test_background_summarization()
+    test_chat_prompts_stay_flat()
+    test_rewrite_query()
+    print("\n🎉 All chat history tests passed")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test script for the combined filter-and-synthesize mode
+
+Checks the incremental structured answer parser, then runs the whole pipeline in the
+separate (expand, filter, synthesize) and combined (expand, filter-and-synthesize)
+modes against a fake model with a fixed latency per call, comparing LLM stages and
+latency.
+"""
+
+import os
+import sys
+import re
+import json
+import time
+from contextlib import nullcontext
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from structured_answer import StructuredAnswerStream
+from RateLimiter import configure_limiter, GEMINI_GENERATE
+
+configure_limiter(GEMINI_GENERATE, 1000, 1000)
+
+CALL_LATENCY = 0.1
+CANDIDATES = [
+    ("Razza", "275 Grove St", "Downtown", "Wood-fired pizza", "the best pie in the state", "https://tiktok.com/v/1", 0.91),
+    ("Cherry's JC", "", "Downtown", "A bar with drinks and good music", "great cocktails", "https://tiktok.com/v/2", 0.85),
+    ("Grundy Park Salsa", "", "Downtown", "A weekly dance social in the park", "free salsa night", "https://tiktok.com/v/3", 0.80),
+]
+ANSWER = 'Try Razza for "the best pie in the state" — then dance at Grundy Park \U0001F483.'
+
+
+def split(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_parser_streams_answer():
+    raw = json.dumps({"accepted_indices": [0, 2], "answer": ANSWER})
+    parser = StructuredAnswerStream()
+    decoded = []
+    indices_at = None
+    for i, piece in enumerate(split(raw, 3)):
+        decoded.append(parser.feed(piece))
+        if parser.indices is not None and indices_at is None:
+            indices_at = i
+    assert parser.indices == [0, 2] and parser.answer_complete
+    assert "".join(decoded) == ANSWER
+    # The indices are known before any answer text has been decoded
+    assert "".join(decoded[:indices_at + 1]) == ""
+    print(f"✅ Parsed indices after {indices_at + 1} chunks and decoded escapes split across chunks")
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, name):
+        pass
+
+    def generate_content(self, prompt, stream=False, generation_config=None):
+        time.sleep(CALL_LATENCY)
+        if "Expanded Queries (JSON)" in prompt:
+            text = '["wood fired pizza"]'
+        elif "accepted_indices" in prompt:
+            assert generation_config["response_mime_type"] == "application/json"
+            text = json.dumps({"accepted_indices": self._not_bars(prompt), "answer": ANSWER})
+        elif "valid_indices" in prompt:
+            text = json.dumps({"valid_indices": self._not_bars(prompt)})
+        else:
+            text = ANSWER
+        if not stream:
+            return FakeChunk(text)
+        return (FakeChunk(piece) for piece in split(text))
+
+    @staticmethod
+    def _not_bars(prompt):
+        """Indices of the candidates in the prompt that aren't bars"""
+        blocks = re.split(r"Candidate (\d+):", prompt)[1:]
+        return [int(index) for index, block in zip(blocks[::2], blocks[1::2]) if " bar " not in block]
+
+
+def run(synthesis, stream):
+    originals = main.search_query, main.fetch_candidate_tags, main.pooled_connection
+    main.search_query = lambda conn, query, top_k=3, backend=None, filters=None: list(CANDIDATES)
+    main.fetch_candidate_tags = lambda conn, urls: {}
+    main.pooled_connection = lambda: nullcontext(None)
+    try:
+        calls_before = main.llm_calls
+        start = time.perf_counter()
+        candidates, answer = main.answer_query(None, "pizza and somewhere to go after, no bars",
+                                               synthesis=synthesis, stream=stream, expand="always",
+                                               filter_mode="llm", prefilter=False)
+        timed = main.TimedStream(answer if stream else iter([answer]), start)
+        text = "".join(timed)
+        return candidates, text, main.llm_calls - calls_before, timed
+    finally:
+        main.search_query, main.fetch_candidate_tags, main.pooled_connection = originals
+
+
+def test_combined_mode_saves_a_stage():
+    main.genai.GenerativeModel = FakeModel
+    results = {}
+    for synthesis in ("separate", "combined"):
+        for stream in (False, True):
+            candidates, text, stages, timed = run(synthesis, stream)
+            assert text == ANSWER, (synthesis, stream, text)
+            # "no bars" is judged locally in combined mode, by the model in separate mode
+            assert [candidate[0] for candidate in candidates] == ["Razza", "Grundy Park Salsa"]
+            results[synthesis, stream] = (stages, timed.total)
+
+    assert results["separate", True][0] == 3 and results["combined", True][0] == 2
+    assert results["combined", True][1] < results["separate", True][1] - CALL_LATENCY * 0.5
+    for (synthesis, stream), (stages, total) in sorted(results.items()):
+        print(f"✅ {synthesis:<8} {'stream' if stream else 'batch':<6} {stages} LLM stages, {total:.2f}s")
+
+
+def test_combined_falls_back_on_error():
+    class BrokenModel(FakeModel):
+        def generate_content(self, prompt, stream=False, generation_config=None):
+            if generation_config:
+                raise RuntimeError("schema not supported")
+            return super().generate_content(prompt, stream=stream)
+
+    main.genai.GenerativeModel = BrokenModel
+    candidates, answer = main.filter_and_synthesize("no bars", CANDIDATES, stream=True)
+    assert [candidate[0] for candidate in candidates] == ["Razza", "Grundy Park Salsa"]
+    assert "".join(answer) == ANSWER
+    print("✅ A failed combined call falls back to separate filter and synthesis calls")
+
+
+if __name__ == "__main__":
+    test_parser_streams_answer()
+    test_combined_mode_saves_a_stage()
+    test_combined_falls_back_on_error()
+    print("\n🎉 All combined synthesis tests passed")
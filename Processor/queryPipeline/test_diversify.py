@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for candidate diversification
+
+Checks same-venue collapsing, that MMR trades a near-duplicate for a different place,
+that MMR does one matrix-vector product per pick (never a pairwise similarity matrix),
+and that retrieve_candidates collapses duplicate venues from different creators.
+benchmark_diversify.py reports the wall-clock time.
+
+The embedding loading test is skipped unless TEST_DATABASE_URL is set.
+"""
+
+import os
+from contextlib import nullcontext
+
+import numpy as np
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from diversify import (
+    collapse_duplicates, diversify, embedding_matrix, fetch_candidate_embeddings, mmr_select,
+    normalize_location, normalize_name, parse_vector,
+)
+from local_db import require_test_db, load_recommendations, run_tests
+from benchmark_diversify import make_pool
+
+POOL_SIZE = 300
+DIMENSIONS = 1536
+
+
+def row(name, location, url, similarity):
+    return (name, location, "Downtown", "", "", url, similarity)
+
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_normalize():
+    assert normalize_name("The Razza!") == normalize_name("razza") == "razza"
+    assert normalize_name("Jersey City") == normalize_name("N/A") == ""
+    assert normalize_location("275 Grove Street, Jersey City, NJ") == normalize_location("275 grove st.") == "275 grove st"
+    assert normalize_location("Jersey City (implied by caption)") == normalize_location("N/A") == ""
+    assert parse_vector("[0.5,1,-2]").tolist() == [0.5, 1.0, -2.0]
+    print("✅ Names and locations normalize across spellings")
+
+
+def test_collapse_duplicates():
+    candidates = [
+        row("Razza", "275 Grove Street, Jersey City, NJ", "a", 0.80),
+        row("Razza Pizza Artigianale", "275 Grove St", "b", 0.70),
+        row("razza", "275 Grove St.", "c", 0.85),
+        row("The Razza", "N/A", "d", 0.60),
+        # Same name at another address is another branch
+        row("Starbucks", "1 Newark Ave", "e", 0.75),
+        row("Starbucks", "30 Montgomery St", "f", 0.74),
+        # Rows without a usable name are never merged
+        row("N/A", "", "g", 0.50),
+        row("N/A", "", "h", 0.40),
+    ]
+    kept, collapsed = collapse_duplicates(candidates)
+    assert [candidate[5] for candidate in kept] == ["b", "c", "e", "f", "g", "h"]
+    assert sorted(candidate[5] for candidate in collapsed) == ["a", "d"]
+    print("✅ Same-venue rows collapse to the most similar one; branches and unnamed rows stay")
+
+
+def test_mmr_prefers_different_places():
+    # Three near-identical videos about one place outrank two different places
+    base = np.eye(4, dtype=np.float32)
+    matrix = np.stack([unit(base[0] + 0.05 * base[1]), unit(base[0] + 0.05 * base[2]), unit(base[0]),
+                       base[2], base[3]])
+    relevance = [0.90, 0.89, 0.88, 0.80, 0.78]
+    assert mmr_select(matrix, relevance, 3, lambda_=1.0) == [0, 1, 2]
+    assert mmr_select(matrix, relevance, 3, lambda_=0.7) == [0, 3, 4]
+    assert mmr_select(matrix, relevance, 10) == mmr_select(matrix, relevance, 5)
+    assert mmr_select(matrix, relevance, 0) == []
+
+    candidates = [row(f"Place {i}", "", f"url{i}", relevance[i]) for i in range(5)]
+    embeddings = {f"url{i}": matrix[i] for i in range(4)}
+    diverse, _ = diversify(candidates, embeddings, top_k=3)
+    # url4 has no embedding, so it counts as unlike everything else
+    assert [candidate[5] for candidate in diverse] == ["url0", "url3", "url4"]
+    assert embedding_matrix(candidates, {}).shape == (5, 0)
+    print("✅ MMR picks one of the near-duplicates and then different places")
+
+
+class CountingMatrix(np.ndarray):
+    """Records the shape of the right operand of every product with the candidate matrix"""
+
+    def __matmul__(self, other):
+        self.products.append(np.shape(other))
+        return np.asarray(self) @ np.asarray(other)
+
+
+def test_mmr_work():
+    candidates, embeddings = make_pool(POOL_SIZE, DIMENSIONS)
+    relevance = [candidate[6] for candidate in candidates]
+    for k in (1, 8, 32):
+        matrix = embedding_matrix(candidates, embeddings).view(CountingMatrix)
+        matrix.products = []
+        selected = mmr_select(matrix, relevance, k)
+        assert len(set(selected)) == k
+        # k products of the pool with one picked vector: O(k * n * d), not O(n^2 * d)
+        assert matrix.products == [(DIMENSIONS,)] * k, matrix.products
+    print(f"✅ MMR over {POOL_SIZE} candidates does one matrix-vector product per pick")
+
+
+def test_retrieve_collapses_venues():
+    # Four creators posted about the same bakery; expansions find it again
+    def search_query(conn, query, top_k=3, backend=None, filters=None):
+        return [
+            row("Bread & Salt", "435 Palisade Ave", f"https://tiktok.com/{query}/1", 0.90),
+            row("Bread and Salt", "435 Palisade Avenue, Jersey City", f"https://tiktok.com/{query}/2", 0.88),
+            row(f"Other place for {query}", "", f"https://tiktok.com/{query}/3", 0.70),
+        ]
+
+    originals = main.expand_query, main.search_query, main.select_candidates, main.pooled_connection
+    main.expand_query = lambda query: ["bakery heights", "bread jersey city"]
+    main.search_query = search_query
+    main.select_candidates = lambda conn, query, candidates, filter_mode=None: candidates
+    main.pooled_connection = lambda: nullcontext(None)
+    try:
+        candidates = main.retrieve_candidates(None, "bakery", expand="always", prefilter=False)
+    finally:
+        main.expand_query, main.search_query, main.select_candidates, main.pooled_connection = originals
+    names = [candidate[0] for candidate in candidates]
+    assert names.count("Bread & Salt") + names.count("Bread and Salt") == 1, names
+    assert len(candidates) == 4, names
+    print(f"✅ retrieve_candidates kept one of 6 rows for the same bakery: {names}")
+
+
+def test_fetch_candidate_embeddings():
+    conn = require_test_db()
+    try:
+        load_recommendations(conn)
+        with conn.cursor() as cur:
+            cur.execute("SELECT source_url FROM recommendations LIMIT 5;")
+            urls = [url for (url,) in cur.fetchall()]
+        embeddings = fetch_candidate_embeddings(conn, urls)
+        assert set(embeddings) == set(urls)
+        for vector in embeddings.values():
+            assert vector.shape == (DIMENSIONS,) and abs(np.linalg.norm(vector) - 1) < 1e-4
+    finally:
+        conn.close()
+    print("✅ Candidate embeddings load as unit-length vectors in one query")
+
+
+if __name__ == "__main__":
+    run_tests(test_normalize, test_collapse_duplicates, test_mmr_prefers_different_places, test_mmr_work,
+              test_retrieve_collapses_venues, test_fetch_candidate_embeddings)
+    print("\n🎉 All diversification tests passed")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test script for the query expansion cache
+
+Checks normalized exact hits, the embedding nearest-neighbour fallback, TTL expiry,
+LRU eviction and the saved-latency counters, then runs expand_query against a fake
+model and embedder to confirm repeated queries skip the expansion call.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from expansion_cache import ExpansionCache, normalize_query
+from RateLimiter import configure_limiter, GEMINI_GENERATE
+
+configure_limiter(GEMINI_GENERATE, 1000, 1000)
+
+PIZZA = [1.0, 0.0, 0.0]
+PIZZA_SLICE = [0.98, 0.12, 0.0]
+COCKTAILS = [0.0, 0.0, 1.0]
+
+
+def new_cache(**kwargs):
+    return ExpansionCache(os.path.join(tempfile.mkdtemp(), "expansion_cache.db"), **kwargs)
+
+
+def test_normalize_query():
+    assert normalize_query("  Cheap   PIZZA?! ") == "cheap pizza"
+    assert normalize_query("kid-friendly brunch") == "kid friendly brunch"
+    print("✅ Queries normalize to lowercase words")
+
+
+def test_exact_and_semantic_hits():
+    cache = new_cache(similarity_threshold=0.95)
+    cache.put("cheap pizza", ["cheap slice", "dollar pizza"], latency=1.5, embedding=PIZZA)
+
+    expansions, embedding = cache.lookup("Cheap pizza!")
+    assert expansions == ["cheap slice", "dollar pizza"] and embedding is None
+
+    # Embedded only after the exact lookup misses; close enough to reuse the pizza entry
+    embedded = []
+    expansions, embedding = cache.lookup("cheap pizza slice", embed=lambda q: embedded.append(q) or PIZZA_SLICE)
+    assert expansions == ["cheap slice", "dollar pizza"] and embedding == PIZZA_SLICE
+    assert embedded == ["cheap pizza slice"]
+
+    expansions, embedding = cache.lookup("cocktail bars", embed=lambda q: COCKTAILS)
+    assert expansions is None and embedding == COCKTAILS
+
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+    assert abs(stats["hit_rate"] - 2 / 3) < 1e-9
+    assert stats["saved_seconds"] == 3.0
+    print(f"✅ Exact and nearest-neighbour hits: {stats}")
+
+
+def test_ttl_and_lru():
+    cache = new_cache(ttl_seconds=0.2)
+    cache.put("cheap pizza", ["cheap slice"], latency=1.0, embedding=PIZZA)
+    time.sleep(0.3)
+    assert cache.lookup("cheap pizza", embed=lambda q: PIZZA)[0] is None
+
+    cache = new_cache(max_entries=2)
+    cache.put("cheap pizza", ["a"], latency=1.0)
+    cache.put("cocktail bars", ["b"], latency=1.0)
+    time.sleep(0.01)
+    # Touch the pizza entry so cocktails is least recently used
+    assert cache.lookup("cheap pizza")[0] == ["a"]
+    cache.put("quiet cafes", ["c"], latency=1.0)
+    assert cache.lookup("cocktail bars")[0] is None
+    assert cache.lookup("cheap pizza")[0] == ["a"]
+    assert cache.stats()["entries"] == 2 and cache.stats()["evictions"] == 1
+    print("✅ Expired entries miss and the least recently used entry is evicted")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    calls = 0
+
+    def __init__(self, name):
+        pass
+
+    def generate_content(self, prompt):
+        FakeModel.calls += 1
+        time.sleep(0.05)
+        return FakeResponse('```json\n["cheap slice", "dollar pizza"]\n```')
+
+
+def test_expand_query_uses_cache():
+    main.genai.GenerativeModel = FakeModel
+    main.get_embedding = lambda text, task_type="retrieval_query": PIZZA_SLICE if "slice" in text else PIZZA
+    main.expansion_cache = new_cache(similarity_threshold=0.95)
+    FakeModel.calls = 0
+
+    assert main.expand_query("cheap pizza") == ["cheap slice", "dollar pizza"]
+    start = time.perf_counter()
+    assert main.expand_query("CHEAP pizza") == ["cheap slice", "dollar pizza"]
+    assert main.expand_query("cheap pizza slice") == ["cheap slice", "dollar pizza"]
+    cached = time.perf_counter() - start
+    assert FakeModel.calls == 1
+
+    main.expand_query("cheap pizza", use_cache=False)
+    assert FakeModel.calls == 2
+
+    stats = main.expansion_cache.stats()
+    assert stats["exact_hits"] == 1 and stats["semantic_hits"] == 1
+    assert stats["saved_seconds"] >= 0.08
+    print(f"✅ expand_query called the model once for three queries; two cached lookups took "
+          f"{cached * 1000:.1f}ms and saved {stats['saved_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    test_normalize_query()
+    test_exact_and_semantic_hits()
+    test_ttl_and_lru()
+    test_expand_query_uses_cache()
+    print("\n🎉 All expansion cache tests passed")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the hybrid retrieval backend
+
+Loads the checked-in recommendations export into a local Postgres (see local_db.py)
+and compares the vector and hybrid backends on queries that name a place exactly.
+The embeddings stand in for a semantic embedding of the query's intent, so the exact
+name only helps through the full-text ranking.
+
+The database tests are skipped unless TEST_DATABASE_URL is set and reachable.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from hybrid_search import to_or_tsquery, hybrid_search
+from local_db import require_test_db, load_recommendations, hash_embedding, run_tests
+
+# (query text, text standing in for its semantic embedding, expected top result)
+EXACT_NAME_QUERIES = [
+    ("53 Hancock Ave", "modern apartment for rent with a deck and city view", "Apartment at 53 Hancock Ave"),
+    ("Maxwell Alley", "new restaurant with drinks in downtown jersey city", "Maxwell Alley"),
+    ("Bettie's", "authentic food restaurant in the heights", "Bettie's Restaurant"),
+]
+
+_conn = None
+
+
+def load_test_db():
+    """Connects and loads the export once; skips the test when no test database is configured."""
+    global _conn
+    if _conn is None:
+        _conn = require_test_db()
+        count = load_recommendations(_conn)
+        print(f"📦 Loaded {count} recommendations into the test database")
+    return _conn
+
+
+def rank_of(rows, name):
+    names = [row[0] for row in rows]
+    return names.index(name) + 1 if name in names else None
+
+
+def test_or_tsquery():
+    assert to_or_tsquery("Where's a good slice, near 53 Hancock Ave?") == "where | s | a | good | slice | near | 53 | hancock | ave"
+    assert to_or_tsquery("pizza & (beer) | !wine") == "pizza | beer | wine"
+    assert to_or_tsquery("") == ""
+    print("✅ Query text becomes an OR of its words, with tsquery operators removed")
+
+
+def test_hybrid_ranks_exact_names_first():
+    conn = load_test_db()
+
+    for query, intent, expected in EXACT_NAME_QUERIES:
+        embedding = hash_embedding(intent)
+        vector_rows = main.find_similar_recommendations(conn, embedding, top_k=10, query_text=query, backend="vector")
+        hybrid_rows = main.find_similar_recommendations(conn, embedding, top_k=10, query_text=query, backend="hybrid")
+        assert hybrid_rows[0][0] == expected, (query, [row[0] for row in hybrid_rows])
+        vector_rank = rank_of(vector_rows, expected)
+        # Rows keep the shape and cosine similarity of the vector backend
+        assert len(hybrid_rows[0]) == 7 and -1 <= hybrid_rows[0][6] <= 1
+        print(f"✅ '{query}': {expected} ranked 1 by hybrid, {vector_rank or '>10'} by vector")
+
+
+def test_hybrid_single_round_trip():
+    conn = load_test_db()
+
+    executed = []
+
+    class CountingCursor:
+        def __init__(self, cursor):
+            self._cursor = cursor
+
+        def execute(self, *args, **kwargs):
+            executed.append(args[0])
+            return self._cursor.execute(*args, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self._cursor, name)
+
+        def __enter__(self):
+            self._cursor.__enter__()
+            return self
+
+        def __exit__(self, *exc):
+            return self._cursor.__exit__(*exc)
+
+    class CountingConnection:
+        def cursor(self):
+            return CountingCursor(conn.cursor())
+
+    rows = hybrid_search(CountingConnection(), "Treehouse Coffee", hash_embedding("iced coffee cafe"), top_k=5)
+    assert len(executed) == 1 and rows[0][0] == "Treehouse Coffee"
+    print("✅ Vector search, full-text search and fusion ran in one statement")
+
+
+def test_hybrid_skips_rows_without_embeddings():
+    conn = load_test_db()
+    with conn.cursor() as cur:
+        cur.execute("UPDATE recommendations SET embedding = NULL WHERE name = 'Treehouse Coffee';")
+    try:
+        # The row still matches the text search, but has no similarity to report
+        rows = hybrid_search(conn, "Treehouse Coffee", hash_embedding("iced coffee cafe"), top_k=5)
+        assert rows and "Treehouse Coffee" not in [row[0] for row in rows]
+        assert all(row[6] is not None for row in rows)
+    finally:
+        conn.rollback()
+    print("✅ Rows without an embedding are left out of the full-text ranking")
+
+
+def test_hybrid_falls_back_without_index():
+    conn = load_test_db()
+    with conn.cursor() as cur:
+        cur.execute("ALTER TABLE recommendations DROP COLUMN search_vector;")
+    conn.commit()
+    try:
+        rows = main.find_similar_recommendations(conn, hash_embedding("coffee"), top_k=3, query_text="coffee", backend="hybrid")
+        assert rows and len(rows) == 3
+    finally:
+        from hybrid_search import ensure_search_index
+        ensure_search_index(conn)
+    print("✅ Without the search index the hybrid backend falls back to vector search")
+
+
+if __name__ == "__main__":
+    run_tests(test_or_tsquery, test_hybrid_ranks_exact_names_first, test_hybrid_single_round_trip,
+              test_hybrid_skips_rows_without_embeddings, test_hybrid_falls_back_without_index)
+    print("\n🎉 All hybrid search tests passed")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for speculative parallel retrieval
+
+Runs retrieve_candidates with fake expansion and search calls of known latency and
+checks that the original search overlaps the expansion call, that expanded searches
+run concurrently on pooled connections of their own, and that expansions or searches
+past the deadline are dropped.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+
+DELAY = 0.2
+
+
+def row(query):
+    return (query, "", "Downtown", "", "", f"https://tiktok.com/{query}", 0.9)
+
+
+class FakeConnection:
+    def __init__(self, name):
+        self.name = name
+        self.users = set()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakePipeline:
+    def __init__(self, expansions, expand_delay=DELAY, search_delays=None):
+        self.expansions = expansions
+        self.expand_delay = expand_delay
+        self.search_delays = search_delays or {}
+        self.searched = []
+        self.borrowed = []
+        self.in_use = set()
+        self.lock = threading.Lock()
+
+    def expand_query(self, query):
+        time.sleep(self.expand_delay)
+        return self.expansions
+
+    @contextmanager
+    def pooled_connection(self):
+        with self.lock:
+            conn = FakeConnection(f"pooled-{len(self.borrowed)}")
+            self.borrowed.append(conn)
+            self.in_use.add(conn)
+        try:
+            yield conn
+        finally:
+            with self.lock:
+                self.in_use.discard(conn)
+
+    def search_query(self, conn, query, top_k=3, backend=None, filters=None):
+        assert not conn.closed, f"'{query}' ran on a closed connection"
+        conn.users.add(threading.get_ident())
+        self.searched.append(query)
+        time.sleep(self.search_delays.get(query, DELAY))
+        assert not conn.closed, f"'{query}' ran on a closed connection"
+        return [row(query)]
+
+
+def run(fake, query="where should I get pizza?", deadline=None, conn=None):
+    originals = main.expand_query, main.search_query, main.select_candidates, main.pooled_connection
+    main.expand_query = fake.expand_query
+    main.search_query = fake.search_query
+    main.select_candidates = lambda conn, query, candidates, filter_mode=None: candidates
+    main.pooled_connection = fake.pooled_connection
+    try:
+        start = time.perf_counter()
+        candidates = main.retrieve_candidates(conn, query, expand="always", deadline=deadline, prefilter=False)
+        return [candidate[0] for candidate in candidates], time.perf_counter() - start
+    finally:
+        main.expand_query, main.search_query, main.select_candidates, main.pooled_connection = originals
+
+
+def test_expanded_searches_run_concurrently():
+    expansions = ["cheap slice", "dollar pizza", "late night pizza", "wood fired pizza"]
+    names, elapsed = run(FakePipeline(expansions))
+    # Original first, then every expansion; expansion + one round of searches, not 1 + 4 searches
+    assert names[0] == "where should I get pizza?"
+    assert sorted(names[1:]) == sorted(expansions)
+    assert elapsed < DELAY * 2.75, elapsed
+    print(f"✅ Expansion and {len(expansions) + 1} searches took {elapsed:.2f}s "
+          f"instead of {DELAY * (len(expansions) + 2):.1f}s sequentially")
+
+
+def test_late_searches_dropped():
+    fake = FakePipeline(["cheap slice", "dollar pizza"], search_delays={"dollar pizza": DELAY * 5})
+    names, elapsed = run(fake, deadline=DELAY * 2.5)
+    assert names == ["where should I get pizza?", "cheap slice"]
+    assert elapsed < DELAY * 3.5, elapsed
+    print(f"✅ A search past the deadline was dropped after {elapsed:.2f}s")
+
+
+def test_late_expansion_dropped():
+    fake = FakePipeline(["cheap slice"], expand_delay=DELAY * 5)
+    names, elapsed = run(fake, deadline=DELAY * 1.5)
+    assert names == ["where should I get pizza?"]
+    assert fake.searched == ["where should I get pizza?"]
+    assert elapsed < DELAY * 2.5, elapsed
+    print(f"✅ A late expansion fell back to the original query after {elapsed:.2f}s")
+
+
+def test_searches_use_their_own_connections():
+    fake = FakePipeline(["cheap slice", "dollar pizza"], search_delays={"dollar pizza": DELAY * 3})
+    caller_conn = FakeConnection("caller")
+    names, _ = run(fake, deadline=DELAY * 2.5, conn=caller_conn)
+    # The caller is done with its connection while the late search is still running
+    caller_conn.close()
+    assert names == ["where should I get pizza?", "cheap slice"]
+    assert len(fake.borrowed) == 3 and caller_conn not in fake.borrowed
+    assert all(len(conn.users) == 1 for conn in fake.borrowed)
+    time.sleep(DELAY * 3)
+    # The dropped search finished on its own connection and gave it back
+    assert "dollar pizza" in fake.searched and not fake.in_use
+    print("✅ Each search runs on its own pooled connection, and dropped searches outlive the caller's")
+
+
+if __name__ == "__main__":
+    test_expanded_searches_run_concurrently()
+    test_late_searches_dropped()
+    test_late_expansion_dropped()
+    test_searches_use_their_own_connections()
+    print("\n🎉 All parallel retrieval tests passed")
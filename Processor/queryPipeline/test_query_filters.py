@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for structured search filters
+
+Parses neighborhood, tag, hashtag and recency constraints from sample queries using
+the vocabulary of the checked-in recommendations export, checks the SQL they become
+and the relaxation of filters that find too little, then runs filtered searches
+against a local Postgres (see local_db.py).
+
+The database tests are skipped unless TEST_DATABASE_URL is set.
+"""
+
+import os
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from query_filters import FilterParser, SearchFilters, ensure_filter_indexes
+from local_db import require_test_db, load_recommendations, hash_embedding, run_tests
+from Discovery.jsonio import iter_jsonl
+
+RECOMMENDATIONS = os.path.join(main.root_dir, "jersey_city_recommendations.jsonl")
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+_conn = None
+
+
+def load_parser():
+    return FilterParser.from_records(iter_jsonl(RECOMMENDATIONS))
+
+
+def load_test_db():
+    """Connects and loads the export once, scraping food records under the JCEats hashtag."""
+    global _conn
+    if _conn is None:
+        _conn = require_test_db()
+        count = load_recommendations(
+            _conn, hashtag_for=lambda record: "JCEats" if "food" in (record.get("tags") or []) else "JerseyCity"
+        )
+        ensure_filter_indexes(_conn)
+        print(f"📦 Loaded {count} recommendations into the test database")
+    return _conn
+
+
+def test_parse():
+    parser = load_parser()
+    cases = [
+        ("brunch in Journal Square", SearchFilters(neighborhoods=["journal square"])),
+        ("coffee in the heights", SearchFilters(neighborhoods=["heights"], tags=["coffee"])),
+        ("bars in Bergen-Lafayette", SearchFilters(neighborhoods=["bergen lafayette"])),
+        ("#JCEats pizza", SearchFilters(hashtags=["JCEats"])),
+        ("new restaurants downtown this week",
+         SearchFilters(neighborhoods=["downtown"], since=NOW - timedelta(days=7))),
+        ("live music in the last 10 days", SearchFilters(tags=["music"], since=NOW - timedelta(days=10))),
+        # Names that only describe the city, and N/A values, are not neighborhoods
+        ("things to do in jersey city", SearchFilters()),
+    ]
+    for query, expected in cases:
+        filters = parser.parse(query, now=NOW)
+        # Tags depend on the export's vocabulary; only compare them where the case names some
+        if not expected.tags:
+            filters.tags = []
+        assert filters == expected, (query, filters)
+    assert "a" not in parser.neighborhoods and "n a" not in parser.neighborhoods
+    print(f"✅ Parsed filters from {len(cases)} queries")
+
+
+def test_where_sql_and_relaxations():
+    filters = SearchFilters(neighborhoods=["heights"], tags=["Coffee"], hashtags=["JCEats"], since=NOW)
+    sql, params = filters.where_sql("r")
+    assert sql.startswith(" AND ") and sql.count(" AND ") >= 4
+    assert "recommendation_tags" in sql and "recommendation_hashtags" in sql and "r.created_at" in sql
+    assert params == {
+        "filter_neighborhoods": ["%heights%"],
+        "filter_tags": ["coffee"],
+        "filter_hashtags": ["jceats"],
+        "filter_since": NOW,
+    }
+    assert SearchFilters().where_sql() == ("", {})
+    assert not SearchFilters()
+
+    steps = filters.relaxations()
+    assert [bool(step.tags) for step in steps] == [True, False, False, False]
+    assert [bool(step.neighborhoods) for step in steps] == [True, True, False, False]
+    assert steps[-1] == SearchFilters()
+    # No duplicate steps when there is nothing to drop
+    assert len(SearchFilters(neighborhoods=["heights"]).relaxations()) == 2
+    print("✅ Filters become named-parameter predicates and relax tags, then neighborhoods")
+
+
+def test_search_relaxes_narrow_filters():
+    filters = SearchFilters(neighborhoods=["heights"], tags=["coffee"])
+    seen = []
+
+    def fake_find(conn, embedding, top_k=3, query_text=None, backend=None, filters=None):
+        seen.append(filters)
+        # Only the neighborhood-only search finds enough rows
+        return [("Place", "", "The Heights", "", "", f"url{i}", 0.9) for i in range(top_k)] if filters and not filters.tags else []
+
+    originals = main.get_embedding, main.find_similar_recommendations
+    main.get_embedding = lambda text: [0.1]
+    main.find_similar_recommendations = fake_find
+    try:
+        rows = main.search_query(None, "coffee in the heights", top_k=3, filters=filters)
+    finally:
+        main.get_embedding, main.find_similar_recommendations = originals
+    assert len(rows) == 3 and seen == filters.relaxations()[:2]
+    print("✅ A search with too few filtered results is retried with looser filters")
+
+
+def test_filtered_search():
+    conn = load_test_db()
+    embedding = hash_embedding("good food and drinks")
+    for backend in ("vector", "hybrid"):
+        unfiltered = main.find_similar_recommendations(conn, embedding, top_k=50, query_text="food", backend=backend)
+        filters = SearchFilters(neighborhoods=["downtown"])
+        rows = main.find_similar_recommendations(conn, embedding, top_k=50, query_text="food", backend=backend,
+                                                 filters=filters)
+        assert rows and len(rows) < len(unfiltered), backend
+        assert all("downtown" in row[2].lower() for row in rows), (backend, [row[2] for row in rows])
+
+        rows = main.find_similar_recommendations(conn, embedding, top_k=50, query_text="food", backend=backend,
+                                                 filters=SearchFilters(hashtags=["JCEats"], tags=["food"]))
+        assert rows and len(rows) < len(unfiltered), backend
+
+        future = SearchFilters(since=datetime.now(timezone.utc) + timedelta(days=1))
+        assert main.find_similar_recommendations(conn, embedding, top_k=5, query_text="food", backend=backend,
+                                                 filters=future) == []
+    print("✅ Neighborhood, tag, hashtag and recency filters run inside both backends")
+
+
+if __name__ == "__main__":
+    run_tests(test_parse, test_where_sql_and_relaxations, test_search_relaxes_narrow_filters, test_filtered_search)
+    print("\n🎉 All search filter tests passed")
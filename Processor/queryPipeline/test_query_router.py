@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the expansion router
+
+Classifies sample queries against the vocabulary of the checked-in recommendations
+export, then runs retrieve_candidates with a slow fake expansion and search to check
+that specific queries skip expansion and that expansion overlaps the first search.
+"""
+
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from query_router import ExpansionRouter
+from Discovery.jsonio import iter_jsonl
+
+RECOMMENDATIONS = os.path.join(main.root_dir, "jersey_city_recommendations.jsonl")
+DELAY = 0.2
+
+
+def load_router():
+    return ExpansionRouter.from_records(iter_jsonl(RECOMMENDATIONS))
+
+
+def test_classify():
+    router = load_router()
+    skipped = ["Maman brunch", "Treehouse Coffee", "coffee", "sandwich downtown"]
+    expanded = [
+        "Where can I find a good, cheap slice of pizza in a quiet spot?",
+        "something fun to do this weekend",
+        "bars without loud music",
+        "razza",
+    ]
+    for query in skipped:
+        assert not router.needs_expansion(query), (query, router.classify(query))
+    for query in expanded:
+        assert router.needs_expansion(query), (query, router.classify(query))
+    # Names that only describe the city are not entities
+    assert "jersey city" not in router.names
+    print(f"✅ Router skips {skipped} and expands {len(expanded)} open-ended queries")
+
+
+def row(name):
+    return (name, "", "Downtown", "", "", f"https://tiktok.com/{name}", 0.9)
+
+
+class FakePipeline:
+    """Slow expansion and search, recording which queries were searched"""
+
+    def __init__(self):
+        self.searched = []
+        self.expanded = 0
+
+    def expand_query(self, query):
+        self.expanded += 1
+        time.sleep(DELAY)
+        return [query, "cheap slice", "dollar pizza"]
+
+    def search_query(self, conn, query, top_k=3, backend=None, filters=None):
+        self.searched.append(query)
+        time.sleep(DELAY)
+        return [row(query)]
+
+
+def run(query, expand="auto"):
+    fake = FakePipeline()
+    originals = main.expand_query, main.search_query, main.select_candidates, main.pooled_connection
+    main.expand_query = fake.expand_query
+    main.search_query = fake.search_query
+    main.select_candidates = lambda conn, query, candidates, filter_mode=None: candidates
+    main.pooled_connection = lambda: nullcontext(None)
+    try:
+        start = time.perf_counter()
+        candidates = main.retrieve_candidates(None, query, expand=expand, prefilter=False)
+        return fake, candidates, time.perf_counter() - start
+    finally:
+        main.expand_query, main.search_query, main.select_candidates, main.pooled_connection = originals
+
+
+def test_retrieve_skips_or_overlaps_expansion():
+    main.expansion_router = load_router()
+
+    fake, candidates, elapsed = run("Maman brunch")
+    assert fake.expanded == 0 and fake.searched == ["Maman brunch"]
+    assert elapsed < DELAY * 1.5
+
+    # The raw search runs during the expansion call, and the raw query is not searched twice
+    fake, candidates, elapsed = run("where should I get pizza?")
+    assert fake.expanded == 1
+    assert fake.searched == ["where should I get pizza?", "cheap slice", "dollar pizza"]
+    assert len(candidates) == 3
+    assert elapsed < DELAY * 3.5, elapsed
+
+    fake, _, _ = run("Maman brunch", expand="always")
+    assert fake.expanded == 1
+    fake, _, _ = run("where should I get pizza?", expand="never")
+    assert fake.expanded == 0
+    print(f"✅ Specific queries skip expansion; expanded retrieval took {elapsed:.2f}s "
+          f"instead of {DELAY * 4:.2f}s sequentially")
+
+
+if __name__ == "__main__":
+    test_classify()
+    test_retrieve_skips_or_overlaps_expansion()
+    print("\n🎉 All expansion router tests passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the local reranker
+
+Checks query parsing, reranking and filtering on the fixed evaluation set, and that
+select_candidates only calls the LLM filter when the local stage is uncertain.
+"""
+
+import os
+import sys
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+from reranker import LocalReranker, parse_query
+from benchmark_reranker import load_eval_cases, score_case
+
+
+def test_parse_query():
+    keywords, negated, unparsed = parse_query("I don't want to eat, something outdoors")
+    assert [term.phrase for term in negated] == ["eat"]
+    assert "restaurant" in negated[0].related and negated[0].in_lexicon
+    assert "outdoor" in keywords and not unparsed
+
+    _, negated, _ = parse_query("coffee but not a restaurant")
+    assert [term.phrase for term in negated] == ["restaurant"]
+    _, negated, _ = parse_query("dessert, not ice cream")
+    assert [term.phrase for term in negated] == ["ice cream"] and not negated[0].in_lexicon
+    _, negated, unparsed = parse_query("anything but not")
+    assert negated == [] and unparsed
+    print("✅ Negated phrases are read after negation cues and fillers")
+
+
+def test_eval_set():
+    cases, tags = load_eval_cases()
+    reranker = LocalReranker(cross_encoder_model="")
+    violations = caught = false_drops = 0
+    uncertain = []
+    for case in cases:
+        result = reranker.rerank(case["query"], case["rows"], tags)
+        case_caught, case_false_drops, rr = score_case(case, result.candidates)
+        violations += len(case["violations"])
+        caught += case_caught
+        false_drops += case_false_drops
+        assert rr == 1.0, (case["query"], [row[0] for row in result.candidates])
+        if result.uncertain:
+            uncertain.append(case["query"])
+    assert caught == violations
+    assert false_drops <= 1
+    # Only the query with a constraint outside the lexicon needs the LLM
+    assert uncertain == ["brunch spots, nothing too touristy"]
+    print(f"✅ Local reranker dropped {caught}/{violations} violations with {false_drops} false drop(s); "
+          f"{len(uncertain)} of {len(cases)} queries need the LLM")
+
+
+def test_select_candidates_falls_back_when_uncertain():
+    cases, tags = load_eval_cases()
+    rows = {case["query"]: case["rows"] for case in cases}
+    llm_calls = []
+
+    def fake_filter(query, candidates):
+        llm_calls.append(query)
+        return candidates[:1]
+
+    original_filter, original_fetch = main.filter_candidates, main.fetch_candidate_tags
+    main.filter_candidates = fake_filter
+    main.fetch_candidate_tags = lambda conn, urls: tags
+    try:
+        kept = main.select_candidates(None, "nightlife without alcohol", rows["nightlife without alcohol"])
+        assert [row[0] for row in kept] == ["Earlybirds Club", "Grundy Park Salsa/Merengue Dancing"]
+        assert llm_calls == []
+
+        query = "brunch spots, nothing too touristy"
+        assert len(main.select_candidates(None, query, rows[query])) == 1
+        assert llm_calls == [query]
+        assert len(main.select_candidates(None, query, rows[query], filter_mode="local")) == 3
+        main.select_candidates(None, "cheap pizza", rows["cheap pizza"], filter_mode="llm")
+        assert llm_calls == [query, "cheap pizza"]
+    finally:
+        main.filter_candidates, main.fetch_candidate_tags = original_filter, original_fetch
+    print("✅ The LLM filter runs only for uncertain queries or in llm mode")
+
+
+if __name__ == "__main__":
+    test_parse_query()
+    test_eval_set()
+    test_select_candidates_falls_back_when_uncertain()
+    print("\n🎉 All reranker tests passed")
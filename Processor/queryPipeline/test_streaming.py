@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed answer synthesis
+
+Replaces the Gemini model with a fake that produces its answer in delayed chunks, and
+checks the generator API, time-to-first-token reporting, the SSE service (including
+its error event) and that shared components are built once across threads.
+"""
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("EXPANSION_CACHE_DB", "")
+
+import main
+import service
+from RateLimiter import configure_limiter, GEMINI_GENERATE
+
+# Keep the shared Gemini rate limiter out of the latency measurements
+configure_limiter(GEMINI_GENERATE, 1000, 1000)
+
+CANDIDATES = [
+    ("Razza", "275 Grove St", "Downtown", "Wood-fired pizza", "the best pie in the state", "https://tiktok.com/v/1", 0.91),
+    ("Hamilton Inn", "708 Jersey Ave", "Hamilton Park", "Neighborhood bar", "burgers are huge", "https://tiktok.com/v/2", 0.83),
+]
+
+CHUNKS = ["For pizza, ", "head to Razza, ", "famous for 'the best pie in the state'."]
+CHUNK_DELAY = 0.05
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("No text parts")
+        return self._text
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt, stream=False):
+        if not stream:
+            time.sleep(CHUNK_DELAY * len(CHUNKS))
+            return FakeChunk("".join(CHUNKS))
+        return self._stream()
+
+    def _stream(self):
+        yield FakeChunk(None)
+        for text in CHUNKS:
+            time.sleep(CHUNK_DELAY)
+            yield FakeChunk(text)
+
+
+class FailingModel(FakeModel):
+    def _stream(self):
+        raise RuntimeError("quota exceeded")
+        yield
+
+
+def test_stream_yields_chunks():
+    main.genai.GenerativeModel = FakeModel
+    answer = main.TimedStream(main.synthesize_answer("cheap pizza", CANDIDATES, stream=True))
+    chunks = list(answer)
+    assert chunks == CHUNKS
+    assert main.synthesize_answer("cheap pizza", CANDIDATES) == "".join(CHUNKS)
+    # The first chunk arrives after one delay, the answer after all of them
+    assert CHUNK_DELAY * 0.8 <= answer.ttft < CHUNK_DELAY * 2
+    assert answer.total >= CHUNK_DELAY * len(CHUNKS) * 0.8
+    print(f"✅ Streamed {len(chunks)} chunks: first token {answer.ttft:.3f}s, total {answer.total:.3f}s")
+
+
+def test_stream_fallback():
+    main.genai.GenerativeModel = FailingModel
+    chunks = list(main.synthesize_answer("cheap pizza", CANDIDATES, stream=True))
+    assert chunks == ["I found some recommendations, but I had trouble summarizing them."]
+    print("✅ A failed stream yields the fallback answer")
+
+
+class FakeConnection:
+    def close(self):
+        pass
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_sse_service():
+    main.genai.GenerativeModel = FakeModel
+    service.get_db_connection = lambda: FakeConnection()
+    original_retrieve = main.retrieve_candidates
+    main.retrieve_candidates = lambda conn, query, **kwargs: CANDIDATES
+    try:
+        client = service.app.test_client()
+
+        response = client.get("/recommend?query=cheap+pizza")
+        assert response.mimetype == "text/event-stream"
+        events = parse_sse(response.get_data(as_text=True))
+        names = [name for name, _ in events]
+        assert names[0] == "sources" and names[-1] == "done"
+        assert set(names[1:-1]) == {"token"}
+        assert [source["name"] for source in events[0][1]] == ["Razza", "Hamilton Inn"]
+        assert "".join(data["text"] for name, data in events if name == "token") == "".join(CHUNKS)
+        done = events[-1][1]
+        assert 0 < done["ttft_seconds"] < done["total_seconds"]
+
+        response = client.post("/recommend", json={"query": "cheap pizza", "stream": False})
+        body = response.get_json()
+        assert body["answer"] == "".join(CHUNKS) and len(body["sources"]) == 2
+
+        assert client.get("/recommend").status_code == 400
+        print(f"✅ SSE sends sources first, {len(names) - 2} token events, then ttft {done['ttft_seconds']:.3f}s")
+    finally:
+        main.retrieve_candidates = original_retrieve
+
+
+def test_sse_error_event():
+    service.get_db_connection = lambda: FakeConnection()
+    original_retrieve = main.retrieve_candidates
+
+    def failing_retrieve(conn, query, **kwargs):
+        raise RuntimeError("database went away")
+
+    main.retrieve_candidates = failing_retrieve
+    try:
+        response = service.app.test_client().get("/recommend?query=cheap+pizza")
+        assert response.status_code == 200
+        assert parse_sse(response.get_data(as_text=True)) == [("error", {"error": "database went away"})]
+    finally:
+        main.retrieve_candidates = original_retrieve
+    print("✅ A failure after the stream has started is sent as an error event")
+
+
+def test_shared_components_built_once():
+    built = []
+
+    class SlowReranker:
+        def __init__(self):
+            built.append(self)
+            time.sleep(0.05)
+
+    original, main.LocalReranker, main.local_reranker = main.LocalReranker, SlowReranker, None
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            rerankers = list(executor.map(lambda _: main.get_local_reranker(), range(8)))
+        assert len(built) == 1 and all(reranker is built[0] for reranker in rerankers)
+    finally:
+        main.LocalReranker, main.local_reranker = original, None
+    print("✅ Concurrent requests build the shared reranker once")
+
+
+if __name__ == "__main__":
+    test_stream_yields_chunks()
+    test_stream_fallback()
+    test_sse_service()
+    test_sse_error_event()
+    test_shared_components_built_once()
+    print("\n🎉 All streaming tests passed")
@@ -12,6 +12,12 @@ import argparse
 import psycopg2
 from dotenv import load_dotenv
 import google.generativeai as genai
+
+# Add the root directory to the Python path to access the shared RateLimiter
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import throttle, GEMINI_EMBED
 load_dotenv()
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -49,12 +55,13 @@ def get_db_connection():
 def get_embedding(text):
     """Generates an embedding for the given text using the Gemini API."""
     try:
-        result = genai.embed_content(
-            model="gemini-embedding-001",
-            content=text,
-            task_type="retrieval_query",
-            output_dimensionality=1536
-        )
+        with throttle(GEMINI_EMBED):
+            result = genai.embed_content(
+                model="gemini-embedding-001",
+                content=text,
+                task_type="retrieval_query",
+                output_dimensionality=1536
+            )
         return result['embedding']
     except Exception as e:
         print(f"Failed to generate embedding: {e}")
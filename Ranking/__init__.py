@@ -0,0 +1,31 @@
+"""
+Ranking Package
+
+This package provides the streaming top-k ranker and score functions shared by the link getters.
+"""
+
+from .ranker import (
+    SCORES,
+    TopK,
+    top_k,
+    get_score,
+    item_timestamp,
+    likes,
+    views,
+    engagement_rate,
+    recency_weighted_likes,
+    recency_weighted_likes_score,
+)
+
+__all__ = [
+    'SCORES',
+    'TopK',
+    'top_k',
+    'get_score',
+    'item_timestamp',
+    'likes',
+    'views',
+    'engagement_rate',
+    'recency_weighted_likes',
+    'recency_weighted_likes_score',
+]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Top-K Ranker Microbenchmark
+
+Compares the old "collect every item, sort, slice" ranking against the streaming
+TopK ranker on the checked-in tiktok_*_dataset.json files. The datasets are replayed
+as a stream (with fresh item copies) until the requested number of items is
+reached, to simulate large actor result limits.
+
+Usage:
+    python benchmark_ranker.py
+    python benchmark_ranker.py --items 200000 --k 15 100 1000 --score recency_weighted_likes
+"""
+
+import argparse
+import glob
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+
+# Add the root directory to the Python path to access the shared Ranking and Discovery packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from Ranking import TopK, get_score, SCORES
+from Discovery.jsonio import iter_array
+
+DATASET_GLOBS = [
+    os.path.join(root_dir, 'ApifyLinkGetter', 'tiktok_*_dataset.json'),
+    os.path.join(root_dir, 'Processor', 'tiktok_*_dataset.json'),
+]
+
+
+def load_datasets():
+    items = []
+    for pattern in DATASET_GLOBS:
+        for path in sorted(glob.glob(pattern)):
+            items.extend(item for item in iter_array(path) if 'error' not in item)
+    return items
+
+
+def item_stream(items, count):
+    """Yields `count` shallow copies of the dataset items, cycling through them."""
+    for i, item in enumerate(itertools.islice(itertools.cycle(items), count)):
+        copy = dict(item)
+        # Vary the likes so replayed copies don't all tie
+        copy['diggCount'] = (item.get('diggCount') or 0) + i % 997
+        yield copy
+
+
+def rank_by_sorting(stream, k, score):
+    collected = list(stream)
+    collected.sort(key=score, reverse=True)
+    return collected[:k]
+
+
+def rank_by_topk(stream, k, score):
+    return TopK(k, score).extend(stream).results()
+
+
+def measure(rank, items, count, k, score):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = rank(item_stream(items, count), k, score)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sort-and-slice vs. streaming top-k ranking")
+    parser.add_argument('--items', type=int, default=100000, help='Number of items to stream (default: 100000)')
+    parser.add_argument('--k', type=int, nargs='+', default=[15, 100, 1000], help='Result limits to test')
+    parser.add_argument('--score', default='likes', choices=sorted(SCORES), help='Score function (default: likes)')
+    args = parser.parse_args()
+
+    items = load_datasets()
+    if not items:
+        sys.exit("No tiktok_*_dataset.json files found")
+    score = get_score(args.score)
+
+    print(f"📊 Ranking {args.items} items replayed from {len(items)} dataset items by '{args.score}'\n")
+    print(f"{'k':>6} | {'sort time':>10} | {'topk time':>10} | {'sort peak':>11} | {'topk peak':>11} | same")
+    print("-" * 70)
+    for k in args.k:
+        sorted_result, sort_time, sort_peak = measure(rank_by_sorting, items, args.items, k, score)
+        topk_result, topk_time, topk_peak = measure(rank_by_topk, items, args.items, k, score)
+        same = [score(item) for item in sorted_result] == [score(item) for item in topk_result]
+        print(f"{k:>6} | {sort_time:>9.3f}s | {topk_time:>9.3f}s | "
+              f"{sort_peak / 1e6:>8.1f} MB | {topk_peak / 1e6:>8.1f} MB | {'✅' if same else '❌'}")
+
+
+if __name__ == "__main__":
+    main()
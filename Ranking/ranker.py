@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Streaming Top-K Ranker
+
+This module provides a bounded top-k ranker for the link getters. Items are pushed
+one at a time into a buffer of at most 2k entries that is sorted and cut back to the
+best k whenever it fills up, so ranking a stream of n videos costs O(n log k) time
+and O(k) memory instead of materializing and sorting every item. When k is a large
+share of n the buffer never fills and ranking is a single sort, which is as fast as
+sorted() (a heapq min-heap was slower than sorting at k=1000).
+
+Scores are pluggable. The built-in score functions understand Apify TikTok items
+(diggCount, playCount, createTimeISO, ...), Apify Instagram items (likesCount,
+videoPlayCount, timestamp, ...), Discovery's VideoRecord and objects with
+`likes`/`date` attributes such as LinkGetter's VideoData:
+
+    likes                    number of likes
+    views                    number of plays
+    engagement_rate          (likes + comments + shares) / views
+    recency_weighted_likes   likes halved for every week since posting
+"""
+
+import itertools
+import math
+from datetime import datetime, timezone
+from operator import itemgetter
+from typing import Any, Callable, Iterable, List, Optional, Union
+
+Score = Callable[[Any], float]
+
+
+def _field(item: Any, *names: str, default=None):
+    """Returns the first present, non-None field of a dict item or attribute of an object."""
+    for name in names:
+        value = item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+        if value is not None:
+            return value
+    return default
+
+
+def _number(item: Any, *names: str) -> float:
+    value = _field(item, *names, default=0)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def item_timestamp(item: Any) -> Optional[datetime]:
+    """
+    Returns when an item was posted as a UTC datetime, or None if it cannot be parsed.
+
+    Understands TikTok's createTimeISO/createTime, Instagram's timestamp, VideoRecord's
+    created_at and a `date` datetime attribute.
+    """
+    value = _field(item, 'createTimeISO', 'timestamp', 'createTime', 'created_at', 'date')
+    if value is None:
+        return None
+    try:
+        if isinstance(value, datetime):
+            parsed = value
+        elif isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        else:
+            text = value[:-1] + '+00:00' if value.endswith('Z') else value
+            parsed = datetime.fromisoformat(text)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def likes(item: Any) -> float:
+    return _number(item, 'diggCount', 'likesCount', 'likeCount', 'likes')
+
+
+def views(item: Any) -> float:
+    return _number(item, 'playCount', 'videoPlayCount', 'igPlayCount', 'plays', 'views')
+
+
+def engagement_rate(item: Any) -> float:
+    plays = views(item)
+    if plays <= 0:
+        return 0.0
+    interactions = (likes(item)
+                    + _number(item, 'commentCount', 'commentsCount', 'comments')
+                    + _number(item, 'shareCount', 'reshareCount', 'shares'))
+    return interactions / plays
+
+
+def recency_weighted_likes_score(half_life_days: float = 7.0, now: Optional[datetime] = None) -> Score:
+    """
+    Builds a score that halves an item's likes for every `half_life_days` since it was posted.
+
+    Args:
+        half_life_days (float): Age in days at which likes count half.
+        now (datetime): Reference time (default: the time the score is called).
+
+    Returns:
+        callable: A score function for TopK.
+    """
+    def score(item: Any) -> float:
+        posted = item_timestamp(item)
+        if posted is None:
+            return 0.0
+        reference = now or datetime.now(timezone.utc)
+        age_days = max(0.0, (reference - posted).total_seconds() / 86400)
+        return likes(item) * math.pow(0.5, age_days / half_life_days)
+    return score
+
+
+recency_weighted_likes = recency_weighted_likes_score()
+
+SCORES = {
+    'likes': likes,
+    'views': views,
+    'engagement_rate': engagement_rate,
+    'recency_weighted_likes': recency_weighted_likes,
+}
+
+
+def get_score(score: Union[str, Score]) -> Score:
+    """Resolves a score name from SCORES, or returns a callable score unchanged."""
+    if callable(score):
+        return score
+    try:
+        return SCORES[score]
+    except KeyError:
+        raise ValueError(f"Unknown score '{score}'. Expected one of: {', '.join(SCORES)}") from None
+
+
+class TopK:
+    """
+    Keeps the k highest scoring items seen so far.
+
+    Items with equal scores keep their arrival order, matching a stable sort in
+    descending order. Candidates are buffered and pruned back to k with a sort each
+    time the buffer reaches 2k entries; items that can't beat the k-th best of the
+    last prune are rejected without being buffered.
+    """
+
+    def __init__(self, k: int, score: Union[str, Score] = 'likes'):
+        self.k = max(0, k)
+        self.score = get_score(score)
+        self.seen = 0
+        self._buffer = []
+        self._floor = None
+        self._counter = itertools.count()
+
+    def push(self, item: Any) -> bool:
+        """Offers an item to the ranker. Returns False if it can already be ruled out of the top k."""
+        self.seen += 1
+        if self.k == 0:
+            return False
+        key = (self.score(item), -next(self._counter))
+        if self._floor is not None and key <= self._floor:
+            return False
+        self._buffer.append((key, item))
+        if len(self._buffer) >= 2 * self.k:
+            self._prune()
+        return True
+
+    def _prune(self):
+        """Sorts the buffer best first and keeps the top k."""
+        self._buffer.sort(key=itemgetter(0), reverse=True)
+        del self._buffer[self.k:]
+        if self._buffer and len(self._buffer) == self.k:
+            self._floor = self._buffer[-1][0]
+
+    def extend(self, items: Iterable[Any]) -> 'TopK':
+        for item in items:
+            self.push(item)
+        return self
+
+    def results(self) -> List[Any]:
+        """Returns the kept items, highest score first."""
+        self._prune()
+        return [item for _, item in self._buffer]
+
+    def scored_results(self) -> List[tuple]:
+        """Returns (score, item) pairs, highest score first."""
+        self._prune()
+        return [(key[0], item) for key, item in self._buffer]
+
+    def __len__(self) -> int:
+        return min(len(self._buffer), self.k)
+
+
+def top_k(items: Iterable[Any], k: int, score: Union[str, Score] = 'likes',
+          predicate: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+    """
+    Returns the k highest scoring items of a stream, highest first.
+
+    Args:
+        items (Iterable): Items to rank; consumed once.
+        k (int): Number of items to keep.
+        score (str or callable): A name from SCORES or a function item -> float.
+        predicate (callable): Optional filter; items for which it returns False are skipped.
+
+    Returns:
+        list: Up to k items sorted by score in descending order.
+    """
+    ranker = TopK(k, score)
+    for item in items:
+        if predicate is None or predicate(item):
+            ranker.push(item)
+    return ranker.results()
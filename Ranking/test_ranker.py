@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming top-k ranker
+
+Checks TopK against sort-and-slice for small and large k, tie ordering, incremental
+use, and the built-in score functions.
+"""
+
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Ranking import TopK, top_k, get_score, likes, views, engagement_rate, recency_weighted_likes_score, item_timestamp
+
+
+def sort_and_slice(items, k, score):
+    # sorted() is stable, so equal scores keep their arrival order
+    return sorted(items, key=score, reverse=True)[:k]
+
+
+def test_matches_sorting():
+    rng = random.Random(7)
+    for n in (0, 1, 10, 500, 5000):
+        # Few distinct like counts, so there are many ties
+        items = [{'id': i, 'diggCount': rng.randint(0, 50)} for i in range(n)]
+        for k in (0, 1, 15, 100, n // 2, n, n + 10):
+            ranked = top_k(items, k)
+            assert ranked == sort_and_slice(items, k, likes), (n, k)
+            ranker = TopK(k).extend(items)
+            assert len(ranker) == min(k, n) and ranker.seen == n
+    print("✅ TopK matches sort-and-slice for k from 0 to beyond the stream length")
+
+
+def test_tie_ordering():
+    items = [{'id': i, 'diggCount': 5} for i in range(40)] + [{'id': 'top', 'diggCount': 9}]
+    assert [item['id'] for item in top_k(items, 4)] == ['top', 0, 1, 2]
+    # Later ties never displace earlier ones, even after the buffer has been pruned
+    ranker = TopK(3)
+    for item in items:
+        ranker.push(item)
+    assert [item['id'] for item in ranker.results()] == ['top', 0, 1]
+    assert ranker.push({'id': 'late', 'diggCount': 5}) is False
+    print("✅ Equal scores keep their arrival order")
+
+
+def test_incremental_results():
+    ranker = TopK(5, score='views')
+    for i in range(8):
+        ranker.push({'id': i, 'playCount': i})
+    assert [item['id'] for item in ranker.results()] == [7, 6, 5, 4, 3]
+    # Reading results mid-stream doesn't disturb later pushes
+    for i in range(8, 12):
+        ranker.push({'id': i, 'playCount': 10 - i})
+    assert [(score, item['id']) for score, item in ranker.scored_results()] == [(7.0, 7), (6.0, 6), (5.0, 5), (4.0, 4), (3.0, 3)]
+    assert TopK(0).push({'diggCount': 1}) is False
+    assert top_k(range(10), 3, score=lambda x: x, predicate=lambda x: x % 2 == 0) == [8, 6, 4]
+    print("✅ Results can be read mid-stream, and predicates filter items")
+
+
+def test_scores():
+    now = datetime(2025, 1, 15, tzinfo=timezone.utc)
+    tiktok = {'diggCount': 100, 'playCount': 1000, 'commentCount': 20, 'shareCount': 30,
+              'createTimeISO': (now - timedelta(days=7)).isoformat().replace('+00:00', 'Z')}
+    instagram = {'likesCount': '40', 'videoPlayCount': 0, 'timestamp': (now - timedelta(days=14)).isoformat()}
+    assert likes(tiktok) == 100 and views(tiktok) == 1000 and engagement_rate(tiktok) == 0.15
+    assert likes(instagram) == 40 and engagement_rate(instagram) == 0.0
+    score = recency_weighted_likes_score(half_life_days=7, now=now)
+    assert abs(score(tiktok) - 50) < 1e-6 and abs(score(instagram) - 10) < 1e-6
+    assert score({'diggCount': 10}) == 0.0 and item_timestamp({'createTime': 'not a date'}) is None
+    assert get_score('likes') is likes
+    try:
+        get_score('shares')
+        assert False, "unknown score names must be rejected"
+    except ValueError as e:
+        assert 'likes' in str(e)
+    print("✅ Built-in scores read TikTok and Instagram items")
+
+
+if __name__ == "__main__":
+    test_matches_sorting()
+    test_tie_ordering()
+    test_incremental_results()
+    test_scores()
+    print("\n🎉 All ranker tests passed")
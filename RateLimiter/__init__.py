@@ -0,0 +1,39 @@
+"""
+RateLimiter Package
+
+This package provides the shared per-provider token buckets used by every outbound client.
+"""
+
+from .rate_limiter import (
+    GEMINI_GENERATE,
+    GEMINI_EMBED,
+    APIFY,
+    TIKTOK,
+    INSTAGRAM,
+    ANALYZE_API,
+    TokenBucket,
+    get_limiter,
+    configure_limiter,
+    is_rate_limit_error,
+    parse_retry_after,
+    report_outcome,
+    throttle,
+    async_throttle,
+)
+
+__all__ = [
+    'GEMINI_GENERATE',
+    'GEMINI_EMBED',
+    'APIFY',
+    'TIKTOK',
+    'INSTAGRAM',
+    'ANALYZE_API',
+    'TokenBucket',
+    'get_limiter',
+    'configure_limiter',
+    'is_rate_limit_error',
+    'parse_retry_after',
+    'report_outcome',
+    'throttle',
+    'async_throttle',
+]
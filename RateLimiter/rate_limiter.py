@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Shared Rate Limiter
+
+This module provides thread-safe and asyncio-safe token buckets, one per outbound
+provider (Gemini generate, Gemini embed, Apify, TikTok, Instagram and the local
+/analyze API). Every client in the project acquires a token from its provider's
+bucket before making a request instead of sleeping for a fixed amount of time.
+
+Buckets adapt to rate-limit signals: when a provider answers with HTTP 429 (or the
+Gemini equivalent, ResourceExhausted) the bucket halves its rate and honours any
+Retry-After hint, then recovers gradually as requests succeed again.
+
+Rates are configured per provider through environment variables, e.g.:
+
+    RATE_LIMIT_GEMINI_GENERATE_QPS=2
+    RATE_LIMIT_GEMINI_GENERATE_BURST=4
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEMINI_GENERATE = "gemini_generate"
+GEMINI_EMBED = "gemini_embed"
+APIFY = "apify"
+TIKTOK = "tiktok"
+INSTAGRAM = "instagram"
+ANALYZE_API = "analyze_api"
+
+# Default (queries per second, burst) for each provider. These are conservative
+# starting points; override them with RATE_LIMIT_<PROVIDER>_QPS / _BURST.
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    GEMINI_GENERATE: (1.0, 2),
+    GEMINI_EMBED: (5.0, 10),
+    APIFY: (1.0, 2),
+    TIKTOK: (0.5, 1),
+    INSTAGRAM: (0.25, 1),
+    ANALYZE_API: (1.0, 1),
+}
+
+RATE_LIMIT_EXCEPTION_NAMES = {"ResourceExhausted", "TooManyRequests", "TooManyRequestsException"}
+# Only the HTTP status line counts; a bare "429" could be part of a video id or any number
+_TOO_MANY_REQUESTS = re.compile(r"\b429 Too Many Requests\b")
+
+
+class TokenBucket:
+    """
+    A token bucket that refills at `qps` tokens per second up to `burst` tokens.
+
+    Tokens are reserved under a lock and the caller then sleeps outside of it, so the
+    same bucket can be shared by threads and by coroutines on an event loop.
+    """
+
+    def __init__(self, name: str, qps: float, burst: int = 1, min_qps: Optional[float] = None):
+        if qps <= 0:
+            raise ValueError(f"qps must be positive for rate limiter '{name}'")
+        self.name = name
+        self.max_qps = float(qps)
+        self.qps = float(qps)
+        self.min_qps = min_qps if min_qps is not None else self.max_qps / 16
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.throttled_count = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.qps)
+            self._updated = now
+
+    def reserve(self, tokens: int = 1) -> float:
+        """
+        Reserves tokens and returns how many seconds the caller must wait before using them.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.qps
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Blocks the current thread until the tokens are available. Returns the time waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        """Waits on the event loop until the tokens are available. Returns the time waited."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def report_rate_limited(self, retry_after: Optional[float] = None):
+        """
+        Signals that the provider rejected a request with a rate-limit error.
+
+        The rate is halved (down to `min_qps`) and, if the provider sent a Retry-After
+        hint, the bucket is drained so that no request goes out before it expires.
+        """
+        with self._lock:
+            self.throttled_count += 1
+            self.qps = max(self.min_qps, self.qps / 2)
+            if retry_after:
+                self._refill(time.monotonic())
+                self._tokens = min(self._tokens, -retry_after * self.qps)
+        logger.warning(f"Rate limited by '{self.name}', slowing down to {self.qps:.3f} req/s")
+
+    def report_success(self):
+        """Signals a successful request, recovering the rate additively towards `max_qps`."""
+        if self.qps >= self.max_qps:
+            return
+        with self._lock:
+            self.qps = min(self.max_qps, self.qps + self.max_qps / 10)
+
+    def stats(self) -> dict:
+        """Returns the current state of the bucket."""
+        return {
+            "name": self.name,
+            "qps": self.qps,
+            "max_qps": self.max_qps,
+            "burst": self.burst,
+            "throttled": self.throttled_count,
+        }
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def _limit_from_env(provider: str) -> Tuple[float, int]:
+    qps, burst = DEFAULT_LIMITS.get(provider, (1.0, 1))
+    prefix = f"RATE_LIMIT_{provider.upper()}"
+    qps = float(os.getenv(f"{prefix}_QPS", qps))
+    burst = int(os.getenv(f"{prefix}_BURST", burst))
+    return qps, burst
+
+
+def get_limiter(provider: str) -> TokenBucket:
+    """
+    Returns the process-wide token bucket for a provider, creating it on first use.
+
+    Args:
+        provider (str): One of the provider names defined in this module (e.g. 'apify').
+
+    Returns:
+        TokenBucket: The shared bucket for that provider.
+    """
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        with _registry_lock:
+            limiter = _limiters.get(provider)
+            if limiter is None:
+                qps, burst = _limit_from_env(provider)
+                limiter = TokenBucket(provider, qps, burst)
+                _limiters[provider] = limiter
+    return limiter
+
+
+def configure_limiter(provider: str, qps: float, burst: int = 1) -> TokenBucket:
+    """Replaces the bucket for a provider with one using the given rate and burst."""
+    with _registry_lock:
+        limiter = TokenBucket(provider, qps, burst)
+        _limiters[provider] = limiter
+    return limiter
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """
+    Checks whether an exception raised by a client library signals a rate limit (HTTP 429).
+
+    Handles requests' HTTPError, apify-client's ApifyApiError, google-api-core's
+    ResourceExhausted, instaloader's TooManyRequestsException, any exception carrying
+    a 429 status code, and messages quoting the "429 Too Many Requests" status line.
+    """
+    for attr in ("status_code", "code", "status"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    response = getattr(exc, "response", None)
+    if response is not None and getattr(response, "status_code", None) == 429:
+        return True
+    if type(exc).__name__ in RATE_LIMIT_EXCEPTION_NAMES:
+        return True
+    return bool(_TOO_MANY_REQUESTS.search(str(exc)))
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parses a Retry-After header value, either delay-seconds ("120") or an HTTP-date
+    ("Wed, 21 Oct 2015 07:28:00 GMT"), into seconds from now. None if it can't be read.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(str(value))
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when is None:
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Extracts a Retry-After hint (in seconds) from an exception's HTTP response, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After") if hasattr(headers, "get") else None)
+
+
+@contextmanager
+def report_outcome(provider: str):
+    """
+    Reports the outcome of the wrapped call to `provider`'s bucket without acquiring
+    a token, for callers that acquire (and time the wait) separately.
+    """
+    limiter = get_limiter(provider)
+    try:
+        yield limiter
+    except Exception as e:
+        if is_rate_limit_error(e):
+            limiter.report_rate_limited(retry_after_seconds(e))
+        raise
+    limiter.report_success()
+
+
+@contextmanager
+def throttle(provider: str):
+    """
+    Acquires a token for `provider` and reports the outcome of the wrapped call.
+
+    Usage:
+        with throttle(GEMINI_EMBED):
+            result = genai.embed_content(...)
+    """
+    get_limiter(provider).acquire()
+    with report_outcome(provider) as limiter:
+        yield limiter
+
+
+@asynccontextmanager
+async def async_throttle(provider: str):
+    """Async counterpart of `throttle` for use inside coroutines."""
+    limiter = get_limiter(provider)
+    await limiter.acquire_async()
+    try:
+        yield limiter
+    except Exception as e:
+        if is_rate_limit_error(e):
+            limiter.report_rate_limited(retry_after_seconds(e))
+        raise
+    limiter.report_success()
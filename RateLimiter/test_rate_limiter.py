@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared rate limiter
+
+Checks token reservation, refill and burst, how buckets slow down on rate-limit
+errors (Retry-After and the minimum rate) and recover on success, rate-limit error
+detection, and the throttle/async_throttle context managers.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from RateLimiter import (
+    TokenBucket, configure_limiter, get_limiter, is_rate_limit_error, parse_retry_after,
+    report_outcome, throttle, async_throttle,
+)
+
+PROVIDER = "test_provider"
+
+
+class FakeResponse:
+    def __init__(self, status_code=429, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class HTTPError(Exception):
+    def __init__(self, message, response=None):
+        super().__init__(message)
+        self.response = response
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_reserve_burst_and_refill():
+    bucket = TokenBucket("test", qps=10, burst=3)
+    # The burst is available immediately, then each token costs 1/qps seconds
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = bucket.reserve()
+    assert 0.08 < wait <= 0.1, wait
+    assert 0.18 < bucket.reserve() <= 0.2
+
+    bucket = TokenBucket("test", qps=20, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    time.sleep(0.06)
+    # About one token refilled
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() > 0
+    # Refill never exceeds the burst
+    bucket = TokenBucket("test", qps=1000, burst=2)
+    time.sleep(0.01)
+    assert [bucket.reserve() == 0.0 for _ in range(3)] == [True, True, False]
+
+    try:
+        TokenBucket("test", qps=0)
+        assert False, "qps=0 must be rejected"
+    except ValueError:
+        pass
+    print("✅ Buckets allow a burst, then reserve tokens at the configured rate")
+
+
+def test_acquire_waits():
+    bucket = TokenBucket("test", qps=20, burst=1)
+    start = time.perf_counter()
+    waits = [bucket.acquire() for _ in range(3)]
+    elapsed = time.perf_counter() - start
+    assert waits[0] == 0.0 and 0.09 < elapsed < 0.2, (waits, elapsed)
+    print(f"✅ acquire() paced 3 requests at 20 req/s over {elapsed:.2f}s")
+
+
+def test_report_rate_limited():
+    bucket = TokenBucket("test", qps=8, burst=1, min_qps=1)
+    bucket.report_rate_limited()
+    assert bucket.qps == 4 and bucket.throttled_count == 1
+    for _ in range(5):
+        bucket.report_rate_limited()
+    # Never below the floor
+    assert bucket.qps == 1
+
+    bucket = TokenBucket("test", qps=10, burst=5)
+    bucket.report_rate_limited(retry_after=2)
+    # Nothing goes out before Retry-After has passed, even with a full burst
+    assert bucket.reserve() >= 2.0
+    assert bucket.min_qps == 10 / 16
+    print("✅ Rate-limited buckets halve their rate down to the floor and honour Retry-After")
+
+
+def test_report_success_recovers():
+    bucket = TokenBucket("test", qps=10, burst=1)
+    bucket.report_rate_limited()
+    bucket.report_rate_limited()
+    assert bucket.qps == 2.5
+    bucket.report_success()
+    assert bucket.qps == 3.5
+    for _ in range(20):
+        bucket.report_success()
+    assert bucket.qps == bucket.max_qps == 10
+    print("✅ Successful requests recover the rate additively up to the maximum")
+
+
+def test_is_rate_limit_error():
+    limited = [
+        HTTPError("rate limited", FakeResponse(429)),
+        ResourceExhausted("quota"),
+        type("ApifyApiError", (Exception,), {"status_code": 429})("x"),
+        Exception("429 Too Many Requests: slow down"),
+    ]
+    not_limited = [
+        Exception("Failed to download https://www.tiktok.com/@a/video/7342942901234"),
+        ValueError("500 Internal Server Error for id 14290"),
+        Exception("Failed for video 74290"),
+        HTTPError("server error", FakeResponse(500)),
+    ]
+    assert all(is_rate_limit_error(e) for e in limited)
+    assert not any(is_rate_limit_error(e) for e in not_limited)
+    print("✅ Only real 429s count as rate limits, not numbers containing 429")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(None) is None and parse_retry_after("soon") is None
+    when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(when) <= 30
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    print("✅ Retry-After is read as seconds or as an HTTP-date")
+
+
+def test_throttle():
+    limiter = configure_limiter(PROVIDER, 1000, 10)
+    assert get_limiter(PROVIDER) is limiter
+    with throttle(PROVIDER) as bucket:
+        assert bucket is limiter
+    try:
+        with throttle(PROVIDER):
+            raise HTTPError("rate limited", FakeResponse(429, {"Retry-After": "0"}))
+    except HTTPError:
+        pass
+    assert limiter.qps == 500 and limiter.throttled_count == 1
+    # Other errors propagate without slowing the bucket down
+    try:
+        with throttle(PROVIDER):
+            raise ValueError("Failed for video 74290")
+    except ValueError:
+        pass
+    assert limiter.qps == 500 and limiter.throttled_count == 1
+    with throttle(PROVIDER):
+        pass
+    assert limiter.qps == 600
+
+    # report_outcome() reports without taking a token
+    limiter = configure_limiter(PROVIDER, 1, 1)
+    try:
+        with report_outcome(PROVIDER):
+            raise ResourceExhausted("quota")
+    except ResourceExhausted:
+        pass
+    assert limiter.throttled_count == 1 and limiter.reserve() == 0.0
+    print("✅ throttle() reports rate limits and successes to the shared bucket")
+
+
+def test_async_throttle():
+    limiter = configure_limiter(PROVIDER, 20, 1)
+
+    async def request(i):
+        async with async_throttle(PROVIDER):
+            return time.perf_counter()
+
+    async def run():
+        start = time.perf_counter()
+        times = await asyncio.gather(*(request(i) for i in range(3)))
+        try:
+            async with async_throttle(PROVIDER):
+                raise ResourceExhausted("quota")
+        except ResourceExhausted:
+            pass
+        return start, times
+
+    start, times = asyncio.run(run())
+    # Coroutines are paced like threads: about 0.05s apart
+    assert times[-1] - start > 0.09, [t - start for t in times]
+    assert limiter.throttled_count == 1 and limiter.qps == 10
+    print("✅ async_throttle() paces coroutines on the same bucket")
+
+
+if __name__ == "__main__":
+    test_reserve_burst_and_refill()
+    test_acquire_waits()
+    test_report_rate_limited()
+    test_report_success_recovers()
+    test_is_rate_limit_error()
+    test_parse_retry_after()
+    test_throttle()
+    test_async_throttle()
+    print("\n🎉 All rate limiter tests passed")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Analysis response cache
+
+A persistent SQLite cache of Gemini analysis results for the /analyze service, keyed
+by (video id, prompt hash, model name). Re-running the same prompt against the same
+video returns the stored answer without downloading the video or calling Gemini
+again. The lookup happens before the download, so the video's caption is not part of
+the key; use a cache bypass to refresh an entry after a caption change.
+
+Entries expire after a TTL and the cache is bounded in size, evicting the least
+recently used entries first. Hit/miss counters are kept in-process.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from results_store import get_video_info
+
+DEFAULT_CACHE_PATH = os.getenv("ANALYSIS_CACHE_DB", "analysis_cache.db")
+DEFAULT_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 10000))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    cache_key TEXT PRIMARY KEY,
+    video_key TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_lookup ON analysis_cache (video_key, prompt_hash, model, created_at);
+CREATE INDEX IF NOT EXISTS idx_cache_last_accessed ON analysis_cache (last_accessed);
+"""
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def video_key_for_url(url: str) -> str:
+    """Returns a stable cache key for a video: '<platform>:<id>', or the URL itself if no id is found."""
+    platform, video_id = get_video_info(url)
+    if video_id != "unknown":
+        return f"{platform.lower()}:{video_id}"
+    return url.split("?")[0].rstrip("/")
+
+
+class AnalysisCache:
+    """
+    TTL + LRU bounded cache of analysis results, shared between Flask request threads.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, url: str, prompt: str, model: str) -> Optional[str]:
+        """Returns the cached result for (video, prompt, model), or None on a miss or expired entry."""
+        video_key = video_key_for_url(url)
+        prompt_hash = _sha256(prompt)
+        now = time.time()
+        query = """
+            SELECT cache_key, result FROM analysis_cache
+            WHERE video_key = ? AND prompt_hash = ? AND model = ? AND created_at >= ?
+            ORDER BY created_at DESC LIMIT 1
+        """
+        params = (video_key, prompt_hash, model, now - self.ttl_seconds)
+
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE analysis_cache SET last_accessed = ? WHERE cache_key = ?", (now, row[0]))
+            self._conn.commit()
+            return row[1]
+
+    def put(self, url: str, prompt: str, model: str, result: str):
+        """Stores a result, then evicts expired entries and trims the cache to `max_entries`."""
+        video_key = video_key_for_url(url)
+        prompt_hash = _sha256(prompt)
+        cache_key = _sha256("|".join([video_key, prompt_hash, model]))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO analysis_cache
+                    (cache_key, video_key, prompt_hash, model, result, created_at, last_accessed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (cache_key, video_key, prompt_hash, model, result, now, now)
+            )
+            expired = self._conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            overflow = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    """
+                    DELETE FROM analysis_cache WHERE cache_key IN (
+                        SELECT cache_key FROM analysis_cache ORDER BY last_accessed LIMIT ?
+                    )
+                    """,
+                    (overflow,)
+                )
+            self.evictions += expired + max(0, overflow)
+            self._conn.commit()
+
+    def record_bypass(self):
+        with self._lock:
+            self.bypasses += 1
+
+    def stats(self) -> Dict:
+        """Returns hit/miss counters for this process and the current number of entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bypasses': self.bypasses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+            }
@@ -1,21 +1,69 @@
 # app.py
 import os
+import sys
+import logging
 import shutil
+import time
+from datetime import datetime
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
+
+# Add the root directory to the Python path to access the shared RateLimiter
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
 from scraper import download_video
-from gemini_analyzer import analyze_video
+from gemini_analyzer import analyze_video, MODEL_NAME
+from RateLimiter import is_rate_limit_error
+from results_store import ResultsStore, DEFAULT_DB_PATH
+from analysis_cache import AnalysisCache, DEFAULT_CACHE_PATH
+from timing import StageTimer, STAGE_HISTOGRAM, log_timings
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
 
+# Stage timings are logged as one JSON line per request on the 'timing' logger
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+# Every /analyze outcome is appended to the results store; set RESULTS_DB="" to disable
+results_db_path = os.getenv("RESULTS_DB", DEFAULT_DB_PATH)
+results_store = ResultsStore(results_db_path) if results_db_path else None
+
+# Cached analyses are keyed by (video id, prompt, model); set ANALYSIS_CACHE_DB="" to disable
+cache_db_path = os.getenv("ANALYSIS_CACHE_DB", DEFAULT_CACHE_PATH)
+analysis_cache = AnalysisCache(cache_db_path) if cache_db_path else None
+
+def cache_bypassed(req):
+    """Clients can skip the cache lookup with 'X-Cache-Bypass: 1' or 'Cache-Control: no-cache'"""
+    if req.headers.get('X-Cache-Bypass', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'no-cache' in req.headers.get('Cache-Control', '').lower()
+
+def record_result(url, prompt, status, result, error, start_time):
+    """Append the outcome of one /analyze request to the results store"""
+    if not results_store:
+        return
+    try:
+        results_store.add_result({
+            'timestamp': datetime.now().isoformat(),
+            'url': url,
+            'prompt': prompt,
+            'status': status,
+            'result': result,
+            'duration_seconds': round(time.time() - start_time, 2),
+            'error_message': error
+        }, source='service')
+    except Exception as e:
+        print(f"Failed to record result: {str(e)}")
+
 @app.route("/analyze", methods=['POST'])
 def analyze():
     """
     API endpoint to handle video analysis requests.
-    Expects a JSON body with 'url' and 'prompt'.
+    Expects a JSON body with 'url' and 'prompt'. Pass "timings": true to get
+    per-stage timings back in the response.
     """
     if not request.is_json:
         return jsonify({"error": "Request must be JSON"}), 415
@@ -23,37 +71,118 @@ def analyze():
     data = request.json
     url = data.get('url')
     prompt = data.get('prompt')
+    include_timings = bool(data.get('timings'))
 
     if not url or not prompt:
         return jsonify({"error": "Both 'url' and 'prompt' are required fields."}), 400
 
+    timer = StageTimer()
+
+    # 0. Serve repeated (video, prompt, model) analyses from the cache
+    cache_status = 'DISABLED'
+    if analysis_cache:
+        if cache_bypassed(request):
+            analysis_cache.record_bypass()
+            cache_status = 'BYPASS'
+        else:
+            with timer.span('cache.lookup'):
+                cached_result = analysis_cache.get(url, prompt, MODEL_NAME)
+            if cached_result is not None:
+                cache_status = 'HIT'
+            else:
+                cache_status = 'MISS'
+
     scraped_data = None
-    try:
-        # 1. Scrape video and metadata
-        print(f"Downloading video from: {url}")
-        scraped_data = download_video(url)
-        print("Download successful. Starting analysis...")
-        
-        # 2. Analyze with Gemini
-        result_text = analyze_video(
-            video_path=scraped_data['video_path'],
-            prompt=prompt,
-            metadata_text=scraped_data['metadata_text']
-        )
-        
-        return jsonify({"result": result_text})
+    start_time = time.time()
+    if cache_status == 'HIT':
+        body, status_code = {"result": cached_result}, 200
+    else:
+        try:
+            # 1. Scrape video and metadata
+            print(f"Downloading video from: {url}")
+            with timer.span('download'):
+                scraped_data = download_video(url, timer=timer)
+            print("Download successful. Starting analysis...")
+            
+            # 2. Analyze with Gemini
+            with timer.span('analyze'):
+                result_text = analyze_video(
+                    video_path=scraped_data['video_path'],
+                    prompt=prompt,
+                    metadata_text=scraped_data['metadata_text'],
+                    timer=timer
+                )
+            
+            with timer.span('record'):
+                record_result(url, prompt, 'success', result_text, None, start_time)
+                if analysis_cache:
+                    analysis_cache.put(url, prompt, MODEL_NAME, result_text)
+            body, status_code = {"result": result_text}, 200
 
-    except Exception as e:
-        # Catch errors from scraping or analysis
-        print(f"An error occurred: {str(e)}")
-        return jsonify({"error": f"An internal error occurred: {str(e)}"}), 500
-
-    finally:
-        # 3. Cleanup: Ensure the temporary directory is always removed
-        if scraped_data and os.path.exists(scraped_data['video_path']):
-            temp_dir = os.path.dirname(scraped_data['video_path'])
-            print(f"Cleaning up temporary directory: {temp_dir}")
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        except Exception as e:
+            # Catch errors from scraping or analysis
+            print(f"An error occurred: {str(e)}")
+            if is_rate_limit_error(e):
+                # Let clients back off instead of treating upstream throttling as a failure
+                record_result(url, prompt, 'rate_limited', None, str(e), start_time)
+                body, status_code = {"error": f"Rate limited by upstream provider: {str(e)}"}, 429
+            else:
+                record_result(url, prompt, 'error', None, str(e), start_time)
+                body, status_code = {"error": f"An internal error occurred: {str(e)}"}, 500
+
+        finally:
+            # 3. Cleanup: Ensure the temporary directory is always removed
+            if scraped_data and os.path.exists(scraped_data['video_path']):
+                temp_dir = os.path.dirname(scraped_data['video_path'])
+                print(f"Cleaning up temporary directory: {temp_dir}")
+                with timer.span('cleanup'):
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+
+    log_timings(timer, url=url, status=status_code, cache=cache_status)
+    if include_timings:
+        body["timings"] = {
+            "total_seconds": round(timer.elapsed(), 4),
+            "stages": timer.totals(),
+            "spans": timer.spans,
+        }
+    response = jsonify(body)
+    response.headers['X-Cache'] = cache_status
+    return response, status_code
+
+
+@app.route("/metrics", methods=['GET'])
+def metrics():
+    """Per-stage timing histograms for /analyze in the Prometheus text format"""
+    return STAGE_HISTOGRAM.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+
+@app.route("/results/stats", methods=['GET'])
+def results_stats():
+    """
+    Error rate and duration percentiles from the results store.
+    Optional query parameters: since (ISO timestamp), platform, prompt.
+    """
+    if not results_store:
+        return jsonify({"error": "Results store is disabled (RESULTS_DB is empty)"}), 404
+
+    filters = {
+        'since': request.args.get('since'),
+        'platform': request.args.get('platform'),
+        'prompt': request.args.get('prompt'),
+    }
+    percentiles = results_store.duration_percentiles(**filters)
+    return jsonify({
+        **results_store.error_rate(**filters),
+        "duration_percentiles": {f"p{p:g}": value for p, value in percentiles.items()},
+    })
+
+
+@app.route("/cache/stats", methods=['GET'])
+def cache_stats():
+    """Hit/miss counters and size of the analysis cache"""
+    if not analysis_cache:
+        return jsonify({"error": "Analysis cache is disabled (ANALYSIS_CACHE_DB is empty)"}), 404
+    return jsonify(analysis_cache.stats())
 
 
 if __name__ == "__main__":
@@ -1,21 +1,38 @@
 #!/usr/bin/env python3
 """
 Batch video analysis script
-Processes multiple TikTok/Instagram URLs and saves results to CSV
+Processes multiple TikTok/Instagram URLs and streams results to CSV or JSONL
 """
 
 import requests
-import pandas as pd
 import time
 from datetime import datetime
+import csv
+import io
 import json
 import os
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+# Add the root directory to the Python path to access the shared RateLimiter and Discovery packages
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import get_limiter, parse_retry_after, ANALYZE_API
+from Discovery.jsonio import iter_jsonl
+from results_store import ResultsStore, RESULT_FIELDS, get_video_info
 
 # Configuration
 API_URL = "http://localhost:5000/analyze"
 OUTPUT_CSV = "video_analysis_results.csv"
 REQUEST_TIMEOUT = 300  # 5 minutes per video
-DELAY_BETWEEN_REQUESTS = 2  # seconds
+DEFAULT_WORKERS = 1  # Sequential unless --workers is given
+PER_HOST_LIMIT = 2  # Max in-flight analyses per video host (tiktok.com, instagram.com)
+# Request pacing is handled by the shared 'analyze_api' rate limiter
+# (set RATE_LIMIT_ANALYZE_API_QPS / RATE_LIMIT_ANALYZE_API_BURST to tune it)
 
 # Sample URLs - replace with your own
 URLS_TO_ANALYZE = [
@@ -43,7 +60,17 @@ def check_server_health():
     except:
         return False
 
-def analyze_single_video(url, prompt):
+_thread_local = threading.local()
+
+def _get_session():
+    """Return a per-thread requests session so workers reuse their HTTP connection"""
+    session = getattr(_thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        _thread_local.session = session
+    return session
+
+def analyze_single_video(url, prompt, bypass_cache=False):
     """Analyze a single video with a specific prompt"""
     payload = {
         "url": url,
@@ -53,16 +80,27 @@ def analyze_single_video(url, prompt):
     headers = {
         "Content-Type": "application/json"
     }
+    if bypass_cache:
+        # Ask the server to re-run the analysis instead of returning a cached answer
+        headers["X-Cache-Bypass"] = "1"
+    
+    limiter = get_limiter(ANALYZE_API)
     
     try:
-        print(f"   📝 Prompt: {prompt[:50]}...")
+        limiter.acquire()
         start_time = time.time()
         
-        response = requests.post(API_URL, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+        response = _get_session().post(API_URL, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
         
         end_time = time.time()
         duration = end_time - start_time
         
+        if response.status_code == 429:
+            # The server is being throttled upstream, slow down our own request rate
+            limiter.report_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
+        else:
+            limiter.report_success()
+        
         if response.status_code == 200:
             result = response.json()
             return {
@@ -102,16 +140,119 @@ def analyze_single_video(url, prompt):
             'error': str(e)
         }
 
-def batch_analyze():
-    """Process all URLs with all prompts and save to CSV"""
+class ResultWriter:
+    """
+    Writes one result per line to a CSV or JSONL file (chosen by extension).
+    Each write is a single append + flush, so saving progress costs O(1) per result.
+    The file is truncated on open unless `append` is set (used by --resume).
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.is_jsonl = path.endswith('.jsonl')
+        self._lock = threading.Lock()
+        is_new = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._csv = None
+        if not self.is_jsonl:
+            self._csv = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+            if is_new:
+                self._csv.writeheader()
+                self._file.flush()
+
+    def write(self, record):
+        with self._lock:
+            if self.is_jsonl:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                self._csv.writerow(record)
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+def load_completed_pairs(path):
+    """
+    Return the set of (url, prompt) pairs that already have a successful result in the
+    output file. Failed pairs are not included so that --resume retries them.
+    """
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    try:
+        with open(path, 'rb') as f:
+            if path.endswith('.jsonl'):
+                records = iter_jsonl(f)
+            else:
+                records = csv.DictReader(io.TextIOWrapper(f, encoding='utf-8', newline=''))
+            for record in records:
+                if record.get('status') == 'success':
+                    completed.add((record.get('url'), record.get('prompt')))
+    except Exception as e:
+        print(f"⚠️  Could not read existing results from {path}: {e}")
+    return completed
+
+class HostLimiter:
+    """Caps the number of in-flight analyses per video host"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def for_url(self, url):
+        host = (urlparse(url).hostname or '').lower()
+        # Collapse www./m./vm. subdomains onto the platform's registered domain
+        host = '.'.join(host.split('.')[-2:])
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.limit)
+            return self._semaphores[host]
+
+def run_analysis(url, prompt, host_limiter, bypass_cache=False):
+    """Run one (url, prompt) analysis under its host limit and build the result record"""
+    platform, video_id = get_video_info(url)
+    with host_limiter.for_url(url):
+        analysis_result = analyze_single_video(url, prompt, bypass_cache)
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'url': url,
+        'platform': platform,
+        'video_id': video_id,
+        'prompt': prompt,
+        'status': analysis_result['status'],
+        'result': analysis_result['result'],
+        'duration_seconds': round(analysis_result['duration'], 2),
+        'error_message': analysis_result['error']
+    }
+
+def batch_analyze(workers=DEFAULT_WORKERS, output_path=OUTPUT_CSV, resume=False, per_host=PER_HOST_LIMIT, db_path=None,
+                  bypass_cache=False):
+    """Process all URLs with all prompts, streaming each result to the output file (and results store)"""
+    pairs = [(url, prompt) for url in URLS_TO_ANALYZE for prompt in ANALYSIS_PROMPTS]
+    
     print("🚀 Batch Video Analysis")
     print("=" * 50)
     print(f"📹 URLs to process: {len(URLS_TO_ANALYZE)}")
     print(f"📝 Prompts per video: {len(ANALYSIS_PROMPTS)}")
-    print(f"📊 Total analyses: {len(URLS_TO_ANALYZE) * len(ANALYSIS_PROMPTS)}")
-    print(f"💾 Output file: {OUTPUT_CSV}")
+    print(f"📊 Total analyses: {len(pairs)}")
+    print(f"👷 Workers: {workers} (max {per_host} per host)")
+    print(f"💾 Output file: {output_path}")
+    if db_path:
+        print(f"🗄️  Results store: {db_path}")
     print()
     
+    if resume:
+        completed = load_completed_pairs(output_path)
+        remaining = [pair for pair in pairs if pair not in completed]
+        print(f"⏭️  Resuming: skipping {len(pairs) - len(remaining)} completed analyses, {len(remaining)} remaining")
+        pairs = remaining
+        print()
+    
+    if not pairs:
+        print("🎉 Nothing to do - all analyses are already in the output file")
+        return
+    
     # Check server
     if not check_server_health():
         print("❌ Server not reachable!")
@@ -121,99 +262,68 @@ def batch_analyze():
     print("✅ Server is responding")
     print()
     
-    # Prepare results list
-    results = []
-    total_analyses = len(URLS_TO_ANALYZE) * len(ANALYSIS_PROMPTS)
-    current_analysis = 0
+    writer = ResultWriter(output_path, append=resume)
+    store = ResultsStore(db_path) if db_path else None
+    host_limiter = HostLimiter(per_host)
+    status_counts = Counter()
+    total_analyses = len(pairs)
     
-    # Process each URL
-    for url_index, url in enumerate(URLS_TO_ANALYZE, 1):
-        print(f"🎬 Processing video {url_index}/{len(URLS_TO_ANALYZE)}: {url}")
-        
-        # Extract video info for better tracking
-        if "tiktok.com" in url:
-            platform = "TikTok"
-            video_id = url.split("/video/")[1].split("?")[0] if "/video/" in url else "unknown"
-        elif "instagram.com" in url:
-            platform = "Instagram"
-            video_id = url.split("/reel/")[1].rstrip("/") if "/reel/" in url else "unknown"
-        else:
-            platform = "Unknown"
-            video_id = "unknown"
-        
-        # Process each prompt for this URL
-        for prompt_index, prompt in enumerate(ANALYSIS_PROMPTS, 1):
-            current_analysis += 1
-            
-            print(f"   🔍 Analysis {current_analysis}/{total_analyses} (Prompt {prompt_index}/{len(ANALYSIS_PROMPTS)})")
-            
-            # Analyze video
-            analysis_result = analyze_single_video(url, prompt)
-            
-            # Create result record
-            result_record = {
-                'timestamp': datetime.now().isoformat(),
-                'url': url,
-                'platform': platform,
-                'video_id': video_id,
-                'prompt': prompt,
-                'status': analysis_result['status'],
-                'result': analysis_result['result'],
-                'duration_seconds': round(analysis_result['duration'], 2),
-                'error_message': analysis_result['error']
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(run_analysis, url, prompt, host_limiter, bypass_cache): (url, prompt)
+                for url, prompt in pairs
             }
-            
-            results.append(result_record)
-            
-            # Show result
-            if analysis_result['status'] == 'success':
-                result_preview = analysis_result['result'][:100] + "..." if len(analysis_result['result']) > 100 else analysis_result['result']
-                print(f"   ✅ Success ({analysis_result['duration']:.1f}s): {result_preview}")
-            else:
-                print(f"   ❌ {analysis_result['status']}: {analysis_result['error']}")
-            
-            # Save progress incrementally
-            if current_analysis % 5 == 0 or current_analysis == total_analyses:
-                save_results_to_csv(results)
-                print(f"   💾 Progress saved ({current_analysis}/{total_analyses})")
-            
-            # Delay between requests (be nice to the server)
-            if current_analysis < total_analyses:
-                print(f"   ⏳ Waiting {DELAY_BETWEEN_REQUESTS}s...")
-                time.sleep(DELAY_BETWEEN_REQUESTS)
-        
-        print()
-    
-    # Final save
-    save_results_to_csv(results)
+            for current_analysis, future in enumerate(as_completed(futures), 1):
+                url, prompt = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    platform, video_id = get_video_info(url)
+                    record = {
+                        'timestamp': datetime.now().isoformat(), 'url': url, 'platform': platform,
+                        'video_id': video_id, 'prompt': prompt, 'status': 'error', 'result': None,
+                        'duration_seconds': 0, 'error_message': str(e)
+                    }
+                
+                # Save each result as soon as it completes
+                writer.write(record)
+                if store:
+                    store.add_result(record, source='batch')
+                status_counts[record['status']] += 1
+                
+                print(f"🔍 Analysis {current_analysis}/{total_analyses}: {url}")
+                print(f"   📝 Prompt: {prompt[:50]}...")
+                if record['status'] == 'success':
+                    result_text = record['result'] or ''
+                    result_preview = result_text[:100] + "..." if len(result_text) > 100 else result_text
+                    print(f"   ✅ Success ({record['duration_seconds']:.1f}s): {result_preview}")
+                else:
+                    print(f"   ❌ {record['status']}: {record['error_message']}")
+    finally:
+        writer.close()
+        if store:
+            store.close()
     
     # Summary
+    print()
     print("🎉 Batch analysis complete!")
     print("=" * 50)
     
-    df = pd.DataFrame(results)
-    success_count = len(df[df['status'] == 'success'])
-    error_count = len(df[df['status'] != 'success'])
+    success_count = status_counts['success']
+    error_count = total_analyses - success_count
     
     print(f"📊 Results Summary:")
     print(f"   ✅ Successful analyses: {success_count}")
     print(f"   ❌ Failed analyses: {error_count}")
-    print(f"   📈 Success rate: {success_count/len(results)*100:.1f}%")
-    print(f"   💾 Results saved to: {OUTPUT_CSV}")
+    print(f"   📈 Success rate: {success_count/total_analyses*100:.1f}%")
+    print(f"   💾 Results saved to: {output_path}")
     
     if error_count > 0:
         print(f"\n🔍 Error breakdown:")
-        error_summary = df[df['status'] != 'success']['status'].value_counts()
-        for error_type, count in error_summary.items():
-            print(f"   {error_type}: {count}")
-
-def save_results_to_csv(results):
-    """Save results to CSV file"""
-    try:
-        df = pd.DataFrame(results)
-        df.to_csv(OUTPUT_CSV, index=False)
-    except Exception as e:
-        print(f"❌ Error saving CSV: {e}")
+        for error_type, count in status_counts.most_common():
+            if error_type != 'success':
+                print(f"   {error_type}: {count}")
 
 def load_urls_from_file(filename):
     """Load URLs from a text file (one URL per line)"""
@@ -250,34 +360,52 @@ https://www.tiktok.com/@tiktok/video/7011536772089924869?is_copy_url=1&is_from_w
     print("   python batch_analyze.py --file urls_to_analyze.txt")
 
 if __name__ == "__main__":
-    import sys
+    import argparse
     
-    # Check for command line arguments
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--create-sample":
-            create_sample_urls_file()
-            exit(0)
-        elif sys.argv[1] == "--file" and len(sys.argv) > 2:
-            # Load URLs from file
-            filename = sys.argv[2]
-            file_urls = load_urls_from_file(filename)
-            if file_urls:
-                print(f"📁 Loaded {len(file_urls)} URLs from {filename}")
-                URLS_TO_ANALYZE = file_urls
-            else:
-                print("❌ No valid URLs found in file")
-                exit(1)
-        elif sys.argv[1] == "--help":
-            print("🔧 Batch Video Analysis Tool")
-            print()
-            print("Usage:")
-            print("  python batch_analyze.py                    # Use URLs defined in script")
-            print("  python batch_analyze.py --file urls.txt    # Load URLs from file")
-            print("  python batch_analyze.py --create-sample    # Create sample URLs file")
-            print("  python batch_analyze.py --help             # Show this help")
-            print()
-            print("File format: One URL per line, # for comments")
-            exit(0)
+    parser = argparse.ArgumentParser(
+        description="🔧 Batch Video Analysis Tool",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python batch_analyze.py                              # Use URLs defined in script
+  python batch_analyze.py --file urls.txt              # Load URLs from file
+  python batch_analyze.py --file urls.txt --workers 4  # Run 4 analyses concurrently
+  python batch_analyze.py --output results.jsonl --resume
+  python batch_analyze.py --create-sample              # Create sample URLs file
+
+File format: One URL per line, # for comments
+        """
+    )
+    parser.add_argument('--file', help='Load URLs from a text file (one URL per line)')
+    parser.add_argument('--create-sample', action='store_true', help='Create a sample URLs file and exit')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of concurrent analyses (default: 1)')
+    parser.add_argument('--per-host', type=int, default=PER_HOST_LIMIT, help=f'Max concurrent analyses per video host (default: {PER_HOST_LIMIT})')
+    parser.add_argument('--output', '-o', default=OUTPUT_CSV, help=f'Output file, .csv or .jsonl (default: {OUTPUT_CSV})')
+    parser.add_argument('--resume', action='store_true', help='Skip (url, prompt) pairs that already succeeded in the output file')
+    parser.add_argument('--db', help='Also append each result to this SQLite results store (see results_store.py)')
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the server's analysis cache and re-run every analysis")
+    args = parser.parse_args()
+    
+    if args.create_sample:
+        create_sample_urls_file()
+        exit(0)
+    
+    if args.file:
+        # Load URLs from file
+        file_urls = load_urls_from_file(args.file)
+        if file_urls:
+            print(f"📁 Loaded {len(file_urls)} URLs from {args.file}")
+            URLS_TO_ANALYZE = file_urls
+        else:
+            print("❌ No valid URLs found in file")
+            exit(1)
     
     # Run the batch analysis
-    batch_analyze() 
\ No newline at end of file
+    batch_analyze(
+        workers=max(1, args.workers),
+        output_path=args.output,
+        resume=args.resume,
+        per_host=max(1, args.per_host),
+        db_path=args.db,
+        bypass_cache=args.no_cache
+    )
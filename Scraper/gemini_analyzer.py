@@ -1,13 +1,24 @@
 # gemini_analyzer.py
 import os
+import sys
 import time
 import google.generativeai as genai
 
+# Add the root directory to the Python path to access the shared RateLimiter
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import GEMINI_GENERATE
+from timing import StageTimer, throttled_span
+
 # Configure the API key from environment variables
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 genai.configure(api_key=GOOGLE_API_KEY)
 
-def analyze_video(video_path: str, prompt: str, metadata_text: str) -> str:
+# Model used for video analysis (also part of the analysis cache key)
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+
+def analyze_video(video_path: str, prompt: str, metadata_text: str, timer: StageTimer = None) -> str:
     """
     Analyzes a video using the Gemini API based on a user prompt.
 
@@ -15,25 +26,29 @@ def analyze_video(video_path: str, prompt: str, metadata_text: str) -> str:
         video_path: The local path to the video file.
         prompt: The user's question or instruction for analysis.
         metadata_text: The caption or description scraped from the post.
+        timer: Optional StageTimer that receives 'gemini.*' timing spans.
 
     Returns:
         The text response from the Gemini model.
     """
+    timer = timer or StageTimer()
     print("Uploading file to Gemini...")
-    video_file = genai.upload_file(path=video_path)
+    with throttled_span(timer, 'gemini.upload', GEMINI_GENERATE):
+        video_file = genai.upload_file(path=video_path)
     
     # Wait for the upload to complete before proceeding
-    while video_file.state.name == "PROCESSING":
-        print('.', end='', flush=True)
-        time.sleep(2)
-        video_file = genai.get_file(video_file.name)
+    with timer.span('gemini.processing_wait'):
+        while video_file.state.name == "PROCESSING":
+            print('.', end='', flush=True)
+            time.sleep(2)
+            video_file = genai.get_file(video_file.name)
 
     if video_file.state.name == "FAILED":
       raise ValueError("Gemini file processing failed.")
 
     print(f"\nFile uploaded successfully: {video_file.name}")
     
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash")
+    model = genai.GenerativeModel(model_name=MODEL_NAME)
 
     # Construct the final prompt, providing context to the model
     full_prompt = f"""
@@ -50,9 +65,11 @@ def analyze_video(video_path: str, prompt: str, metadata_text: str) -> str:
 
     try:
         print("Generating content with Gemini...")
-        response = model.generate_content([full_prompt, video_file])
+        with throttled_span(timer, 'gemini.generate', GEMINI_GENERATE):
+            response = model.generate_content([full_prompt, video_file])
         return response.text
     finally:
         # Ensure the uploaded file is deleted from Gemini's servers
         print(f"Deleting uploaded file: {video_file.name}")
-        genai.delete_file(video_file.name) 
\ No newline at end of file
+        with timer.span('gemini.cleanup'):
+            genai.delete_file(video_file.name) 
\ No newline at end of file
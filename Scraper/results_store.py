@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Analysis results store
+
+An append-friendly SQLite store for video analysis results. Results are written one
+row at a time by batch_analyze.py and the /analyze service, and the indexes on
+video_id, platform, prompt and timestamp let the query helpers below answer
+questions about historical runs without loading everything into memory.
+"""
+
+import csv
+import math
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Add the root directory to the Python path to access the shared Discovery package
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from Discovery.jsonio import iter_jsonl
+
+DEFAULT_DB_PATH = os.getenv("RESULTS_DB", "analysis_results.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    url TEXT NOT NULL,
+    platform TEXT,
+    video_id TEXT,
+    prompt TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    duration_seconds REAL,
+    error_message TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_video_id ON analysis_results (video_id);
+CREATE INDEX IF NOT EXISTS idx_results_platform ON analysis_results (platform);
+CREATE INDEX IF NOT EXISTS idx_results_prompt ON analysis_results (prompt);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON analysis_results (timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_video_prompt_time ON analysis_results (video_id, prompt, timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_duration ON analysis_results (duration_seconds);
+"""
+
+INSERT_SQL = """
+    INSERT INTO analysis_results
+        (timestamp, url, platform, video_id, prompt, status, result, duration_seconds, error_message, source)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+RESULT_FIELDS = ['timestamp', 'url', 'platform', 'video_id', 'prompt', 'status', 'result', 'duration_seconds', 'error_message']
+
+
+def get_video_info(url):
+    """Extract (platform, video_id) from a TikTok/Instagram URL"""
+    if "tiktok.com" in url:
+        platform = "TikTok"
+        video_id = url.split("/video/")[1].split("?")[0] if "/video/" in url else "unknown"
+    elif "instagram.com" in url:
+        platform = "Instagram"
+        if "/reel/" in url:
+            video_id = url.split("/reel/")[1].split("?")[0].rstrip("/")
+        elif "/p/" in url:
+            video_id = url.split("/p/")[1].split("?")[0].rstrip("/")
+        else:
+            video_id = "unknown"
+    else:
+        platform = "Unknown"
+        video_id = "unknown"
+    return platform, video_id
+
+
+class ResultsStore:
+    """
+    SQLite-backed store of analysis results.
+
+    A single connection is shared behind a lock so the store can be used from the
+    batch worker pool and from Flask's request threads.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _row(self, record: Dict, source: Optional[str]) -> tuple:
+        platform, video_id = get_video_info(record['url'])
+        duration = record.get('duration_seconds')
+        return (
+            record.get('timestamp') or datetime.now().isoformat(),
+            record['url'],
+            record.get('platform') or platform,
+            record.get('video_id') or video_id,
+            record['prompt'],
+            record['status'],
+            record.get('result') or None,
+            float(duration) if duration not in (None, '') else None,
+            record.get('error_message') or None,
+            source or record.get('source'),
+        )
+
+    def add_result(self, record: Dict, source: Optional[str] = None) -> int:
+        """
+        Appends a single result and returns its row id.
+
+        `record` uses the same keys as the batch CSV output; platform and video_id are
+        derived from the URL when missing.
+        """
+        with self._lock:
+            cur = self._conn.execute(INSERT_SQL, self._row(record, source))
+            self._conn.commit()
+            return cur.lastrowid
+
+    def add_results(self, records: Iterable[Dict], source: Optional[str] = None) -> int:
+        """Appends many results in a single transaction. Returns the number written."""
+        with self._lock:
+            cur = self._conn.executemany(INSERT_SQL, (self._row(record, source) for record in records))
+            self._conn.commit()
+            return cur.rowcount
+
+    def import_csv(self, csv_path: str, source: str = "csv_import") -> int:
+        """Imports a batch_analyze.py CSV file into the store."""
+        with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+            return self.add_results(csv.DictReader(f), source=source)
+
+    def import_jsonl(self, jsonl_path: str, source: str = "jsonl_import") -> int:
+        """Imports a batch_analyze.py JSONL file into the store, streaming one record at a time."""
+        return self.add_results(iter_jsonl(jsonl_path), source=source)
+
+    def _where(self, since=None, platform=None, prompt=None, video_id=None, status=None):
+        clauses, params = [], []
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if platform:
+            clauses.append("platform = ?")
+            params.append(platform)
+        if prompt:
+            clauses.append("prompt = ?")
+            params.append(prompt)
+        if video_id:
+            clauses.append("video_id = ?")
+            params.append(video_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def latest_results(self, video_id: Optional[str] = None, prompt: Optional[str] = None,
+                       platform: Optional[str] = None, status: Optional[str] = None) -> List[Dict]:
+        """
+        Returns the most recent result (by timestamp, so imports of older files don't
+        win) for each (video, prompt) pair, optionally restricted to one video, prompt,
+        platform or status. Videos whose id couldn't be parsed from the URL (short
+        links, /reels/) are told apart by URL.
+        """
+        where, params = self._where(platform=platform, prompt=prompt, video_id=video_id, status=status)
+        query = f"""
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY CASE WHEN video_id IS NULL OR video_id = 'unknown' THEN url ELSE video_id END, prompt
+                    ORDER BY timestamp DESC, id DESC
+                ) AS recency
+                FROM analysis_results{where}
+            )
+            WHERE recency = 1
+            ORDER BY timestamp DESC
+        """
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(query, params)]
+        for row in rows:
+            del row['recency']
+        return rows
+
+    def error_rate(self, since: Optional[str] = None, platform: Optional[str] = None,
+                   prompt: Optional[str] = None) -> Dict:
+        """Returns total/failed counts and the failure rate, optionally filtered."""
+        where, params = self._where(since=since, platform=platform, prompt=prompt)
+        query = f"""
+            SELECT COUNT(*) AS total,
+                   COALESCE(SUM(CASE WHEN status != 'success' THEN 1 ELSE 0 END), 0) AS failed
+            FROM analysis_results{where}
+        """
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        total, failed = row['total'], row['failed']
+        return {
+            'total': total,
+            'failed': failed,
+            'error_rate': failed / total if total else 0.0,
+        }
+
+    def duration_percentiles(self, percentiles: Iterable[float] = (50, 90, 99), since: Optional[str] = None,
+                             platform: Optional[str] = None, prompt: Optional[str] = None,
+                             status: Optional[str] = 'success') -> Dict[float, Optional[float]]:
+        """
+        Returns nearest-rank duration percentiles (in seconds).
+
+        Each percentile is a single indexed ORDER BY ... LIMIT 1 OFFSET n lookup, so only
+        the matching rows are read, never the whole table into memory.
+        """
+        where, params = self._where(since=since, platform=platform, prompt=prompt, status=status)
+        where += (" AND " if where else " WHERE ") + "duration_seconds IS NOT NULL"
+        results = {}
+        with self._lock:
+            count = self._conn.execute(f"SELECT COUNT(*) FROM analysis_results{where}", params).fetchone()[0]
+            for p in percentiles:
+                if count == 0:
+                    results[p] = None
+                    continue
+                offset = min(count - 1, max(0, math.ceil(p / 100 * count) - 1))
+                row = self._conn.execute(
+                    f"SELECT duration_seconds FROM analysis_results{where} "
+                    f"ORDER BY duration_seconds LIMIT 1 OFFSET ?",
+                    params + [offset]
+                ).fetchone()
+                results[p] = row[0]
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Query the video analysis results store")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help=f'SQLite database path (default: {DEFAULT_DB_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Import a batch_analyze.py CSV or JSONL file')
+    import_parser.add_argument('results_file')
+
+    latest_parser = subparsers.add_parser('latest', help='Latest result per video/prompt')
+    latest_parser.add_argument('--video-id')
+    latest_parser.add_argument('--prompt')
+    latest_parser.add_argument('--platform')
+
+    stats_parser = subparsers.add_parser('stats', help='Error rate and duration percentiles')
+    stats_parser.add_argument('--since', help='ISO timestamp lower bound')
+    stats_parser.add_argument('--platform')
+    stats_parser.add_argument('--prompt')
+
+    args = parser.parse_args()
+    store = ResultsStore(args.db)
+
+    if args.command == 'import':
+        if args.results_file.endswith('.jsonl'):
+            count = store.import_jsonl(args.results_file)
+        else:
+            count = store.import_csv(args.results_file)
+        print(f"📥 Imported {count} results from {args.results_file} into {args.db}")
+    elif args.command == 'latest':
+        for row in store.latest_results(video_id=args.video_id, prompt=args.prompt, platform=args.platform):
+            print(json.dumps(row, ensure_ascii=False))
+    elif args.command == 'stats':
+        errors = store.error_rate(since=args.since, platform=args.platform, prompt=args.prompt)
+        durations = store.duration_percentiles(since=args.since, platform=args.platform, prompt=args.prompt)
+        print(f"📊 Analyses: {errors['total']}")
+        print(f"❌ Failed: {errors['failed']} ({errors['error_rate']*100:.1f}%)")
+        for p, value in durations.items():
+            print(f"⏱️  p{p:g} duration: {value:.2f}s" if value is not None else f"⏱️  p{p:g} duration: n/a")
+
+    store.close()
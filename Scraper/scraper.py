@@ -1,6 +1,7 @@
 # scraper.py
 import os
 import re
+import sys
 import tempfile
 import shutil
 from pathlib import Path
@@ -8,6 +9,13 @@ import instaloader
 import pyktok as pyk
 import pandas as pd
 
+# Add the root directory to the Python path to access the shared RateLimiter
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import TIKTOK, INSTAGRAM
+from timing import StageTimer, throttled_span
+
 # Try to set the browser for pyktok (fallback gracefully if it fails)
 try:
     pyk.specify_browser('chrome')
@@ -71,17 +79,19 @@ else:
     print("Instagram: Using unauthenticated loader (public content only)")
 # --- End Instaloader Setup ---
 
-def download_video(url: str) -> dict:
+def download_video(url: str, timer: StageTimer = None) -> dict:
     """
     Downloads a video from a TikTok or Instagram URL.
 
     Args:
         url: The URL of the video.
+        timer: Optional StageTimer that receives 'download.*' timing spans.
 
     Returns:
         A dictionary containing 'video_path' and 'metadata_text'.
         Raises an exception if the download fails.
     """
+    timer = timer or StageTimer()
     temp_dir = tempfile.mkdtemp()
     
     try:
@@ -89,10 +99,18 @@ def download_video(url: str) -> dict:
             # Handle TikTok
             try:
                 print(f"🎬 Downloading TikTok video from: {url}")
-                pyk.save_tiktok(url, True, os.path.join(temp_dir, 'video_data.csv'))
+                with throttled_span(timer, 'download.tiktok', TIKTOK):
+                    pyk.save_tiktok(url, True, os.path.join(temp_dir, 'video_data.csv'))
                 
                 # pyktok saves to the current working directory, so we find and move it.
+                # Only take the file named after this video's id: concurrent downloads
+                # share the directory, and any other .mp4 may be another request's video.
                 video_files = [f for f in os.listdir('.') if f.endswith('.mp4')]
+                video_id_match = re.search(r'/video/(\d+)', url)
+                if video_id_match:
+                    video_files = [f for f in video_files if video_id_match.group(1) in f]
+                elif len(video_files) > 1:
+                    raise Exception(f"Can't tell which of {len(video_files)} downloaded .mp4 files belongs to {url}; use the full /video/<id> URL.")
                 if not video_files:
                     raise Exception("TikTok video file not found in current directory after download. This could be due to: 1) Video is private/restricted, 2) TikTok rate limiting, 3) Video URL is invalid")
                 
@@ -104,7 +122,8 @@ def download_video(url: str) -> dict:
                 # Extract description
                 csv_path = os.path.join(temp_dir, 'video_data.csv')
                 if os.path.exists(csv_path):
-                    df = pd.read_csv(csv_path)
+                    with timer.span('download.metadata'):
+                        df = pd.read_csv(csv_path)
                     if not df.empty and 'video_description' in df.columns:
                         metadata_text = df['video_description'].values[0]
                         print(f"📝 Found description: {metadata_text[:100]}...")
@@ -128,10 +147,11 @@ def download_video(url: str) -> dict:
             # Handle Instagram using the first available loader
             active_loader = LOADERS[0]
             shortcode = url.split("/")[-2].strip()
-            post = instaloader.Post.from_shortcode(active_loader.context, shortcode)
-            
-            # Download to the temp directory
-            active_loader.download_post(post, target=Path(temp_dir))
+            with throttled_span(timer, 'download.instagram', INSTAGRAM):
+                post = instaloader.Post.from_shortcode(active_loader.context, shortcode)
+                
+                # Download to the temp directory
+                active_loader.download_post(post, target=Path(temp_dir))
             
             # Find the downloaded files within the temp directory
             video_path = next((os.path.join(temp_dir, f) for f in os.listdir(temp_dir) if f.endswith(".mp4")), None)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for the analysis response cache
+
+Checks that entries are keyed by (video, prompt, model), expire after their TTL, are
+evicted least recently used first, and that a bypass (batch_analyze.py --no-cache)
+re-runs the analysis and refreshes the cached answer.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import analysis_cache as cache_module
+import app as service
+import batch_analyze
+from analysis_cache import AnalysisCache
+from RateLimiter import configure_limiter, ANALYZE_API
+
+URL = "https://www.tiktok.com/@a/video/111"
+PROMPT = "What is this video about?"
+MODEL = "gemini-test"
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def with_clock(test):
+    def run():
+        original = cache_module.time
+        cache_module.time = FakeClock()
+        try:
+            test(cache_module.time)
+        finally:
+            cache_module.time = original
+    run.__name__ = test.__name__
+    return run
+
+
+@with_clock
+def test_keys_and_ttl(clock):
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnalysisCache(os.path.join(tmp, "cache.db"), ttl_seconds=60, max_entries=10)
+        assert cache.get(URL, PROMPT, MODEL) is None
+        cache.put(URL, PROMPT, MODEL, "first")
+        # Same video under another URL form hits; other prompts and models miss
+        assert cache.get("https://www.tiktok.com/@a/video/111?lang=en", PROMPT, MODEL) == "first"
+        assert cache.get(URL, "Other prompt", MODEL) is None
+        assert cache.get(URL, PROMPT, "other-model") is None
+        cache.put(URL, PROMPT, MODEL, "second")
+        assert cache.get(URL, PROMPT, MODEL) == "second" and cache.stats()['entries'] == 1
+
+        clock.now += 61
+        assert cache.get(URL, PROMPT, MODEL) is None
+        cache.put("https://www.tiktok.com/@a/video/222", PROMPT, MODEL, "other")
+        stats = cache.stats()
+        assert stats['entries'] == 1 and stats['evictions'] == 1
+        assert (stats['hits'], stats['misses']) == (2, 4)
+        cache.close()
+    print("✅ Entries are keyed by video, prompt and model, and expire after the TTL")
+
+
+@with_clock
+def test_lru_eviction(clock):
+    urls = [f"https://www.tiktok.com/@a/video/{i}" for i in range(3)]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnalysisCache(os.path.join(tmp, "cache.db"), ttl_seconds=3600, max_entries=2)
+        cache.put(urls[0], PROMPT, MODEL, "zero")
+        clock.now += 1
+        cache.put(urls[1], PROMPT, MODEL, "one")
+        clock.now += 1
+        # Reading the oldest entry makes the other one least recently used
+        assert cache.get(urls[0], PROMPT, MODEL) == "zero"
+        clock.now += 1
+        cache.put(urls[2], PROMPT, MODEL, "two")
+        assert cache.get(urls[1], PROMPT, MODEL) is None
+        assert cache.get(urls[0], PROMPT, MODEL) == "zero" and cache.get(urls[2], PROMPT, MODEL) == "two"
+        assert cache.stats()['entries'] == 2 and cache.evictions == 1
+        cache.close()
+    print("✅ The cache stays within max_entries by evicting the least recently used entry")
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def test_no_cache_bypass():
+    calls = []
+
+    def fake_download(url, timer=None):
+        calls.append(url)
+        return {'video_path': os.path.join(tmp, "missing", "video.mp4"), 'metadata_text': f"caption {len(calls)}"}
+
+    def fake_analyze(video_path, prompt, metadata_text, timer=None):
+        return f"analysis of {metadata_text}"
+
+    originals = service.analysis_cache, service.results_store, service.download_video, service.analyze_video
+    with tempfile.TemporaryDirectory() as tmp:
+        service.analysis_cache = AnalysisCache(os.path.join(tmp, "cache.db"))
+        service.results_store = None
+        service.download_video, service.analyze_video = fake_download, fake_analyze
+        client = service.app.test_client()
+
+        # batch_analyze.py --no-cache forwards the bypass header on every request
+        sent = []
+        session = type("Session", (), {"post": lambda self, url, json, headers, timeout: (
+            sent.append(headers),
+            FakeResponse(client.post("/analyze", json=json, headers=headers).get_json()))[1]})()
+        configure_limiter(ANALYZE_API, 1000, 10)
+        batch_analyze._thread_local.session = session
+        try:
+            first = client.post("/analyze", json={"url": URL, "prompt": PROMPT})
+            cached = client.post("/analyze", json={"url": URL, "prompt": PROMPT})
+            assert first.headers['X-Cache'] == 'MISS' and cached.headers['X-Cache'] == 'HIT'
+            assert cached.get_json()['result'] == "analysis of caption 1" and len(calls) == 1
+
+            result = batch_analyze.analyze_single_video(URL, PROMPT, bypass_cache=True)
+            assert sent[-1]["X-Cache-Bypass"] == "1"
+            assert result['status'] == 'success' and result['result'] == "analysis of caption 2"
+            assert len(calls) == 2
+
+            # The fresh result replaced the cached one
+            refreshed = client.post("/analyze", json={"url": URL, "prompt": PROMPT})
+            assert refreshed.headers['X-Cache'] == 'HIT' and refreshed.get_json()['result'] == "analysis of caption 2"
+            batch_analyze.analyze_single_video(URL, PROMPT)
+            assert "X-Cache-Bypass" not in sent[-1]
+            stats = service.analysis_cache.stats()
+            assert stats['bypasses'] == 1 and stats['hits'] == 3
+        finally:
+            batch_analyze._thread_local.session = None
+            service.analysis_cache.close()
+            service.analysis_cache, service.results_store, service.download_video, service.analyze_video = originals
+    print("✅ --no-cache re-runs the analysis and refreshes the cached answer")
+
+
+if __name__ == "__main__":
+    test_keys_and_ttl()
+    test_lru_eviction()
+    test_no_cache_bypass()
+    print("\n🎉 All analysis cache tests passed")
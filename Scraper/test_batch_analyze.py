@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch analysis worker pool
+
+Checks the per-host in-flight cap, the streaming CSV/JSONL writer (truncating unless
+resuming), --resume's reading of completed pairs, Retry-After handling, and that a
+TikTok download never picks up another request's video file.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import batch_analyze
+import scraper
+from batch_analyze import HostLimiter, ResultWriter, load_completed_pairs, analyze_single_video
+from RateLimiter import configure_limiter, ANALYZE_API, TIKTOK
+
+
+def record(url, prompt, status='success'):
+    return {
+        'timestamp': '2025-01-01T00:00:00', 'url': url, 'platform': 'tiktok', 'video_id': '1',
+        'prompt': prompt, 'status': status, 'result': 'ok' if status == 'success' else None,
+        'duration_seconds': 1.0, 'error_message': None if status == 'success' else 'boom',
+    }
+
+
+def test_host_limiter():
+    limiter = HostLimiter(2)
+    # Subdomains share their platform's limit
+    assert limiter.for_url("https://www.tiktok.com/@a/video/1") is limiter.for_url("https://vm.tiktok.com/xyz")
+    assert limiter.for_url("https://www.tiktok.com/@a/video/1") is not limiter.for_url("https://www.instagram.com/reel/x/")
+
+    in_flight, peak = 0, 0
+    lock = threading.Lock()
+
+    def work(url):
+        nonlocal in_flight, peak
+        with limiter.for_url(url):
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight -= 1
+
+    threads = [threading.Thread(target=work, args=(f"https://www.tiktok.com/@a/video/{i}",)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2, peak
+    print("✅ HostLimiter caps in-flight analyses per platform")
+
+
+def test_result_writer_and_resume():
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("results.csv", "results.jsonl"):
+            path = os.path.join(tmp, name)
+            writer = ResultWriter(path)
+            writer.write(record("u1", "p1"))
+            writer.write(record("u2", "p1", status='error'))
+            writer.close()
+            assert load_completed_pairs(path) == {("u1", "p1")}
+
+            # --resume appends; failed pairs are retried
+            writer = ResultWriter(path, append=True)
+            writer.write(record("u2", "p1"))
+            writer.close()
+            assert load_completed_pairs(path) == {("u1", "p1"), ("u2", "p1")}
+
+            # A fresh run overwrites instead of duplicating rows
+            writer = ResultWriter(path)
+            writer.write(record("u3", "p1"))
+            writer.close()
+            assert load_completed_pairs(path) == {("u3", "p1")}
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            assert len(lines) == (1 if name.endswith('.jsonl') else 2), lines
+            if name.endswith('.jsonl'):
+                assert json.loads(lines[0])['url'] == "u3"
+        assert load_completed_pairs(os.path.join(tmp, "missing.csv")) == set()
+    print("✅ ResultWriter truncates unless resuming, and --resume only skips successes")
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = "rate limited"
+
+    def json(self):
+        return {"error": "Rate limited by upstream provider"}
+
+
+def test_retry_after_http_date():
+    limiter = configure_limiter(ANALYZE_API, 100, 1)
+    when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=2), usegmt=True)
+    session = type("Session", (), {"post": lambda self, *args, **kwargs: FakeResponse(429, {"Retry-After": when})})()
+    batch_analyze._thread_local.session = session
+    try:
+        result = analyze_single_video("https://www.tiktok.com/@a/video/1", "prompt")
+    finally:
+        batch_analyze._thread_local.session = None
+    assert result['status'] == 'error' and limiter.throttled_count == 1
+    # The HTTP-date was honoured: the next token is about 2 seconds away
+    assert 1.0 < limiter.reserve() <= 2.1
+    print("✅ A Retry-After HTTP-date slows the analyze limiter down instead of raising")
+
+
+def test_download_ignores_other_videos():
+    configure_limiter(TIKTOK, 1000, 10)
+    original_cwd, original_save = os.getcwd(), scraper.pyk.save_tiktok
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        # Another worker's download finished in the shared directory; ours produced nothing
+        scraper.pyk.save_tiktok = lambda url, save_video, csv_path: open("@other_video_999.mp4", "w").close()
+        try:
+            try:
+                scraper.download_video("https://www.tiktok.com/@a/video/123")
+                assert False, "download_video must not take another video's file"
+            except Exception as e:
+                assert "not found" in str(e), e
+            assert os.path.exists("@other_video_999.mp4")
+        finally:
+            scraper.pyk.save_tiktok = original_save
+            os.chdir(original_cwd)
+    print("✅ download_video fails instead of taking another request's .mp4")
+
+
+if __name__ == "__main__":
+    test_host_limiter()
+    test_result_writer_and_resume()
+    test_retry_after_http_date()
+    test_download_ignores_other_videos()
+    print("\n🎉 All batch analysis tests passed")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for the analysis results store
+
+Checks latest-result selection (by timestamp, and by URL for videos without a parsed
+id), error rates, nearest-rank duration percentiles and CSV/JSONL import.
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from results_store import ResultsStore, RESULT_FIELDS, get_video_info
+
+TIKTOK_URL = "https://www.tiktok.com/@a/video/111"
+PROMPT = "What is this video about?"
+
+
+def record(url=TIKTOK_URL, timestamp="2025-01-02T00:00:00", status="success", duration=1.0, result="ok", prompt=PROMPT):
+    platform, video_id = get_video_info(url)
+    return {
+        'timestamp': timestamp, 'url': url, 'platform': platform, 'video_id': video_id, 'prompt': prompt,
+        'status': status, 'result': result if status == 'success' else None,
+        'duration_seconds': duration, 'error_message': None if status == 'success' else 'boom',
+    }
+
+
+def open_store(tmp):
+    return ResultsStore(os.path.join(tmp, "results.db"))
+
+
+def test_latest_results():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(tmp)
+        store.add_result(record(timestamp="2025-03-01T00:00:00", result="new"))
+        # Imported later, but from an older run
+        store.add_results([record(timestamp="2024-01-01T00:00:00", result="old")], source="csv_import")
+        store.add_result(record(prompt="Other prompt", timestamp="2025-01-01T00:00:00"))
+        # Short links and /reels/ URLs have no parsed id; each URL is its own video
+        store.add_result(record(url="https://vm.tiktok.com/ZMabc/", result="short a"))
+        store.add_result(record(url="https://vm.tiktok.com/ZMxyz/", result="short b"))
+        store.add_result(record(url="https://www.instagram.com/reels/", result="reels"))
+
+        latest = store.latest_results()
+        by_key = {(row['url'], row['prompt']): row for row in latest}
+        assert len(latest) == 5, latest
+        assert by_key[(TIKTOK_URL, PROMPT)]['result'] == "new"
+        assert {row['result'] for row in latest if row['video_id'] == 'unknown'} == {"short a", "short b", "reels"}
+        assert [row['result'] for row in store.latest_results(video_id="111", prompt=PROMPT)] == ["new"]
+        assert 'recency' not in latest[0]
+        store.close()
+    print("✅ Latest results are chosen by timestamp, and videos without an id are kept apart by URL")
+
+
+def test_error_rate_and_percentiles():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(tmp)
+        assert store.error_rate() == {'total': 0, 'failed': 0, 'error_rate': 0.0}
+        assert store.duration_percentiles() == {50: None, 90: None, 99: None}
+
+        store.add_results([record(duration=float(d)) for d in range(1, 11)])
+        store.add_results([record(status="error", duration=100.0, timestamp="2025-02-01T00:00:00"),
+                           record(status="timeout", duration=300.0, timestamp="2025-02-01T00:00:00")])
+        assert store.error_rate() == {'total': 12, 'failed': 2, 'error_rate': 2 / 12}
+        assert store.error_rate(since="2025-02-01")['error_rate'] == 1.0
+        assert store.error_rate(platform="Instagram")['total'] == 0
+
+        # Nearest rank over the successful durations 1..10
+        assert store.duration_percentiles((0, 50, 90, 99, 100)) == {0: 1.0, 50: 5.0, 90: 9.0, 99: 10.0, 100: 10.0}
+        assert store.duration_percentiles((50,), status=None) == {50: 6.0}
+        store.close()
+    print("✅ Error rates and nearest-rank duration percentiles")
+
+
+def test_import():
+    rows = [record(timestamp=f"2025-01-0{i}T00:00:00", duration=str(i)) for i in range(1, 4)]
+    rows.append(dict(record(url="https://www.instagram.com/reel/ABC123/"), platform="", video_id="", duration_seconds=""))
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "results.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        jsonl_path = os.path.join(tmp, "results.jsonl")
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+
+        store = open_store(tmp)
+        assert store.import_csv(csv_path) == 4
+        assert store.import_jsonl(jsonl_path) == 4
+        assert store.error_rate()['total'] == 8
+        instagram = store.latest_results(platform="Instagram")
+        # Missing platform and id are derived from the URL; empty durations become NULL
+        assert len(instagram) == 1 and instagram[0]['video_id'] == "ABC123"
+        assert instagram[0]['duration_seconds'] is None
+        assert store.duration_percentiles((100,)) == {100: 3.0}
+        sources = {row['source'] for row in store.latest_results()}
+        assert sources <= {"csv_import", "jsonl_import"}
+        store.close()
+    print("✅ CSV and JSONL results import with derived platform and video id")
+
+
+if __name__ == "__main__":
+    test_latest_results()
+    test_error_rate_and_percentiles()
+    test_import()
+    print("\n🎉 All results store tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for pipeline stage timing
+
+Checks that waits for the shared rate limiter land in their own 'ratelimit.<provider>'
+spans instead of inflating the stage they precede.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from timing import StageTimer, throttled_span
+from RateLimiter import configure_limiter
+
+PROVIDER = "timing_test"
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+def test_throttled_span():
+    limiter = configure_limiter(PROVIDER, 5, 1)
+    timer = StageTimer()
+    for _ in range(2):
+        with throttled_span(timer, 'gemini.generate', PROVIDER):
+            time.sleep(0.01)
+    totals = timer.totals()
+    # The second call waited ~0.2s for a token; the stage itself only took ~0.02s
+    assert 0.15 < totals[f'ratelimit.{PROVIDER}'] < 0.3, totals
+    assert totals['gemini.generate'] < 0.1, totals
+    assert [span['stage'] for span in timer.spans] == [f'ratelimit.{PROVIDER}', 'gemini.generate'] * 2
+
+    # Failures are still timed and reported to the limiter
+    try:
+        with throttled_span(timer, 'download.tiktok', PROVIDER):
+            raise ResourceExhausted("quota")
+    except ResourceExhausted:
+        pass
+    assert timer.spans[-1]['stage'] == 'download.tiktok' and limiter.throttled_count == 1
+    print("✅ Rate-limit waits are timed separately from the stage they precede")
+
+
+if __name__ == "__main__":
+    test_throttled_span()
+    print("\n🎉 All timing tests passed")
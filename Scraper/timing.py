@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Pipeline stage timing
+
+Structured per-stage timing spans for the /analyze path (download, Gemini upload,
+PROCESSING wait, generation, cleanup). Waits for the shared rate limiter are
+recorded in their own 'ratelimit.<provider>' spans rather than inside the stage they
+precede. Each request collects its spans in a StageTimer; finished timers are logged as one JSON line and folded into an
+in-process histogram that the service exposes at /metrics.
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Add the root directory to the Python path to access the shared RateLimiter
+root_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, root_dir)
+
+from RateLimiter import get_limiter, report_outcome
+
+logger = logging.getLogger("timing")
+
+# Histogram bucket upper bounds in seconds, sized for multi-second video downloads and generations
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class StageTimer:
+    """Collects named timing spans for a single request."""
+
+    def __init__(self):
+        self.spans: List[Dict] = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage: str):
+        """Times the wrapped block as `stage`. The span is recorded even if the block raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, start)
+
+    def add(self, stage: str, seconds: float, start: Optional[float] = None):
+        """Records a span measured elsewhere."""
+        offset = (start - self._start) if start is not None else None
+        self.spans.append({
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "offset": round(offset, 4) if offset is not None else None,
+        })
+
+    def totals(self) -> Dict[str, float]:
+        """Returns total seconds per stage (a stage may have several spans)."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span["stage"]] = round(totals.get(span["stage"], 0.0) + span["seconds"], 4)
+        return totals
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+
+@contextmanager
+def throttled_span(timer: StageTimer, stage: str, provider: str):
+    """
+    Rate-limited counterpart of `timer.span(stage)`: the wait for a `provider` token
+    is timed as 'ratelimit.<provider>', and only the wrapped call as `stage`.
+    """
+    with timer.span(f"ratelimit.{provider}"):
+        get_limiter(provider).acquire()
+    with timer.span(stage), report_outcome(provider) as limiter:
+        yield limiter
+
+
+class StageHistogram:
+    """Thread-safe cumulative histograms of span durations, one per stage."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._stages[stage] = entry
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    index = i
+                    break
+            entry["counts"][index] += 1
+            entry["sum"] += seconds
+            entry["count"] += 1
+
+    def observe_timer(self, timer: StageTimer):
+        for stage, seconds in timer.totals().items():
+            self.observe(stage, seconds)
+
+    def render_prometheus(self, metric: str = "analyze_stage_seconds") -> str:
+        """Renders the histograms in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {metric} Time spent in each /analyze pipeline stage.",
+            f"# TYPE {metric} histogram",
+        ]
+        with self._lock:
+            for stage in sorted(self._stages):
+                entry = self._stages[stage]
+                cumulative = 0
+                for bound, count in zip(self.buckets, entry["counts"]):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {entry["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide histogram fed by every /analyze request
+STAGE_HISTOGRAM = StageHistogram()
+
+
+def log_timings(timer: StageTimer, **fields):
+    """Logs a finished timer as a single JSON line and adds it to the process histogram."""
+    STAGE_HISTOGRAM.observe_timer(timer)
+    STAGE_HISTOGRAM.observe("total", timer.elapsed())
+    logger.info(json.dumps({
+        "event": "analyze_timing",
+        **fields,
+        "total_seconds": round(timer.elapsed(), 4),
+        "stages": timer.totals(),
+        "spans": timer.spans,
+    }))